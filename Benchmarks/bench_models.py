@@ -0,0 +1,105 @@
+"""
+Offline cost of each model: preprocessing and forward pass per MODEL_TYPE.
+
+Tab histories are replayed from user_data.csv, encoded with the server's
+FeaturePipeline and run through every model at each batch size (number of
+tabs per alarm), with the numpy backend and, when TensorFlow is installed,
+the Keras one.
+
+    python Benchmarks/bench_models.py --tabs 1 10 100 500 --backend numpy keras --json out.json
+"""
+import os
+import sys
+import time
+import argparse
+import warnings
+
+import numpy as np
+
+from common import DEFAULT_CSV, MODELS_DIR, latency_summary, read_events, \
+    tab_histories, time_call, write_json
+sys.path.insert(0, MODELS_DIR)
+from features import FeaturePipeline  # noqa: E402
+from numpy_lstm import SAVED_MODELS_DIR, NumpyModel  # noqa: E402
+
+warnings.filterwarnings('ignore')  # sklearn pickle-version / feature-name warnings
+
+# same names/files as Models/server.py
+MODEL_FILES = {
+    'vanilla': 'saved_vanilla_lstm_new',
+    'tlstm':   'saved_tlstm',
+    'attn':    'saved_attn_lstm',
+}
+DEFAULT_MODEL_DIR = SAVED_MODELS_DIR
+
+
+def load(name, backend, model_dir):
+    """(model, seq_len, use_deltas, load seconds) for one model and backend."""
+    started = time.perf_counter()
+    path = os.path.join(model_dir, MODEL_FILES[name])
+    if backend == 'numpy':
+        model = NumpyModel.load(path + '.npz')
+        seq_len, use_deltas = model.seq_len, model.use_deltas
+    else:
+        import keras
+        keras.config.enable_unsafe_deserialization()
+        from tensorflow.keras.models import load_model
+        from keras_layers import SumOverTime
+        model = load_model(path + '.h5', custom_objects={'SumOverTime': SumOverTime})
+        seq_len = int(model.inputs[0].shape[1])
+        use_deltas = len(model.inputs) > 1
+    return model, seq_len, use_deltas, time.perf_counter() - started
+
+def run(names, backends, tabs_list, histories, pipeline, model_dir, repeat):
+    results = []
+    for backend in backends:
+        for name in names:
+            try:
+                model, seq_len, use_deltas, load_s = load(name, backend, model_dir)
+            except ImportError as e:
+                print(f"[INFO] Skipping {backend} backend: {e}")
+                break
+            for tabs in tabs_list:
+                batch = histories[:tabs]
+                encode = lambda: pipeline.encode_batch([(ev, dt) for ev, dt, _ in batch], seq_len)
+                ev_in, dt_in, _ = encode()
+                inputs = [ev_in, dt_in.reshape(tabs, seq_len, 1)] if use_deltas else ev_in
+                pre = latency_summary(time_call(encode, repeat))
+                fwd = latency_summary(time_call(lambda: model.predict(inputs, verbose=0), repeat))
+                results.append({
+                    'model': name, 'backend': backend, 'tabs': tabs, 'seq_len': seq_len,
+                    'load_s': round(load_s, 3),
+                    'preprocess': pre, 'forward': fwd,
+                    'per_tab_us': round((pre['p50_ms'] + fwd['p50_ms']) * 1000.0 / tabs, 2),
+                })
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Per-model preprocessing/forward benchmark')
+    parser.add_argument('--models', nargs='+', default=list(MODEL_FILES), choices=list(MODEL_FILES))
+    parser.add_argument('--backend', nargs='+', default=['numpy', 'keras'],
+                        choices=['numpy', 'keras'])
+    parser.add_argument('--tabs', type=int, nargs='+', default=[1, 10, 100, 500])
+    parser.add_argument('--csv', default=DEFAULT_CSV, help='log to replay tab histories from')
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--json', help="write results to this file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    pipeline = FeaturePipeline.load(MODELS_DIR)
+    histories = tab_histories(read_events(args.csv), max(args.tabs))
+    results = run(args.models, args.backend, args.tabs, histories, pipeline,
+                  args.model_dir, args.repeat)
+
+    print(f"{'model':8} {'backend':8} {'tabs':>5} {'prep p50':>9} {'fwd p50':>9} "
+          f"{'fwd p99':>9} {'µs/tab':>9}")
+    for r in results:
+        print(f"{r['model']:8} {r['backend']:8} {r['tabs']:5} "
+              f"{r['preprocess']['p50_ms']:8.3f}ms {r['forward']['p50_ms']:8.3f}ms "
+              f"{r['forward']['p99_ms']:8.3f}ms {r['per_tab_us']:9.1f}")
+    if args.json:
+        write_json(args.json, 'models', vars(args), results)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+Per-request preprocessing cost of the prediction server.
+
+Compares three ways of turning a tab history into model inputs:
+  legacy   – the original /predict code: `in classes_` scans, sklearn
+             transform() on tiny arrays, list-based pad_trunc
+  sklearn  – one np.isin + LabelEncoder/MinMaxScaler.transform per batch
+  compiled – FeaturePipeline's dict lookup and fused affine scale
+
+    python Benchmarks/bench_preprocessing.py --tabs 1 10 100 --history 20 --json out.json
+"""
+import sys
+import argparse
+import warnings
+
+import numpy as np
+
+from common import MODELS_DIR, time_call, write_json
+sys.path.insert(0, MODELS_DIR)
+from features import FeaturePipeline  # noqa: E402
+
+warnings.filterwarnings('ignore')  # sklearn pickle-version / feature-name warnings
+
+
+def legacy_encode(pipeline, histories, width):
+    le, scaler = pipeline.label_encoder, pipeline.scaler
+    ev_rows, dt_rows = [], []
+    for raw_events, raw_times in histories:
+        valid_events = [e for e in raw_events if e in le.classes_]
+        valid_times = [
+            t for i, t in enumerate(raw_times)
+            if i < len(raw_events) and raw_events[i] in le.classes_
+        ]
+        encoded = le.transform(valid_events)
+        times_scaled = scaler.transform(np.array(valid_times).reshape(-1, 1)).flatten()
+
+        def pad_trunc(arr, length, pad=0):
+            if len(arr) >= length:
+                return np.array(arr[-length:])
+            return np.array([pad] * (length - len(arr)) + list(arr))
+
+        ev_rows.append(pad_trunc(encoded, width, pad=0))
+        dt_rows.append(pad_trunc(times_scaled, width, pad=0.0))
+    return np.array(ev_rows), np.array(dt_rows)
+
+def sklearn_encode(pipeline, histories, width):
+    le, scaler = pipeline.label_encoder, pipeline.scaler
+    n = len(histories)
+    sizes = np.array([len(ev) for ev, _ in histories], dtype='int64')
+    ev_in = np.zeros((n, width), dtype='int32')
+    dt_in = np.zeros((n, width), dtype='float32')
+    flat_events, flat_times = [], []
+    for events, times in histories:
+        times = list(times)[:len(events)]
+        flat_events.extend(events)
+        flat_times.extend(times + [0.0] * (len(events) - len(times)))
+    rows = np.repeat(np.arange(n), sizes)
+    flat_events = np.asarray(flat_events, dtype=object)
+    keep = np.isin(flat_events, le.classes_)
+    rows = rows[keep]
+    lengths = np.bincount(rows, minlength=n)
+    encoded = le.transform(flat_events[keep].astype(str))
+    scaled = scaler.transform(np.asarray(flat_times, dtype='float64')[keep].reshape(-1, 1)).ravel()
+    starts = np.cumsum(lengths) - lengths
+    cols = np.arange(len(rows)) - starts[rows] + width - lengths[rows]
+    fits = cols >= 0
+    ev_in[rows[fits], cols[fits]] = encoded[fits]
+    dt_in[rows[fits], cols[fits]] = scaled[fits]
+    return ev_in, dt_in
+
+def compiled_encode(pipeline, histories, width):
+    return pipeline.encode_batch(histories, width)[:2]
+
+
+def make_histories(pipeline, tabs, history, seed=0):
+    rng = np.random.default_rng(seed)
+    classes = list(pipeline.classes) + ['tabDiscarded']  # one type the model never saw
+    return [
+        ([str(classes[i]) for i in rng.integers(0, len(classes), history)],
+         rng.exponential(60.0, history).round(3).tolist())
+        for _ in range(tabs)
+    ]
+
+def run(tabs_list, history, width, repeat):
+    pipeline = FeaturePipeline.load(MODELS_DIR)
+    variants = {'legacy': legacy_encode, 'sklearn': sklearn_encode, 'compiled': compiled_encode}
+    results = []
+    for tabs in tabs_list:
+        histories = make_histories(pipeline, tabs, history)
+        reference = compiled_encode(pipeline, histories, width)
+        for name, fn in variants.items():
+            ev_in, dt_in = fn(pipeline, histories, width)
+            assert (ev_in == reference[0]).all() and np.allclose(dt_in, reference[1], atol=1e-6), name
+            us = np.array(time_call(lambda: fn(pipeline, histories, width), repeat)) * 1e6
+            results.append({
+                'variant': name, 'tabs': tabs, 'history': history, 'width': width,
+                'runs': len(us),
+                'p50_us': round(float(np.percentile(us, 50)), 2),
+                'p95_us': round(float(np.percentile(us, 95)), 2),
+                'per_tab_us': round(float(np.percentile(us, 50)) / tabs, 3),
+            })
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Preprocessing micro-benchmark')
+    parser.add_argument('--tabs', type=int, nargs='+', default=[1, 10, 100, 500])
+    parser.add_argument('--history', type=int, default=20, help='events per tab')
+    parser.add_argument('--width', type=int, default=15, help='model sequence length')
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--json', help="write results to this file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    results = run(args.tabs, args.history, args.width, args.repeat)
+    print(f"{'variant':10} {'tabs':>5} {'p50 µs':>10} {'p95 µs':>10} {'µs/tab':>8}")
+    for r in results:
+        print(f"{r['variant']:10} {r['tabs']:5} {r['p50_us']:10.1f} "
+              f"{r['p95_us']:10.1f} {r['per_tab_us']:8.2f}")
+    if args.json:
+        write_json(args.json, 'preprocessing', vars(args), results)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Side-by-side report of the float32 / float16 / int8 model artifacts.
+
+For every model and precision: artifact size, resident weight bytes, accuracy
+on the notebooks' validation split (the last 20% of next-event windows, as
+Keras' validation_split=0.2 takes them), agreement with float32, and the
+forward-pass latency per batch size.
+
+    python Models/export_weights.py --precision float32 float16 int8
+    python Benchmarks/bench_quantized.py --csv user_data.csv --json quantized.json
+"""
+import os
+import sys
+import argparse
+import warnings
+
+import numpy as np
+
+from bench_models import DEFAULT_MODEL_DIR, MODEL_FILES
+from common import DEFAULT_CSV, MODELS_DIR, latency_summary, time_call, write_json
+sys.path.insert(0, MODELS_DIR)
+from features import FeaturePipeline, load_windows  # noqa: E402
+from numpy_lstm import PRECISIONS, NumpyModel  # noqa: E402
+
+warnings.filterwarnings('ignore')  # sklearn pickle-version / feature-name warnings
+
+
+def validation_split(X_events, X_deltas, y, fraction=0.2):
+    split = int(len(y) * (1 - fraction))
+    return X_events[split:], X_deltas[split:], y[split:]
+
+def run(names, precisions, model_dir, csv_path, tabs_list, repeat):
+    pipeline = FeaturePipeline.load(MODELS_DIR)
+    windows = {}
+    results = []
+    for name in names:
+        reference = None
+        for precision in precisions:
+            path = os.path.join(model_dir, MODEL_FILES[name] + PRECISIONS[precision] + '.npz')
+            if not os.path.exists(path):
+                print(f"[INFO] Missing {path} (run export_weights.py --precision {precision})")
+                continue
+            model = NumpyModel.load(path)
+            model.release_float_weights()
+
+            if model.seq_len not in windows:
+                windows[model.seq_len] = validation_split(
+                    *load_windows(csv_path, pipeline, model.seq_len))
+            ev, dt, y = windows[model.seq_len]
+            inputs = [ev, dt] if model.use_deltas else ev
+            probs = model.predict(inputs) if len(y) else np.zeros((0, model.vocab_size))
+            if reference is None:
+                reference = probs
+            top1 = probs.argmax(axis=1)
+
+            latency = {}
+            rng = np.random.default_rng(0)
+            for tabs in tabs_list:
+                bev = rng.integers(0, model.vocab_size, (tabs, model.seq_len)).astype('int32')
+                bdt = rng.random((tabs, model.seq_len)).astype('float32')
+                batch = [bev, bdt] if model.use_deltas else bev
+                latency[str(tabs)] = latency_summary(time_call(lambda: model.predict(batch), repeat))
+
+            results.append({
+                'model': name, 'precision': precision,
+                'file_kb': round(os.path.getsize(path) / 1024, 1),
+                'resident_kb': round(model.nbytes / 1024, 1),
+                'val_windows': int(len(y)),
+                'val_accuracy': round(float((top1 == y).mean()), 4) if len(y) else None,
+                'agreement_vs_float32': round(float((top1 == reference.argmax(axis=1)).mean()), 4)
+                                        if len(y) else None,
+                'max_abs_dp_vs_float32': float(np.abs(probs - reference).max()) if len(y) else None,
+                'latency': latency,
+            })
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare float32 / float16 / int8 model artifacts')
+    parser.add_argument('--models', nargs='+', default=list(MODEL_FILES), choices=list(MODEL_FILES))
+    parser.add_argument('--precision', nargs='+', default=list(PRECISIONS), choices=list(PRECISIONS))
+    parser.add_argument('--csv', default=DEFAULT_CSV, help='log (or Arrow dir) to build windows from')
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    parser.add_argument('--tabs', type=int, nargs='+', default=[1, 100])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--json', help="write results to this file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    results = run(args.models, args.precision, args.model_dir, args.csv, args.tabs, args.repeat)
+    header = f"{'model':8} {'precision':9} {'file KB':>8} {'res KB':>7} {'val acc':>8} {'agree':>6} {'max|Δp|':>9}"
+    header += ''.join(f" {'p50@' + str(t):>9}" for t in args.tabs)
+    print(header)
+    for r in results:
+        line = (f"{r['model']:8} {r['precision']:9} {r['file_kb']:8.1f} {r['resident_kb']:7.1f} "
+                f"{r['val_accuracy'] or 0:8.4f} {r['agreement_vs_float32'] or 0:6.3f} "
+                f"{r['max_abs_dp_vs_float32'] or 0:9.2e}")
+        line += ''.join(f" {r['latency'][str(t)]['p50_ms']:7.3f}ms" for t in args.tabs)
+        print(line)
+    if args.json:
+        write_json(args.json, 'quantized', vars(args), results)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""Shared helpers for the benchmark scripts: replay data, latency stats, process monitoring, JSON output."""
+import os
+import ast
+import csv
+import calendar
+import sys
+import json
+import time
+import platform
+import threading
+import subprocess
+from collections import defaultdict
+
+import numpy as np
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+MODELS_DIR = os.path.join(ROOT, 'Models')
+DEFAULT_CSV = os.path.join(ROOT, 'Data_Collecting_Extension', 'user_data.csv')
+sys.path.insert(0, MODELS_DIR)
+# rows the collector writes itself; the extension never sends them
+from features import SERVER_SIDE_TYPES  # noqa: E402
+
+
+# ─── Replay data ───────────────────────────────────────────────────────────────
+def read_events(csv_path=DEFAULT_CSV, fill_timestamps=False):
+    """
+    Event dicts from a collector user_data.csv, in log order (bad rows skipped).
+
+    fill_timestamps: give rows the collector wrote itself (resourceUsage, which
+    has no 'timestamp') one in epoch ms from the row's wall-clock column. That
+    column is in the collector's local time, so it is shifted by the offset
+    the timestamped rows show (rounded to 15 minutes).
+    """
+    rows = []
+    with open(csv_path, newline='', encoding='cp1252', errors='replace') as f:
+        for row in csv.reader(f):
+            if len(row) != 3 or row[0] == 'timestamp':
+                continue
+            try:
+                data = ast.literal_eval(row[2])
+            except (ValueError, SyntaxError):
+                continue
+            if isinstance(data, dict):
+                rows.append((row[0], data))
+    if not fill_timestamps:
+        return [data for _, data in rows]
+
+    def wall_ms(text):
+        try:
+            return calendar.timegm(time.strptime(text, '%Y-%m-%d %H:%M:%S')) * 1000.0
+        except ValueError:
+            return None
+    offsets = [data['timestamp'] - wall for wall, data in ((wall_ms(t), d) for t, d in rows)
+               if wall is not None and isinstance(data.get('timestamp'), (int, float))]
+    quarter = 15 * 60 * 1000
+    offset = round(float(np.median(offsets)) / quarter) * quarter if offsets else 0.0
+    events = []
+    for text, data in rows:
+        if not isinstance(data.get('timestamp'), (int, float)):
+            wall = wall_ms(text)
+            if wall is None:
+                continue
+            data['timestamp'] = wall + offset
+        events.append(data)
+    return events
+
+def event_tab_ids(event, active=None):
+    """
+    Tabs an event belongs to: the ones it names (tabId, toTab, tabIds), or the
+    active tab for window/idle events that name none.
+    """
+    tabs = [event[k] for k in ('tabId', 'toTab') if isinstance(event.get(k), int)]
+    tabs += [t for t in event.get('tabIds') or [] if isinstance(t, int)]
+    if not tabs and active is not None:
+        tabs = [active]
+    return tabs
+
+def tab_histories(events, n_tabs, max_history=20):
+    """
+    Per-tab (event_sequence, time_sequence, timestamp_sequence) as the
+    predicting extension would send them.
+
+    Events are attributed to the tab(s) they name (tabId, toTab, tabIds);
+    window/idle events go to the tab that was last switched to. When the log
+    has fewer tabs than n_tabs, real histories are reused for the extra tabs.
+    """
+    per_tab = defaultdict(list)
+    active = None
+    for e in events:
+        if e.get('type') in SERVER_SIDE_TYPES or not isinstance(e.get('timestamp'), (int, float)):
+            continue
+        if e.get('type') == 'tabSwitched' and isinstance(e.get('toTab'), int):
+            active = e['toTab']
+        for tab in event_tab_ids(e, active):
+            per_tab[tab].append((e['type'], e['timestamp']))
+
+    real = [h for h in per_tab.values() if len(h) > 1]
+    if not real:
+        raise ValueError('no per-tab histories in the log')
+    histories = []
+    for i in range(n_tabs):
+        hist = real[i % len(real)][-max_history:]
+        stamps = [ts for _, ts in hist]
+        deltas = [0.0] + [(b - a) / 1000.0 for a, b in zip(stamps, stamps[1:])]
+        histories.append(([t for t, _ in hist], deltas, stamps))
+    return histories
+
+
+# ─── Statistics ────────────────────────────────────────────────────────────────
+def latency_summary(seconds):
+    """p50/p95/p99/mean/max in milliseconds for a list of latencies in seconds."""
+    if not len(seconds):
+        return {'count': 0}
+    ms = np.asarray(seconds, dtype='float64') * 1000.0
+    return {
+        'count':   int(len(ms)),
+        'p50_ms':  round(float(np.percentile(ms, 50)), 3),
+        'p95_ms':  round(float(np.percentile(ms, 95)), 3),
+        'p99_ms':  round(float(np.percentile(ms, 99)), 3),
+        'mean_ms': round(float(ms.mean()), 3),
+        'max_ms':  round(float(ms.max()), 3),
+    }
+
+def time_call(fn, repeat, min_seconds=0.2):
+    """Latencies (seconds) of repeated fn() calls after one warm-up call."""
+    fn()
+    samples, started = [], time.perf_counter()
+    while len(samples) < repeat or time.perf_counter() - started < min_seconds:
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+# ─── Server process monitoring ─────────────────────────────────────────────────
+def find_listening_pid(port):
+    """PID of the process listening on a local TCP port (None if it can't be seen)."""
+    import psutil
+    try:
+        for conn in psutil.net_connections(kind='tcp'):
+            if conn.status == psutil.CONN_LISTEN and conn.laddr and conn.laddr.port == port:
+                return conn.pid
+    except psutil.AccessDenied:
+        pass
+    return None
+
+class ProcessMonitor:
+    """Samples a process's RSS and CPU% on a background thread while a load test runs."""
+
+    def __init__(self, pid, interval=0.25):
+        import psutil
+        self.proc = psutil.Process(pid) if pid else None
+        self.interval = interval
+        self._samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='monitor', daemon=True)
+
+    def __enter__(self):
+        if self.proc is not None:
+            self.proc.cpu_percent(None)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _loop(self):
+        import psutil
+        children = {}  # pid → Process, kept so cpu_percent() has a baseline
+        while not self._stop.wait(self.interval):
+            try:
+                rss = self.proc.memory_info().rss
+                cpu = self.proc.cpu_percent(None)
+            except psutil.Error:
+                return
+            # pre-fork servers (gunicorn): count the workers too
+            for child in self.proc.children(recursive=True):
+                if child.pid not in children:
+                    children[child.pid] = child
+                    child.cpu_percent(None)
+            for pid, child in list(children.items()):
+                try:
+                    rss += child.memory_info().rss
+                    cpu += child.cpu_percent(None)
+                except psutil.Error:
+                    children.pop(pid)
+            self._samples.append((rss, cpu))
+
+    def summary(self):
+        if not self._samples:
+            return None
+        rss = np.array([s[0] for s in self._samples], dtype='float64') / 2**20
+        cpu = np.array([s[1] for s in self._samples], dtype='float64')
+        return {
+            'pid':          self.proc.pid,
+            'rss_mb_start': round(float(rss[0]), 1),
+            'rss_mb_peak':  round(float(rss.max()), 1),
+            'rss_mb_end':   round(float(rss[-1]), 1),
+            'cpu_pct_mean': round(float(cpu.mean()), 1),
+            'cpu_pct_peak': round(float(cpu.max()), 1),
+        }
+
+
+# ─── Output ────────────────────────────────────────────────────────────────────
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'time':     time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit':   commit or None,
+        'python':   platform.python_version(),
+        'platform': platform.platform(),
+        'cpus':     os.cpu_count(),
+    }
+
+def write_json(path, benchmark, config, results):
+    """Save one run as JSON ({benchmark, environment, config, results}) for later comparison."""
+    payload = {'benchmark': benchmark, 'environment': environment(),
+               'config': config, 'results': results}
+    if path == '-':
+        json.dump(payload, sys.stdout, indent=2)
+        print()
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    print(f"[INFO] Results written to {path}")
@@ -0,0 +1,169 @@
+"""
+Load test for the running prediction (port 1100) and collector (port 12005) servers.
+
+Replays real tab histories / events from user_data.csv with a closed-loop
+client per concurrency slot, for every (tabs, concurrency) combination:
+
+  predict        one /predict call per tab, the way the extension used to
+  predict_batch  one /predict_batch call per alarm carrying every tab
+  log            one /log call per event
+  log_batch      /log_batch calls of --log-batch events (the logger extension's buffering)
+
+Reports p50/p95/p99 latency, throughput and errors, plus the server's RSS and
+CPU (found through its listening port, or --server-pid). The log scenarios
+append to the collector's log, so point them at a scratch collector.
+
+    python Benchmarks/loadtest.py predict predict_batch --tabs 10 100 500 --concurrency 1 8 --duration 10
+    python Benchmarks/loadtest.py log log_batch --concurrency 4 --json results/log.json
+"""
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from common import DEFAULT_CSV, SERVER_SIDE_TYPES, ProcessMonitor, find_listening_pid, \
+    latency_summary, read_events, tab_histories, write_json
+
+SCENARIOS = ('predict', 'predict_batch', 'log', 'log_batch')
+
+
+def post_json(url, payload, timeout=30.0):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        resp.read()
+        return resp.status
+
+def request_factory(scenario, args, histories, events):
+    """Zero-argument callables producing (url, payload) for each request of a scenario."""
+    counter = iter(range(1 << 62))
+    lock = threading.Lock()
+
+    def next_index():
+        with lock:
+            return next(counter)
+
+    if scenario == 'predict':
+        def make():
+            ev, dt, ts = histories[next_index() % len(histories)]
+            body = {'event_sequence': ev, 'time_sequence': dt, 'timestamp_sequence': ts,
+                    'temperature': 1.0}
+            if args.model:
+                body['model'] = args.model
+            return args.predict_url + '/predict', body
+    elif scenario == 'predict_batch':
+        def make():
+            body = {'tabs': [{'tab_id': i, 'event_sequence': ev, 'time_sequence': dt}
+                             for i, (ev, dt, _) in enumerate(histories)],
+                    'temperature': 1.0}
+            if args.model:
+                body['model'] = args.model
+            return args.predict_url + '/predict_batch', body
+    elif scenario == 'log':
+        def make():
+            return args.log_url + '/log', events[next_index() % len(events)]
+    else:
+        def make():
+            start = next_index() * args.log_batch
+            return args.log_url + '/log_batch', [
+                events[(start + i) % len(events)] for i in range(args.log_batch)
+            ]
+    return make
+
+def run_scenario(make_request, concurrency, duration, max_requests):
+    """Closed loop: each worker sends its next request as soon as the last one returns."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+    sent = [0]
+
+    def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            with lock:
+                if max_requests and sent[0] >= max_requests:
+                    return
+                sent[0] += 1
+            url, payload = make_request()
+            t0 = time.perf_counter()
+            try:
+                ok = post_json(url, payload) == 200
+            except (urllib.error.URLError, OSError):
+                ok = False
+            elapsed = time.perf_counter() - t0
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+    return latencies, errors, wall
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the prediction and logging servers')
+    parser.add_argument('scenarios', nargs='*', default=['predict', 'log'], choices=SCENARIOS)
+    parser.add_argument('--tabs', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per run')
+    parser.add_argument('--requests', type=int, default=0, help='stop a run after N requests')
+    parser.add_argument('--history', type=int, default=20, help='events per tab history')
+    parser.add_argument('--log-batch', type=int, default=50, help='events per /log_batch call')
+    parser.add_argument('--model', help="'model' field for /predict* (server default if unset)")
+    parser.add_argument('--predict-url', default='http://localhost:1100')
+    parser.add_argument('--log-url', default='http://localhost:12005')
+    parser.add_argument('--server-pid', type=int, help='pid to monitor instead of the port owner')
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--json', help="write results to this file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    events = read_events(args.csv)
+    client_events = [e for e in events if e.get('type') not in SERVER_SIDE_TYPES]
+
+    results = []
+    for scenario in args.scenarios:
+        url = args.predict_url if scenario.startswith('predict') else args.log_url
+        pid = args.server_pid or find_listening_pid(urlparse(url).port)
+        # tab count only shapes the predict scenarios
+        tab_counts = args.tabs if scenario.startswith('predict') else [None]
+        for tabs in tab_counts:
+            histories = tab_histories(events, tabs or 1, args.history)
+            make_request = request_factory(scenario, args, histories, client_events)
+            for concurrency in args.concurrency:
+                with ProcessMonitor(pid) as monitor:
+                    latencies, errors, wall = run_scenario(
+                        make_request, concurrency, args.duration, args.requests
+                    )
+                result = {
+                    'scenario': scenario, 'tabs': tabs, 'concurrency': concurrency,
+                    'wall_s': round(wall, 3), 'errors': errors,
+                    'throughput_rps': round(len(latencies) / wall, 2) if wall else 0.0,
+                    'latency': latency_summary(latencies),
+                    'server': monitor.summary(),
+                }
+                if scenario == 'predict_batch':
+                    result['tabs_per_s'] = round(result['throughput_rps'] * tabs, 1)
+                results.append(result)
+                lat = result['latency']
+                server = result['server'] or {}
+                print(f"[INFO] {scenario:13} tabs={str(tabs or '-'):>4} c={concurrency:<3} "
+                      f"{result['throughput_rps']:8.1f} req/s  "
+                      f"p50={lat.get('p50_ms', 0):8.2f}ms p95={lat.get('p95_ms', 0):8.2f}ms "
+                      f"p99={lat.get('p99_ms', 0):8.2f}ms err={errors}  "
+                      f"rss={server.get('rss_mb_peak', '?')}MB cpu={server.get('cpu_pct_mean', '?')}%")
+
+    if args.json:
+        write_json(args.json, 'loadtest', vars(args), results)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
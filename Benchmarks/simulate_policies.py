@@ -0,0 +1,393 @@
+"""
+Offline trace replay of tab discard policies.
+
+Recorded event streams (collector user_data.csv files) are replayed and,
+every --interval minutes of trace time, each policy picks the tabs it would
+discard. A discarded tab stays discarded until it is closed or the user
+switches back to it; switching back is a reload, and a mis-discard when it
+comes within --reactivation-min of the discard. Reported per policy:
+discards, reloads, mis-discards and memory saved (time-averaged and peak MB,
+and GB-hours).
+
+Policies:
+    model:<name>  the saved model (numpy backend) predicts each tab's next event;
+                  tabs predicted to close that pass the rules are discarded,
+                  as the predicting extension does
+    rules         every tab that passes the shouldDiscard() rules
+    lru           keep the --lru-keep most recently used tabs loaded
+    chrome        Chrome's defaults: Memory Saver discards tabs inactive for
+                  --chrome-inactive-min, and while system memory is above
+                  --pressure-pct of --ram-gb one more tab per tick, LRU first
+    logged        the discards actually recorded (discardWithLog's
+                  tabAboutToBeDiscarded rows and tabDiscarded)
+
+Only the recent-activity and origin-whitelist checks of shouldDiscard() can
+be replayed; pinned, audible and unsaved-form state is not logged. A tab's
+memory is its latest tabMemory attribution when the collector made one, or
+else Chrome's memory spread over the open tabs.
+
+Traces (one per file, or per session with --split-idle-min) x policies run
+in a process pool.
+
+    python Benchmarks/simulate_policies.py logs/*.csv --policies model:attn rules lru chrome logged
+"""
+import os
+import sys
+import time
+import argparse
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bench_models import DEFAULT_MODEL_DIR, MODEL_FILES
+from common import DEFAULT_CSV, MODELS_DIR, event_tab_ids, read_events, write_json
+sys.path.insert(0, MODELS_DIR)
+from features import EXCLUDED_TYPES, FeaturePipeline  # noqa: E402
+from numpy_lstm import NumpyModel  # noqa: E402
+
+warnings.filterwarnings('ignore')  # sklearn pickle-version / feature-name warnings
+
+# mirrors Predicting_Extension/background.js
+DISCARD_PREDICTIONS = ('tabRemoved', 'windowRemoved')
+MAX_HISTORY = 20
+RECENTLY_ACTIVE_MS = 10 * 60 * 1000
+WHITELIST = ('https://mail.google.com',)
+
+BASE_POLICIES = ('rules', 'lru', 'chrome', 'logged')
+LOGGED_DISCARDS = ('tabAboutToBeDiscarded', 'tabDiscarded')
+# rows that are not user activity (the models' exclusion list): kept out of the tab histories
+NOT_HISTORY = EXCLUDED_TYPES
+
+
+# ─── Traces ────────────────────────────────────────────────────────────────────
+def load_traces(paths, split_idle_min=0):
+    """[(name, events sorted by timestamp)], one per file or per session."""
+    traces = []
+    for path in paths:
+        events = read_events(path, fill_timestamps=True)
+        events.sort(key=lambda e: e['timestamp'])
+        name = os.path.basename(path)
+        if not split_idle_min or not events:
+            traces.append((name, events))
+            continue
+        gap = split_idle_min * 60 * 1000
+        start = 0
+        for i in range(1, len(events) + 1):
+            if i == len(events) or events[i]['timestamp'] - events[i - 1]['timestamp'] > gap:
+                traces.append((f"{name}#{len(traces)}", events[start:i]))
+                start = i
+    return [t for t in traces if t[1]]
+
+
+def origin(url):
+    parts = (url or '').split('/')
+    return '/'.join(parts[:3]) if len(parts) > 2 else ''
+
+
+# ─── Models (loaded once per worker process) ───────────────────────────────────
+_models = {}
+_pipeline = None
+
+def load_model(name, model_dir):
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = FeaturePipeline.load(MODELS_DIR)
+    if name not in _models:
+        _models[name] = NumpyModel.load(os.path.join(model_dir, MODEL_FILES[name] + '.npz'))
+    return _models[name], _pipeline
+
+def sample_rows(probs, temperature, rng):
+    """Class index per row: argmax at temperature 0, else the server's temperature sampling."""
+    if temperature <= 0:
+        return probs.argmax(axis=1)
+    logits = np.log(probs.astype('float64') + 1e-8) / temperature
+    p = np.exp(logits - logits.max(axis=1, keepdims=True))
+    p /= p.sum(axis=1, keepdims=True)
+    return (p.cumsum(axis=1) < rng.random((len(p), 1))).sum(axis=1).clip(max=p.shape[1] - 1)
+
+
+# ─── Replay ────────────────────────────────────────────────────────────────────
+class _Tab:
+    __slots__ = ('switched_at', 'seen_at', 'url', 'history', 'probs', 'discarded_at',
+                 'discarded_bytes')
+
+    def __init__(self, ts):
+        self.switched_at = None   # last switch to the tab (shouldDiscard's recent-activity rule)
+        self.seen_at = ts         # last time it was active or first seen (LRU order)
+        self.url = None
+        self.history = []         # [(type, ts)], the last MAX_HISTORY events
+        self.probs = None         # model output for this history (None = stale)
+        self.discarded_at = None
+        self.discarded_bytes = 0
+
+
+class Replay:
+    def __init__(self, policy, config):
+        self.policy = policy
+        self.config = config
+        self.tabs = {}
+        self.active = None
+        self.tab_memory = {}      # tabId → latest attributed bytes
+        self.chrome_memory = 0
+        self.tab_count = 0
+        self.system_used = 0
+        self.saved = []           # (discarded at, ended at, bytes)
+        self.reloads = []         # (discarded at, reactivated at)
+        self.closed_discarded = 0
+        self.model_calls = 0
+        self.rng = np.random.default_rng(config['seed'])
+        if policy.startswith('model:'):
+            self.model, self.pipeline = load_model(policy.split(':', 1)[1], config['model_dir'])
+
+    # ── state ──
+    def tab(self, tab_id, ts):
+        t = self.tabs.get(tab_id)
+        if t is None:
+            t = self.tabs[tab_id] = _Tab(ts)
+        return t
+
+    def memory_of(self, tab_id):
+        if tab_id in self.tab_memory:
+            return self.tab_memory[tab_id]
+        open_tabs = max(self.tab_count, len(self.tabs), 1)
+        return self.chrome_memory // open_tabs
+
+    def discard(self, tab_id, ts):
+        t = self.tabs.get(tab_id)
+        if t is None or t.discarded_at is not None or tab_id == self.active:
+            return
+        t.discarded_at, t.discarded_bytes = ts, self.memory_of(tab_id)
+
+    def restore(self, t, ts):
+        self.saved.append((t.discarded_at, ts, t.discarded_bytes))
+        t.discarded_at = None
+
+    def apply(self, e):
+        kind, ts = e.get('type'), e['timestamp']
+        if kind == 'resourceUsage':
+            self.chrome_memory = e.get('chrome_renderer_memory_bytes') or e.get('chrome_memory_bytes', 0)
+            self.system_used = e.get('system_memory_used_bytes', 0)
+            return
+        if kind == 'periodicBrowserStats':
+            self.tab_count = e.get('tabCount', 0) or 0
+            return
+        if kind == 'tabMemory':
+            self.tab_memory[e.get('tabId')] = e.get('memory_bytes', 0)
+            return
+        if kind in LOGGED_DISCARDS:
+            if self.policy == 'logged' and isinstance(e.get('tabId'), int):
+                self.tab(e['tabId'], ts)
+                self.discard(e['tabId'], ts)
+            return
+
+        if kind == 'tabSwitched' and isinstance(e.get('toTab'), int):
+            if self.active in self.tabs:
+                self.tabs[self.active].seen_at = ts
+            t = self.tab(e['toTab'], ts)
+            if t.discarded_at is not None:
+                self.reloads.append((t.discarded_at, ts))
+                self.restore(t, ts)
+            t.switched_at = t.seen_at = ts
+            self.active = e['toTab']
+
+        for tab_id in event_tab_ids(e, self.active):
+            if kind == 'tabRemoved':
+                t = self.tabs.pop(tab_id, None)
+                if t is not None and t.discarded_at is not None:
+                    self.closed_discarded += 1
+                    self.restore(t, ts)
+                continue
+            t = self.tab(tab_id, ts)
+            if kind == 'tabCreated':
+                t.url = e.get('url')
+            elif kind == 'tabUpdated':
+                t.url = e.get('newUrl', t.url)
+            if kind not in NOT_HISTORY:
+                t.history.append((kind, ts))
+                del t.history[:-MAX_HISTORY]
+                t.probs = None
+
+    # ── policies ──
+    def loaded(self):
+        return [i for i, t in self.tabs.items() if t.discarded_at is None and i != self.active]
+
+    def passes_rules(self, t, now):
+        if t.switched_at is not None and now - t.switched_at < RECENTLY_ACTIVE_MS:
+            return False
+        return origin(t.url) not in WHITELIST
+
+    def predicted_to_close(self, tab_ids):
+        # a tab's probabilities only change with its history, so the model runs
+        # once per batch of changed tabs, not once per tab per tick
+        stale = [self.tabs[i] for i in tab_ids if self.tabs[i].probs is None]
+        if stale:
+            histories = []
+            for t in stale:
+                stamps = [ts for _, ts in t.history]
+                deltas = [0.0] + [(b - a) / 1000.0 for a, b in zip(stamps, stamps[1:])]
+                histories.append(([k for k, _ in t.history], deltas))
+            model = self.model
+            ev_in, dt_in, lengths = self.pipeline.encode_batch(histories, model.seq_len)
+            probs = model.predict([ev_in, dt_in] if model.use_deltas else ev_in)
+            self.model_calls += 1
+            for t, p, n in zip(stale, probs, lengths):
+                t.probs = p if n > 0 else False  # False: no known events, never predicted
+        known = [i for i in tab_ids if self.tabs[i].probs is not False]
+        if not known:
+            return []
+        probs = np.stack([self.tabs[i].probs for i in known])
+        picked = self.pipeline.classes[sample_rows(probs, self.config['temperature'], self.rng)]
+        return [i for i, p in zip(known, picked) if p in DISCARD_PREDICTIONS]
+
+    def decide(self, now):
+        cfg = self.config
+        if self.policy == 'logged':
+            return
+        if self.policy == 'rules' or self.policy.startswith('model:'):
+            eligible = [i for i in self.loaded() if self.passes_rules(self.tabs[i], now)]
+            if self.policy != 'rules' and eligible:
+                eligible = self.predicted_to_close(eligible)
+            for i in eligible:
+                self.discard(i, now)
+            return
+
+        by_recency = sorted(self.loaded(), key=lambda i: self.tabs[i].seen_at, reverse=True)
+        if self.policy == 'lru':
+            # the active tab is one of the tabs kept
+            for i in by_recency[max(cfg['lru_keep'] - 1, 0):]:
+                self.discard(i, now)
+        elif self.policy == 'chrome':
+            idle_ms = cfg['chrome_inactive_min'] * 60 * 1000
+            for i in by_recency:
+                if now - self.tabs[i].seen_at >= idle_ms:
+                    self.discard(i, now)
+            freed = sum(t.discarded_bytes for t in self.tabs.values() if t.discarded_at is not None)
+            limit = cfg['pressure_pct'] / 100.0 * cfg['ram_gb'] * 2**30
+            candidates = [i for i in reversed(by_recency) if self.tabs[i].discarded_at is None]
+            if self.system_used - freed >= limit and candidates:
+                self.discard(candidates[0], now)
+
+    # ── run ──
+    def run(self, events):
+        interval = self.config['interval_min'] * 60 * 1000
+        start, end = events[0]['timestamp'], events[-1]['timestamp']
+        next_tick = start + interval
+        ticks = 0
+        for e in events:
+            while e['timestamp'] >= next_tick:
+                self.decide(next_tick)
+                next_tick += interval
+                ticks += 1
+            self.apply(e)
+        for t in self.tabs.values():
+            if t.discarded_at is not None:
+                self.restore(t, end)
+        return self.summary(end - start, ticks)
+
+    def summary(self, duration_ms, ticks):
+        window = self.config['reactivation_min'] * 60 * 1000
+        saved = np.array(self.saved, dtype='float64').reshape(-1, 3)
+        starts, ends, nbytes = saved.T
+        byte_ms = float((nbytes * (ends - starts)).sum())
+        # peak concurrently discarded: +bytes at each discard, -bytes at each restore
+        times = np.concatenate([starts, ends])
+        steps = np.concatenate([nbytes, -nbytes])
+        order = np.lexsort((steps, times))  # restores first at equal times
+        peak = float(np.cumsum(steps[order]).max()) if len(order) else 0.0
+        reloads = np.array(self.reloads, dtype='float64').reshape(-1, 2)
+        return {
+            'duration_h':            round(duration_ms / 3.6e6, 3),
+            'ticks':                 ticks,
+            'discards':              len(self.saved),
+            'reloads':               len(reloads),
+            'mis_discards':          int(((reloads[:, 1] - reloads[:, 0]) <= window).sum()),
+            'closed_while_discarded': self.closed_discarded,
+            'saved_mb_mean':         round(byte_ms / duration_ms / 2**20, 1) if duration_ms else 0.0,
+            'saved_mb_peak':         round(peak / 2**20, 1),
+            'saved_gb_h':            round(byte_ms / 3.6e6 / 2**30, 3),
+            'model_calls':           self.model_calls,
+        }
+
+
+def simulate(job):
+    """One (trace, policy) replay; runs in a worker process."""
+    name, events, policy, config = job
+    started = time.perf_counter()
+    result = Replay(policy, config).run(events)
+    result.update(trace=name, policy=policy, sim_s=round(time.perf_counter() - started, 3))
+    return result
+
+
+# ─── Report ────────────────────────────────────────────────────────────────────
+def aggregate(results, policies):
+    """Totals per policy over all traces (saved_mb_mean weighted by trace duration)."""
+    totals = []
+    for policy in policies:
+        rows = [r for r in results if r['policy'] == policy]
+        hours = sum(r['duration_h'] for r in rows)
+        total = {'policy': policy, 'traces': len(rows), 'duration_h': round(hours, 3)}
+        for key in ('discards', 'reloads', 'mis_discards', 'closed_while_discarded', 'model_calls'):
+            total[key] = sum(r[key] for r in rows)
+        total['saved_gb_h'] = round(sum(r['saved_gb_h'] for r in rows), 3)
+        total['saved_mb_mean'] = round(total['saved_gb_h'] * 1024 / hours, 1) if hours else 0.0
+        total['saved_mb_peak'] = max((r['saved_mb_peak'] for r in rows), default=0.0)
+        total['mis_discard_rate'] = round(total['mis_discards'] / total['discards'], 3) \
+            if total['discards'] else 0.0
+        totals.append(total)
+    return totals
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay recorded traces against discard policies')
+    parser.add_argument('traces', nargs='*', default=[DEFAULT_CSV], help='collector user_data.csv files')
+    parser.add_argument('--policies', nargs='+',
+                        default=[f'model:{m}' for m in MODEL_FILES] + list(BASE_POLICIES))
+    parser.add_argument('--split-idle-min', type=float, default=0,
+                        help='split traces into sessions at gaps longer than this (0 = one trace per file)')
+    parser.add_argument('--interval', dest='interval_min', type=float, default=1.0,
+                        help='minutes between policy decisions (the extension alarm)')
+    parser.add_argument('--reactivation-min', type=float, default=30.0,
+                        help='a reload within this many minutes of the discard is a mis-discard')
+    parser.add_argument('--temperature', type=float, default=1.0,
+                        help='model sampling temperature as sent by the extension (0 = argmax)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--lru-keep', type=int, default=8)
+    parser.add_argument('--chrome-inactive-min', type=float, default=120.0)
+    parser.add_argument('--pressure-pct', type=float, default=85.0)
+    parser.add_argument('--ram-gb', type=float, default=8.0)
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--json', help="write results to this file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    for policy in args.policies:
+        if policy not in BASE_POLICIES and policy.split(':', 1)[-1] not in MODEL_FILES:
+            parser.error(f"unknown policy {policy!r}")
+    config = {k: getattr(args, k) for k in ('interval_min', 'reactivation_min', 'temperature', 'seed',
+                                            'lru_keep', 'chrome_inactive_min', 'pressure_pct',
+                                            'ram_gb', 'model_dir')}
+
+    started = time.perf_counter()
+    traces = load_traces(args.traces, args.split_idle_min)
+    jobs = [(name, events, policy, config) for name, events in traces for policy in args.policies]
+    print(f"[INFO] {len(traces)} traces x {len(args.policies)} policies on {args.workers} workers")
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(simulate, jobs))
+    else:
+        results = [simulate(job) for job in jobs]
+    totals = aggregate(results, args.policies)
+    print(f"[INFO] Replayed in {time.perf_counter() - started:.1f}s")
+
+    print(f"{'policy':14} {'discards':>8} {'reloads':>7} {'mis':>5} {'mis %':>6} "
+          f"{'saved MB':>9} {'peak MB':>8} {'GB·h':>8}")
+    for t in totals:
+        print(f"{t['policy']:14} {t['discards']:8d} {t['reloads']:7d} {t['mis_discards']:5d} "
+              f"{t['mis_discard_rate'] * 100:5.1f}% {t['saved_mb_mean']:9.1f} "
+              f"{t['saved_mb_peak']:8.1f} {t['saved_gb_h']:8.3f}")
+    if args.json:
+        write_json(args.json, 'simulate_policies', vars(args), {'totals': totals, 'traces': results})
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,15 +2,58 @@
 let currentTabId = null;
 let tabStartTime = null;
 
+// Events are buffered and shipped to /log_batch in one request once
+// FLUSH_MAX_EVENTS are pending or FLUSH_INTERVAL_MS has passed.
+const FLUSH_MAX_EVENTS = 50;
+const FLUSH_INTERVAL_MS = 2000;
+// gzip bodies larger than this (CompressionStream is built into Chrome)
+const GZIP_MIN_BYTES = 1024;
+
+let pendingEvents = [];
+let flushTimer = null;
+
 // Function to send data to the external application
 function sendData(data) {
-  fetch('http://localhost:12005/log', {
+  pendingEvents.push(data);
+  if (pendingEvents.length >= FLUSH_MAX_EVENTS) {
+    flushEvents();
+  } else if (flushTimer === null) {
+    flushTimer = setTimeout(flushEvents, FLUSH_INTERVAL_MS);
+  }
+}
+
+async function gzip(text) {
+  const stream = new Blob([text]).stream().pipeThrough(new CompressionStream('gzip'));
+  return new Response(stream).arrayBuffer();
+}
+
+async function flushEvents() {
+  if (flushTimer !== null) {
+    clearTimeout(flushTimer);
+    flushTimer = null;
+  }
+  if (pendingEvents.length === 0) return;
+  const batch = pendingEvents;
+  pendingEvents = [];
+
+  const json = JSON.stringify(batch);
+  const headers = { 'Content-Type': 'application/json' };
+  let body = json;
+  if (json.length >= GZIP_MIN_BYTES) {
+    body = await gzip(json);
+    headers['Content-Encoding'] = 'gzip';
+  }
+  fetch('http://localhost:12005/log_batch', {
     method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify(data)
+    headers,
+    body,
+    keepalive: true
   }).catch(err => console.error("Error sending data: ", err));
 }
 
+// Don't lose buffered events when the service worker is shut down
+chrome.runtime.onSuspend.addListener(flushEvents);
+
 // Helper to get current timestamp in milliseconds
 function now() {
   return Date.now();
@@ -246,4 +289,31 @@ setInterval(() => {
       timestamp: now()
     });
   });
-}, 30000);
\ No newline at end of file
+}, 30000);
+
+/* ----------------------- TAB → PROCESS MAPPING ----------------------- */
+
+// Tell the collector which renderer hosts which tabs so it can attribute
+// renderer memory per tab. chrome.processes is only exposed on the
+// dev/canary channels, so this is a no-op elsewhere.
+function reportTabProcesses() {
+  if (!chrome.processes) return;
+  chrome.processes.getProcessInfo([], false, (processes) => {
+    const mapping = Object.values(processes || {})
+      .map(p => ({
+        pid: p.osProcessId,
+        clientId: p.id,
+        type: p.type,
+        tabIds: (p.tasks || []).map(t => t.tabId).filter(id => id !== undefined)
+      }))
+      .filter(p => p.tabIds.length > 0);
+    fetch('http://localhost:12005/tab_processes', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(mapping)
+    }).catch(err => console.error("Error sending tab processes: ", err));
+  });
+}
+
+reportTabProcesses();
+setInterval(reportTabProcesses, 30000);
\ No newline at end of file
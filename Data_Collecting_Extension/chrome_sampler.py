@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+from collections import defaultdict
+
+import psutil
+
+CHROME_NAMES = ('chrome', 'chromium', 'google chrome')
+PROCESS_TYPES = ('browser', 'renderer', 'gpu', 'utility', 'other')
+IS_LINUX = sys.platform.startswith('linux')
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def process_type(cmdline):
+    """Chrome process type from its command line (no --type= → browser)."""
+    for arg in cmdline:
+        if arg.startswith('--type='):
+            kind = arg[len('--type='):]
+            if kind == 'gpu-process':
+                return 'gpu'
+            return kind if kind in PROCESS_TYPES else 'other'
+    return 'browser'
+
+def renderer_client_id(cmdline):
+    """--renderer-client-id=N: the id chrome.processes reports for a renderer."""
+    for arg in cmdline:
+        if arg.startswith('--renderer-client-id='):
+            try:
+                return int(arg.split('=', 1)[1])
+            except ValueError:
+                return None
+    return None
+
+
+# ─── Memory readers ────────────────────────────────────────────────────────────
+SMAPS_FIELDS = (b'Rss', b'Pss', b'Private_Clean', b'Private_Dirty',
+                b'Shared_Clean', b'Shared_Dirty', b'Swap')
+
+def read_smaps_rollup(pid):
+    """{'rss', 'pss', 'uss', 'shared', 'swap'} bytes from /proc/<pid>/smaps_rollup (Linux ≥ 4.14)."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup', 'rb') as f:
+        for line in f:
+            key, _, rest = line.partition(b':')
+            if key in SMAPS_FIELDS:
+                fields[key] = int(rest.split()[0]) * 1024
+    return {
+        'rss': fields.get(b'Rss', 0),
+        'pss': fields.get(b'Pss', 0),
+        'uss': fields.get(b'Private_Clean', 0) + fields.get(b'Private_Dirty', 0),
+        'shared': fields.get(b'Shared_Clean', 0) + fields.get(b'Shared_Dirty', 0),
+        'swap': fields.get(b'Swap', 0),
+    }
+
+def read_statm_rss(pid):
+    """Resident bytes from /proc/<pid>/statm: one short read, no page-table walk."""
+    with open(f'/proc/{pid}/statm', 'rb') as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+class ChromeSampler:
+    """
+    Samples Chrome's memory/CPU by following its process tree.
+
+    Process handles are kept across ticks (so cpu_percent() has a baseline and
+    command lines are parsed once per pid); the full process_iter() scan only
+    runs to (re)discover browser root processes. policy picks the memory
+    metric: 'uss' (unique, freed if the process dies), 'pss' (shared pages
+    split proportionally, sums to a fair total) or 'rss' (cheapest, but
+    double-counts shared pages). On Linux uss/pss come from smaps_rollup and
+    rss from statm; elsewhere psutil's memory_full_info()/memory_info() are used.
+    """
+
+    def __init__(self, policy='uss', root_pids=None, rediscover_every=30):
+        if policy not in ('uss', 'pss', 'rss'):
+            raise ValueError(policy)
+        self.policy = policy
+        self.rediscover_every = max(1, int(rediscover_every))
+        self._roots = {}      # pid → Process
+        self._procs = {}      # pid → (Process, type, renderer client id)
+        self._ticks = 0
+        self._fixed_roots = bool(root_pids)
+        for pid in root_pids or ():
+            try:
+                self._roots[pid] = psutil.Process(pid)
+            except psutil.NoSuchProcess:
+                pass
+
+    # ─── Discovery ─────────────────────────────────────────────────────────────
+    @staticmethod
+    def _is_chrome(name):
+        name = (name or '').lower()
+        return any(n in name for n in CHROME_NAMES)
+
+    def discover_roots(self):
+        """Full scan for Chrome browser processes whose parent is not Chrome."""
+        roots = {}
+        for proc in psutil.process_iter(['pid', 'name', 'ppid', 'cmdline']):
+            try:
+                info = proc.info
+                if not self._is_chrome(info['name']):
+                    continue
+                if process_type(info['cmdline'] or []) != 'browser':
+                    continue
+                parent = psutil.Process(info['ppid']) if info['ppid'] else None
+                if parent is not None and self._is_chrome(parent.name()):
+                    continue
+                roots[info['pid']] = proc
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+        self._roots = roots
+        return list(roots)
+
+    def _refresh_tree(self):
+        alive = {pid: p for pid, p in self._roots.items() if p.is_running()}
+        if not self._fixed_roots and (
+                not alive or self._ticks % self.rediscover_every == 0):
+            self.discover_roots()
+            alive = self._roots
+        self._roots = alive
+
+        members = {}
+        for root in alive.values():
+            try:
+                members[root.pid] = root
+                for child in root.children(recursive=True):
+                    members[child.pid] = child
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+        procs = {}
+        for pid, proc in members.items():
+            cached = self._procs.get(pid)
+            # reuse the handle (and its cpu_percent baseline) unless the pid was recycled
+            if cached is not None and cached[0].is_running():
+                procs[pid] = cached
+                continue
+            try:
+                cmdline = proc.cmdline()
+                proc.cpu_percent(None)  # prime; first real value comes next tick
+                procs[pid] = (proc, process_type(cmdline), renderer_client_id(cmdline))
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+        self._procs = procs
+
+    def pid_for_client_id(self, client_id):
+        """OS pid of the renderer with this chrome.processes id (None if unknown)."""
+        for pid, (_, _, cid) in self._procs.items():
+            if cid == client_id:
+                return pid
+        return None
+
+    # ─── Sampling ──────────────────────────────────────────────────────────────
+    def _memory(self, proc):
+        if IS_LINUX:
+            try:
+                if self.policy == 'rss':
+                    return read_statm_rss(proc.pid)
+                return read_smaps_rollup(proc.pid)[self.policy]
+            except PermissionError:
+                return read_statm_rss(proc.pid)
+        try:
+            if self.policy == 'rss':
+                return proc.memory_info().rss
+            mem = proc.memory_full_info()
+            return getattr(mem, self.policy, None) or mem.rss
+        except psutil.AccessDenied:
+            return proc.memory_info().rss
+
+    def sample(self):
+        """
+        One tick: {'memory_bytes', 'cpu_percent', 'process_count',
+        'by_type': {type: {'memory_bytes', 'cpu_percent', 'count'}},
+        'per_process': {pid: (type, memory_bytes)}, 'sample_seconds'}.
+        """
+        started = time.perf_counter()
+        self._refresh_tree()
+        self._ticks += 1
+
+        by_type = defaultdict(lambda: {'memory_bytes': 0, 'cpu_percent': 0.0, 'count': 0})
+        per_process = {}
+        for pid, (proc, kind, _) in list(self._procs.items()):
+            try:
+                memory = self._memory(proc)
+                cpu = proc.cpu_percent(None)
+            except (psutil.NoSuchProcess, psutil.ZombieProcess,
+                    FileNotFoundError, ProcessLookupError):
+                self._procs.pop(pid, None)
+                continue
+            except psutil.AccessDenied:
+                continue
+            bucket = by_type[kind]
+            bucket['memory_bytes'] += memory
+            bucket['cpu_percent'] += cpu
+            bucket['count'] += 1
+            per_process[pid] = (kind, memory)
+
+        return {
+            'memory_bytes':   sum(b['memory_bytes'] for b in by_type.values()),
+            'cpu_percent':    round(sum(b['cpu_percent'] for b in by_type.values()), 2),
+            'process_count':  sum(b['count'] for b in by_type.values()),
+            'by_type':        dict(by_type),
+            'per_process':    per_process,
+            'sample_seconds': time.perf_counter() - started,
+        }
@@ -1,147 +1,278 @@
-import psutil
+"""
+Chrome memory snapshot tool: checks the collector's numbers without Task Manager.
+
+    python debug_script.py                                  # report only
+    python debug_script.py snapshot -o before.jsonl         # report + snapshot file
+    python debug_script.py compare before.jsonl after.jsonl [--metric pss] [--top 20]
+
+A snapshot is one pass over /proc on a thread pool: stat and cmdline for every
+pid (to find Chrome's process trees, as ChromeSampler does), then
+smaps_rollup for the Chrome processes only. Summing RSS counts every shared
+page once per process that maps it; PSS splits shared pages between their
+users and adds up to Chrome's real footprint, USS is what killing the process
+would free, and RSS - USS is its shared part. Elsewhere than Linux, psutil's
+memory_full_info() stands in for smaps_rollup.
+
+Snapshot files are JSON Lines: a summary record, then one sorted record per
+Chrome process, so two snapshots can also be compared with plain diff.
+"""
 import os
+import sys
+import json
+import time
+import argparse
+import platform
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 
-def system_memory_check():
-    """First, let's see your actual system memory"""
-    mem = psutil.virtual_memory()
-    print("=== SYSTEM MEMORY INFO ===")
-    print(f"Total RAM: {mem.total / 1024**3:.2f} GB")
-    print(f"Available: {mem.available / 1024**3:.2f} GB") 
-    print(f"Used: {mem.used / 1024**3:.2f} GB")
-    print(f"Percentage used: {mem.percent}%")
-    print()
+import psutil
 
-def debug_all_chrome_processes():
-    """Show EVERY process with 'chrome' in the name"""
-    print("=== ALL PROCESSES WITH 'CHROME' ===")
-    total_mb = 0
-    count = 0
-    
-    for proc in psutil.process_iter(['pid', 'name', 'memory_info', 'cmdline']):
-        try:
-            name = proc.info.get('name', '')
-            if name and 'chrome' in name.lower():
-                mem_info = proc.info.get('memory_info')
-                if mem_info:
-                    mem_mb = mem_info.rss / 1024 / 1024
-                    total_mb += mem_mb
-                    count += 1
-                    
-                    # Get command line to see what type of process
-                    cmdline = proc.info.get('cmdline', [])
-                    cmd_summary = ' '.join(cmdline[:3]) if cmdline else 'No cmdline'
-                    
-                    print(f"PID: {proc.info['pid']:6} | Name: {name:25} | RAM: {mem_mb:7.1f} MB | CMD: {cmd_summary[:50]}")
-        except:
+from chrome_sampler import (CHROME_NAMES, IS_LINUX, PAGE_SIZE, PROCESS_TYPES,
+                            process_type, read_smaps_rollup)
+
+METRICS = ('rss', 'pss', 'uss', 'shared', 'swap')
+MB = 1024 * 1024
+
+
+def is_chrome(name, cmdline):
+    # /proc/<pid>/comm is cut at 15 characters, so also look at argv[0]
+    names = [name or ''] + ([os.path.basename(cmdline[0])] if cmdline else [])
+    return any(n in candidate.lower() for candidate in names for n in CHROME_NAMES)
+
+
+# ─── Reading processes ─────────────────────────────────────────────────────────
+def read_process(pid):
+    """{'pid', 'ppid', 'name', 'start', 'rss', 'cmdline'} from /proc/<pid>; None if gone."""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            raw = f.read()
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            cmdline = [a.decode(errors='replace') for a in f.read().split(b'\0') if a]
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+    # the name is parenthesised and may itself contain spaces or ')'
+    head, _, rest = raw.rpartition(b')')
+    fields = rest.split()  # fields[0] is stat field 3 (state)
+    if fields[0] == b'Z':
+        return None  # exited, not yet reaped: no memory and no cmdline left
+    return {
+        'pid':     pid,
+        'ppid':    int(fields[1]),
+        'name':    head.partition(b'(')[2].decode(errors='replace'),
+        'start':   int(fields[19]),  # clock ticks after boot: tells recycled pids apart
+        'rss':     int(fields[21]) * PAGE_SIZE,
+        'cmdline': cmdline,
+    }
+
+def read_memory(pid):
+    """smaps_rollup of one process; None when another user's process can't be read."""
+    try:
+        return read_smaps_rollup(pid)
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+
+def scan_linux(pool):
+    pids = [int(e.name) for e in os.scandir('/proc') if e.name.isdigit()]
+    procs = [p for p in pool.map(read_process, pids) if p is not None]
+    members = chrome_members(procs)
+    for proc, mem in zip(members, pool.map(read_memory, [p['pid'] for p in members])):
+        proc.update(mem or dict.fromkeys(METRICS[1:]))
+    return procs, members
+
+def scan_psutil(pool):
+    """Same records through psutil (macOS/Windows): one process_iter() pass."""
+    procs = []
+    for p in psutil.process_iter(['pid', 'ppid', 'name', 'cmdline', 'create_time', 'memory_info']):
+        info = p.info
+        if info['memory_info'] is None:
             continue
-    
-    print(f"\nTOTAL: {total_mb:.1f} MB ({total_mb/1024:.2f} GB) from {count} processes")
-    print("=" * 80)
-    return total_mb, count
-
-def check_memory_units():
-    """Make sure we're not mixing up units"""
-    print("=== MEMORY UNIT CHECK ===")
-    
-    # Get one Chrome process and check its memory in different units
-    for proc in psutil.process_iter(['pid', 'name', 'memory_info']):
+        procs.append({'pid': info['pid'], 'ppid': info['ppid'] or 0, 'name': info['name'],
+                      'start': info['create_time'], 'rss': info['memory_info'].rss,
+                      'cmdline': info['cmdline'] or [], '_proc': p})
+
+    def full_info(proc):
         try:
-            name = proc.info.get('name', '')
-            if name and 'chrome' in name.lower():
-                mem = proc.info.get('memory_info')
-                if mem:
-                    print(f"Process: {name} (PID: {proc.info['pid']})")
-                    print(f"RSS in bytes: {mem.rss:,}")
-                    print(f"RSS in KB: {mem.rss/1024:.1f}")
-                    print(f"RSS in MB: {mem.rss/1024/1024:.1f}")
-                    print(f"RSS in GB: {mem.rss/1024/1024/1024:.3f}")
-                    break
-        except:
-            continue
+            mem = proc['_proc'].memory_full_info()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return dict.fromkeys(METRICS[1:])
+        uss = getattr(mem, 'uss', None)
+        return {'pss': getattr(mem, 'pss', None), 'uss': uss,
+                'shared': mem.rss - uss if uss is not None else None,
+                'swap': getattr(mem, 'swap', None)}
+
+    members = chrome_members(procs)
+    for proc, mem in zip(members, pool.map(full_info, members)):
+        proc.update(mem)
+    for proc in procs:
+        del proc['_proc']
+    return procs, members
+
+def chrome_members(procs):
+    """Every process under a Chrome browser process whose parent is not Chrome."""
+    by_pid = {p['pid']: p for p in procs}
+    children = defaultdict(list)
+    for p in procs:
+        children[p['ppid']].append(p)
+    chrome = lambda p: p is not None and is_chrome(p['name'], p['cmdline'])
+
+    members = []
+    for p in procs:
+        if chrome(p) and process_type(p['cmdline']) == 'browser' \
+                and not chrome(by_pid.get(p['ppid'])):
+            stack = [p]
+            while stack:
+                proc = stack.pop()
+                proc['type'] = process_type(proc['cmdline'])
+                members.append(proc)
+                stack.extend(children[proc['pid']])
+    return members
+
+
+# ─── Snapshots ─────────────────────────────────────────────────────────────────
+def snapshot(workers=8):
+    """(summary, Chrome process records, every process) from a single scan."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        procs, members = scan_linux(pool) if IS_LINUX else scan_psutil(pool)
+    scan_seconds = time.perf_counter() - started
+
+    by_type = {}
+    for p in members:
+        bucket = by_type.setdefault(p['type'], dict({'count': 0}, **dict.fromkeys(METRICS, 0)))
+        bucket['count'] += 1
+        for m in METRICS:
+            bucket[m] += p.get(m) or 0
+    vm = psutil.virtual_memory()
+    member_pids = {p['pid'] for p in members}
+    summary = {
+        'kind':         'summary',
+        'taken':        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()),
+        'host':         platform.node(),
+        'scan_ms':      round(scan_seconds * 1000, 1),
+        'system':       {'total': vm.total, 'available': vm.available, 'used': vm.used},
+        'processes':    len(members),
+        'trees':        sum(1 for p in members if p['ppid'] not in member_pids),
+        'unreadable':   sum(1 for p in members if p.get('pss') is None and p.get('uss') is None),
+        'totals':       {m: sum(b[m] for b in by_type.values()) for m in METRICS},
+        'by_type':      by_type,
+    }
+    records = [
+        dict({'kind': 'process', 'pid': p['pid'], 'ppid': p['ppid'], 'start': p['start'],
+              'type': p['type'], 'name': p['name']}, **{m: p.get(m) for m in METRICS})
+        for p in sorted(members, key=lambda p: (PROCESS_TYPES.index(p['type']), p['pid']))
+    ]
+    return summary, records, procs
+
+def write_snapshot(path, summary, records):
+    with open(path, 'w') as f:
+        for record in [summary] + records:
+            f.write(json.dumps(record, sort_keys=True, separators=(',', ':')) + '\n')
+
+def read_snapshot(path):
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    return lines[0], {(r['pid'], r['start']): r for r in lines[1:]}
+
+
+# ─── Reports ───────────────────────────────────────────────────────────────────
+def mb(value):
+    return '      -' if value is None else f'{value / MB:7.1f}'
+
+def print_report(summary, procs, top=10):
+    system = summary['system']
+    print("=== SYSTEM MEMORY INFO ===")
+    print(f"Total RAM: {system['total'] / 1024**3:.2f} GB")
+    print(f"Available: {system['available'] / 1024**3:.2f} GB")
+    print(f"Used: {system['used'] / 1024**3:.2f} GB")
     print()
 
-def compare_with_top():
-    """Compare with what 'top' would show"""
-    print("=== TOP 10 MEMORY USERS (for comparison) ===")
-    
-    processes = []
-    for proc in psutil.process_iter(['pid', 'name', 'memory_info']):
-        try:
-            mem_info = proc.info.get('memory_info')
-            if mem_info:
-                processes.append((proc.info['name'], mem_info.rss / 1024 / 1024, proc.info['pid']))
-        except:
-            continue
-    
-    # Sort by memory usage
-    processes.sort(key=lambda x: x[1], reverse=True)
-    
-    for i, (name, mem_mb, pid) in enumerate(processes[:10], 1):
-        print(f"{i:2}. {name:25} | {mem_mb:7.1f} MB | PID: {pid}")
+    print(f"=== CHROME: {summary['processes']} processes in {summary['trees']} tree(s), "
+          f"scanned in {summary['scan_ms']} ms ===")
+    print(f"{'type':10} {'count':>5} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8} {'shared MB':>10}")
+    for kind in PROCESS_TYPES:
+        b = summary['by_type'].get(kind)
+        if b:
+            print(f"{kind:10} {b['count']:5} {mb(b['rss']):>8} {mb(b['pss']):>8} "
+                  f"{mb(b['uss']):>8} {mb(b['shared']):>10}")
+    t = summary['totals']
+    print(f"{'TOTAL':10} {summary['processes']:5} {mb(t['rss']):>8} {mb(t['pss']):>8} "
+          f"{mb(t['uss']):>8} {mb(t['shared']):>10}")
     print()
 
-def minimal_chrome_check():
-    """Ultra-simple Chrome memory check"""
-    print("=== MINIMAL CHROME CHECK ===")
-    total = 0
-    
-    # Just count RSS for processes with exact name matches
-    exact_names = ['Google Chrome', 'chrome', 'Chromium', 'Google Chrome Helper']
-    
-    for proc in psutil.process_iter(['name', 'memory_info']):
-        try:
-            name = proc.info.get('name', '')
-            if name in exact_names:
-                mem = proc.info.get('memory_info')
-                if mem:
-                    mem_mb = mem.rss / 1024 / 1024
-                    total += mem_mb
-                    print(f"{name}: {mem_mb:.1f} MB")
-        except:
-            continue
-    
-    print(f"Total Chrome (exact names): {total:.1f} MB")
+    print(f"=== TOP {top} MEMORY USERS BY RSS (all processes) ===")
+    for i, p in enumerate(sorted(procs, key=lambda p: p['rss'], reverse=True)[:top], 1):
+        print(f"{i:2}. {p['name'][:25]:25} | {p['rss'] / MB:7.1f} MB | PID: {p['pid']}")
     print()
 
-def cross_check_with_chrome_task_manager():
-    """Instructions for manual verification"""
-    print("=== MANUAL VERIFICATION STEPS ===")
-    print("1. Open Chrome")
-    print("2. Press Shift+Esc to open Chrome Task Manager")
-    print("3. Compare the total memory shown there with our readings")
-    print("4. Also check Activity Monitor (Mac) or Task Manager (Windows)")
+    print("=== ANALYSIS ===")
+    if not summary['processes']:
+        print("No Chrome process found")
+        return
+    if summary['unreadable']:
+        print(f"{summary['unreadable']} process(es) could not be read (another user's); "
+              "their PSS/USS are missing from the totals. Run as Chrome's user.")
+    print(f"Summing RSS over-counts shared pages by {(t['rss'] - t['pss']) / MB:.1f} MB: "
+          f"Chrome's footprint is {t['pss'] / MB:.1f} MB (PSS), "
+          f"{t['uss'] / MB:.1f} MB of it private (USS).")
+    if t['pss'] > system['used']:
+        print("PSS total exceeds the system's used memory: Chrome processes were "
+              "matched wrongly or the scan raced with a large allocation.")
+
+def compare(before_path, after_path, metric='pss', top=20):
+    """Per-type totals and the processes whose metric changed most between snapshots."""
+    before, old = read_snapshot(before_path)
+    after, new = read_snapshot(after_path)
+    value = lambda r: r.get(metric) or 0
+
+    print(f"=== {metric.upper()}: {before['taken']} → {after['taken']} ===")
+    print(f"{'type':10} {'before MB':>10} {'after MB':>10} {'Δ MB':>9}")
+    for kind in PROCESS_TYPES:
+        a = before['by_type'].get(kind, {}).get(metric) or 0
+        b = after['by_type'].get(kind, {}).get(metric) or 0
+        if a or b:
+            print(f"{kind:10} {a / MB:10.1f} {b / MB:10.1f} {(b - a) / MB:+9.1f}")
+    a, b = before['totals'][metric] or 0, after['totals'][metric] or 0
+    print(f"{'TOTAL':10} {a / MB:10.1f} {b / MB:10.1f} {(b - a) / MB:+9.1f}")
     print()
 
+    changes = [(value(new[k]) - value(old[k]), new[k]) for k in new.keys() & old.keys()]
+    changes += [(value(r), r) for k, r in new.items() if k not in old]
+    changes += [(-value(r), r) for k, r in old.items() if k not in new]
+    changes.sort(key=lambda c: abs(c[0]), reverse=True)
+    print(f"=== TOP {top} CHANGES ({len(new.keys() - old.keys())} new, "
+          f"{len(old.keys() - new.keys())} exited) ===")
+    for delta, r in changes[:top]:
+        key = (r['pid'], r['start'])
+        state = 'new' if key not in old else 'exited' if key not in new else ''
+        print(f"PID: {r['pid']:6} | {r['type']:9} | {delta / MB:+8.1f} MB | "
+              f"now {mb(None if key not in new else value(r))} MB {state}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest='command')
+    snap = sub.add_parser('snapshot', help='report and optionally write a snapshot file')
+    snap.add_argument('-o', '--output', help='snapshot file (JSON Lines)')
+    for p in (parser, snap):
+        p.add_argument('--workers', type=int, default=8, help='reader threads')
+        p.add_argument('--top', type=int, default=10, help='processes in the top-RSS list')
+    cmp = sub.add_parser('compare', help='which Chrome processes grew between two snapshots')
+    cmp.add_argument('before')
+    cmp.add_argument('after')
+    cmp.add_argument('--metric', choices=METRICS, default='pss')
+    cmp.add_argument('--top', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        compare(args.before, args.after, args.metric, args.top)
+        return 0
+    summary, records, procs = snapshot(args.workers)
+    print_report(summary, procs, args.top)
+    if getattr(args, 'output', None):
+        write_snapshot(args.output, summary, records)
+        print(f"\n[INFO] Snapshot of {len(records)} processes written to {args.output}")
+    return 0
+
+
 if __name__ == "__main__":
-    print("CHROME MEMORY DEBUGGING TOOL")
-    print("=" * 50)
-    
-    # Step 1: Check system memory
-    system_memory_check()
-    
-    # Step 2: Show all Chrome processes
-    total_mb, count = debug_all_chrome_processes()
-    
-    # Step 3: Check if we're using wrong units
-    check_memory_units()
-    
-    # Step 4: Compare with top processes
-    compare_with_top()
-    
-    # Step 5: Try minimal approach
-    minimal_chrome_check()
-    
-    # Step 6: Manual verification instructions
-    cross_check_with_chrome_task_manager()
-    
-    # Final analysis
-    print("=== ANALYSIS ===")
-    if total_mb > 4096:  # More than 4GB
-        print("🚨 ERROR: Chrome memory reading is impossibly high!")
-        print("Possible causes:")
-        print("- Including non-Chrome processes")
-        print("- Double-counting shared memory")
-        print("- Unit conversion error")
-        print("- System reporting error")
-    else:
-        print("✅ Chrome memory reading seems reasonable")
\ No newline at end of file
+    sys.exit(main())
@@ -1,24 +1,173 @@
 import subprocess
 import sys
 import os
+import json
 import platform
 import time
 import shutil
 import signal
 import atexit
+import threading
+import urllib.error
+import urllib.request
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BASE_DIR)
 SERVER_SCRIPT = os.path.join(BASE_DIR, "server.py")
-EXT_DIR       = os.path.join(BASE_DIR, "extension")
+EXT_DIR       = os.path.join(BASE_DIR, "Extension")
 
-server_proc = None
+# ─── Configuration ─────────────────────────────────────────────────────────────
+# also supervise the prediction server and load the discarding extension
+LAUNCH_PREDICTOR  = os.getenv('LAUNCH_PREDICTOR', '1') == '1'
+# the prediction server's working directory: it reads label_encoder.pkl/scaler.pkl
+# from there and its models from MODEL_DIR (default Models/Saved Models)
+PREDICTOR_DIR     = os.getenv('PREDICTOR_DIR', os.path.join(REPO_DIR, "Models"))
+PREDICTOR_EXT_DIR = os.path.join(REPO_DIR, "Predicting_Extension")
+# seconds a service gets to answer /healthz with 200 (prewarm included) before it is restarted
+READY_TIMEOUT_S   = float(os.getenv('LAUNCH_READY_TIMEOUT_S', '180'))
+# crashed services restart after 1, 2, 4, ... seconds up to the max; a run of
+# STABLE_AFTER_S resets the backoff, RESTART_MAX crashes in a row give up
+RESTART_BACKOFF_S     = float(os.getenv('LAUNCH_RESTART_BACKOFF_S', '1'))
+RESTART_BACKOFF_MAX_S = float(os.getenv('LAUNCH_RESTART_BACKOFF_MAX_S', '60'))
+STABLE_AFTER_S        = float(os.getenv('LAUNCH_STABLE_AFTER_S', '60'))
+RESTART_MAX           = int(os.getenv('LAUNCH_RESTART_MAX', '5'))
 
+services = []
+stopping = threading.Event()
+
+
+def probe(url, data=None, timeout=1.0):
+    """HTTP status of a GET (or JSON POST when data is given); None if nothing answers."""
+    body = None if data is None else json.dumps(data).encode()
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, OSError):
+        return None
+
+
+class Service:
+    """
+    One supervised server process.
+
+    supervise() starts it, polls /healthz until it answers 200 (sending
+    /prewarm as soon as it answers at all, so the model's forward pass is
+    traced before the extension's first alarm) and restarts it with
+    exponential backoff when it exits or never becomes ready. Each start
+    records how long every stage took: spawn, listening, prewarm, ready.
+    """
+
+    def __init__(self, name, script, cwd, port, prewarm=False):
+        self.name = name
+        self.script = script
+        self.cwd = cwd
+        self.url = f"http://127.0.0.1:{port}"
+        self.prewarm = prewarm
+        self.proc = None
+        self.ready = threading.Event()
+        self.gave_up = False
+        self.restarts = 0
+        self.timings = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Starts the server script in its own process."""
+        # own process group on Windows so stop() can deliver CTRL_BREAK_EVENT
+        flags = subprocess.CREATE_NEW_PROCESS_GROUP if platform.system() == "Windows" else 0
+        self.proc = subprocess.Popen([sys.executable, self.script], cwd=self.cwd,
+                                     stdout=sys.stdout,
+                                     stderr=sys.stderr,
+                                     creationflags=flags)
+
+    def wait_ready(self, timeout):
+        """Stage timings in seconds since spawn, or None if it died or timed out first."""
+        started = time.perf_counter()
+        timings = {}
+        deadline = started + timeout
+        while time.perf_counter() < deadline and not stopping.is_set():
+            if self.proc.poll() is not None:
+                return None
+            status = probe(self.url + "/healthz")
+            if status is not None and 'listening' not in timings:
+                timings['listening'] = time.perf_counter() - started
+                if self.prewarm:
+                    t = time.perf_counter()
+                    warmed = probe(self.url + "/prewarm", data={}, timeout=max(1.0, deadline - t))
+                    timings['prewarm'] = time.perf_counter() - t
+                    if warmed != 200:
+                        print(f"⚠️  {self.name} prewarm failed (HTTP {warmed}), see its log")
+                    continue  # probe /healthz again right away
+            if status == 200:
+                timings['ready'] = time.perf_counter() - started
+                return timings
+            time.sleep(0.1)
+        return None
+
+    def supervise(self):
+        backoff, crashes = RESTART_BACKOFF_S, 0
+        while True:
+            with self._lock:
+                if stopping.is_set():
+                    return
+                spawned = time.perf_counter()
+                self.start()
+            spawn = time.perf_counter() - spawned
+            timings = self.wait_ready(READY_TIMEOUT_S)
+            if timings is not None:
+                self.timings = dict(timings, spawn=spawn)
+                self.ready.set()
+                print(f"⏱️  {self.name} ready: " + ", ".join(
+                    f"{stage} {self.timings[stage]:.2f}s"
+                    for stage in ('spawn', 'listening', 'prewarm', 'ready') if stage in self.timings))
+            elif self.proc.poll() is None and not stopping.is_set():
+                print(f"⚠️  {self.name} not ready after {READY_TIMEOUT_S:.0f}s, restarting it")
+                self.terminate()
+            self.proc.wait()
+            self.ready.clear()
+            if stopping.is_set():
+                return
+
+            ran = time.perf_counter() - spawned
+            if ran >= STABLE_AFTER_S:
+                backoff, crashes = RESTART_BACKOFF_S, 0
+            crashes += 1
+            if crashes > RESTART_MAX:
+                print(f"❌ {self.name} crashed {crashes - 1} times in a row, giving up.")
+                self.gave_up = True
+                return
+            print(f"⚠️  {self.name} exited (code {self.proc.returncode}) after {ran:.1f}s, "
+                  f"restarting in {backoff:g}s")
+            if stopping.wait(backoff):
+                return
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX_S)
+            self.restarts += 1
+
+    def run(self):
+        self._thread = threading.Thread(target=self.supervise, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def terminate(self):
+        # SIGTERM / CTRL_BREAK lets the collector drain its buffered CSV rows
+        if self.proc is None or self.proc.poll() is not None:
+            return
+        if platform.system() == "Windows":
+            self.proc.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            self.proc.terminate()
+        try:
+            self.proc.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+    def stop(self):
+        with self._lock:  # no restart can slip in between
+            self.terminate()
 
-def start_server():
-    """Starts server.py in its own process."""
-    return subprocess.Popen([sys.executable, SERVER_SCRIPT],
-                             stdout=sys.stdout,
-                             stderr=sys.stderr)
 
 def find_chrome_executable():
     """Try common Chrome paths by OS; let user override if needed."""
@@ -40,31 +189,40 @@ def find_chrome_executable():
 
 def launch_chrome_with_extension():
     chrome = find_chrome_executable()
-    subprocess.Popen([chrome, f"--load-extension={EXT_DIR}"])
+    extensions = [EXT_DIR] + ([PREDICTOR_EXT_DIR] if LAUNCH_PREDICTOR else [])
+    subprocess.Popen([chrome, f"--load-extension={','.join(extensions)}"])
 
 def cleanup(signum=None, frame=None):
-    """Terminate the server if it's still running."""
-    global server_proc
-    if server_proc and server_proc.poll() is None:
-        print("\n🛑 Shutting down server…")
-        server_proc.terminate()
-        try:
-            server_proc.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            server_proc.kill()
-    sys.exit(0)
+    """Stop the supervisors, then terminate the servers that are still running."""
+    if not stopping.is_set():
+        stopping.set()
+        if any(s.proc and s.proc.poll() is None for s in services):
+            print("\n🛑 Shutting down servers…")
+        for service in services:
+            service.stop()
+    if signum is not None:  # signal handler; from atexit the interpreter is already exiting
+        sys.exit(0)
 
 if __name__ == "__main__":
     atexit.register(cleanup)
     signal.signal(signal.SIGINT,  cleanup)
     signal.signal(signal.SIGTERM, cleanup)
 
-    server_proc = start_server()
-    print("🚀 Server started.")
+    started = time.perf_counter()
+    # both servers start at once; cold start is the slower of the two
+    services.append(Service("collector", SERVER_SCRIPT, BASE_DIR, 12005).run())
+    if LAUNCH_PREDICTOR:
+        services.append(Service("predictor", os.path.join(PREDICTOR_DIR, "server.py"),
+                                PREDICTOR_DIR, 1100, prewarm=True).run())
+    print("🚀 Servers starting.")
 
-    time.sleep(2)
+    for service in services:
+        if not service.ready.wait(READY_TIMEOUT_S):
+            print(f"⚠️  {service.name} is not ready yet; launching Chrome anyway.")
+    print(f"⏱️  Servers ready in {time.perf_counter() - started:.2f}s")
 
     launch_chrome_with_extension()
     print("🌐 Chrome launched with extension.")
 
-    server_proc.wait()
+    while not all(s.gave_up for s in services):
+        time.sleep(1)
@@ -0,0 +1,151 @@
+import os
+import csv
+import time
+import queue
+import threading
+
+
+class BufferedWriter:
+    """
+    Single writer thread for the collector's log rows.
+
+    Producers (the /log handlers, the resource sampler) only enqueue
+    [timestamp, type, data] rows. The writer thread hands them to the sink in
+    batches once flush_rows are pending or flush_interval seconds have passed,
+    and fsyncs every fsync_interval seconds (0 = after every flush, < 0 =
+    never). close() drains everything still queued before returning.
+    on_flush, if given, is called with (seconds, rows) after every batch
+    reaches the sink.
+    Subclasses implement _write_rows(), _sync() and _close_sink().
+    """
+
+    def __init__(self, path, flush_rows=256, flush_interval=1.0, fsync_interval=5.0,
+                 on_flush=None):
+        self.path = path
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_interval = float(flush_interval)
+        self.fsync_interval = float(fsync_interval)
+        self.on_flush = on_flush
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+        self.rows_written = 0
+        self.flushes = 0
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._loop, name=type(self).__name__, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def write(self, row):
+        """Queue one row; never blocks on disk."""
+        if self._closed.is_set():
+            raise RuntimeError('writer is closed')
+        self._queue.put(row)
+
+    @property
+    def alive(self):
+        """The writer thread is running and accepting rows."""
+        return self._thread is not None and self._thread.is_alive() and not self._closed.is_set()
+
+    def pending(self):
+        """Rows queued but not yet handed to the sink."""
+        return self._queue.qsize()
+
+    def write_many(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def close(self, timeout=10.0):
+        """Stop accepting rows, flush and fsync what is queued, close the file."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # ─── Writer thread ─────────────────────────────────────────────────────────
+    def _loop(self):
+        pending = []
+        last_flush = last_sync = time.monotonic()
+        stopping = False
+        while not stopping:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                row = self._queue.get(timeout=timeout)
+                if row is None:
+                    stopping = True
+                else:
+                    pending.append(row)
+                    # grab whatever else is already queued without waiting
+                    while len(pending) < self.flush_rows:
+                        row = self._queue.get_nowait()
+                        if row is None:
+                            stopping = True
+                            break
+                        pending.append(row)
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if pending and (stopping or len(pending) >= self.flush_rows
+                            or now - last_flush >= self.flush_interval):
+                self._flush(pending)
+                pending = []
+                last_flush = now
+                if self.fsync_interval >= 0 and now - last_sync >= self.fsync_interval:
+                    self._sync()
+                    last_sync = now
+            elif not pending:
+                last_flush = now
+
+        if self.fsync_interval >= 0:
+            self._sync()
+        self._close_sink()
+
+    def _flush(self, rows):
+        try:
+            started = time.perf_counter()
+            self._write_rows(rows)
+            self.rows_written += len(rows)
+            self.flushes += 1
+            if self.on_flush is not None:
+                self.on_flush(time.perf_counter() - started, len(rows))
+        except Exception as e:
+            print(f"Error writing {len(rows)} rows to {self.path}: {e}")
+
+    # ─── Sink hooks ────────────────────────────────────────────────────────────
+    def _write_rows(self, rows):
+        raise NotImplementedError
+
+    def _sync(self):
+        raise NotImplementedError
+
+    def _close_sink(self):
+        raise NotImplementedError
+
+
+class BufferedCSVWriter(BufferedWriter):
+    """BufferedWriter that appends rows to user_data.csv, keeping the file open."""
+
+    def __init__(self, path, header=None, **kwargs):
+        super().__init__(path, **kwargs)
+        new_file = not os.path.exists(path)
+        self._file = open(path, mode='a', newline='')
+        self._writer = csv.writer(self._file)
+        if new_file and header:
+            self._writer.writerow(header)
+            self._file.flush()
+        self.start()
+
+    def _write_rows(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+
+    def _close_sink(self):
+        self._file.close()
@@ -0,0 +1,133 @@
+import time
+import threading
+from collections import deque
+
+import psutil
+
+
+def trend(samples):
+    """Least-squares slope (bytes per second) of [(monotonic s, bytes), ...]; 0 with < 2 points."""
+    if len(samples) < 2:
+        return 0.0
+    n = len(samples)
+    mean_t = sum(t for t, _ in samples) / n
+    mean_b = sum(b for _, b in samples) / n
+    var = sum((t - mean_t) ** 2 for t, _ in samples)
+    if var == 0:
+        return 0.0
+    return sum((t - mean_t) * (b - mean_b) for t, b in samples) / var
+
+
+class PressureScheduler:
+    """
+    Turns system RAM availability and Chrome's memory trend into a discard schedule.
+
+    Headroom is the tighter of two limits: Chrome's own budget (budget_bytes,
+    0 = none) and the system's available RAM above min_available_fraction of
+    the total. It is projected horizon seconds ahead along the Chrome trend
+    (a least-squares slope over the last trend_window seconds of sampler
+    ticks), and the projection sets the level:
+
+        low       projected headroom >= slack_fraction of total RAM
+        moderate  projected headroom below that slack
+        high      projected to run out of headroom within the horizon
+        critical  already out of headroom
+
+    The extension's next check is max_interval when low, min_interval from
+    high up, and interpolated in between. excess_bytes is how much discarding
+    has to free to stay within headroom over the horizon.
+    """
+
+    def __init__(self, budget_bytes=0, min_available_fraction=0.15, slack_fraction=0.10,
+                 horizon=120.0, trend_window=300.0, min_interval=30.0, max_interval=600.0):
+        self.budget_bytes = int(budget_bytes)
+        self.min_available_fraction = float(min_available_fraction)
+        self.slack_fraction = float(slack_fraction)
+        self.horizon = float(horizon)
+        self.trend_window = float(trend_window)
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self._samples = deque()  # (monotonic s, Chrome memory bytes)
+        self._lock = threading.Lock()
+
+    def observe(self, chrome_memory_bytes):
+        """Record one sampler tick of Chrome's total memory."""
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, int(chrome_memory_bytes)))
+            while self._samples and now - self._samples[0][0] > self.trend_window:
+                self._samples.popleft()
+
+    def state(self, vm=None):
+        """Current pressure: level, headroom, excess_bytes and next_check_s."""
+        vm = vm or psutil.virtual_memory()
+        with self._lock:
+            samples = list(self._samples)
+        chrome = samples[-1][1] if samples else 0
+        slope = trend(samples)
+
+        min_available = int(vm.total * self.min_available_fraction)
+        headroom = vm.available - min_available
+        if self.budget_bytes > 0 and samples:
+            headroom = min(headroom, self.budget_bytes - chrome)
+        projected = headroom - max(slope, 0.0) * self.horizon
+        slack = vm.total * self.slack_fraction
+
+        if headroom < 0:
+            level = 'critical'
+        elif projected < 0:
+            level = 'high'
+        elif projected < slack:
+            level = 'moderate'
+        else:
+            level = 'low'
+
+        if level == 'low':
+            interval = self.max_interval
+        elif level == 'moderate':
+            interval = self.min_interval + (self.max_interval - self.min_interval) * projected / slack
+        else:
+            interval = self.min_interval
+
+        return {
+            'level':                   level,
+            'available_bytes':         int(vm.available),
+            'total_bytes':             int(vm.total),
+            'min_available_bytes':     min_available,
+            'chrome_memory_bytes':     chrome,
+            'chrome_trend_bytes_per_s': round(slope, 1),
+            'budget_bytes':            self.budget_bytes,
+            'headroom_bytes':          int(headroom),
+            'projected_headroom_bytes': int(projected),
+            'excess_bytes':            int(max(0.0, -projected)),
+            'next_check_s':            round(interval, 1),
+        }
+
+    @staticmethod
+    def plan(state, tabs, candidates, preferred=()):
+        """
+        Rank tabs for discarding and cut the list where it covers excess_bytes.
+
+        tabs: {tabId: {'memory_bytes', ...}} from TabMemoryTracker.latest().
+        Preferred tabs (the model's discard predictions) come first, biggest
+        first; the remaining candidates are only added at 'critical'. Tabs
+        without a memory attribution rank last and count as freeing nothing.
+        """
+        candidates = list(dict.fromkeys(candidates))
+        open_tabs = set(candidates)
+        preferred = [t for t in dict.fromkeys(preferred) if t in open_tabs]
+        chosen = set(preferred)
+        others = [t for t in candidates if t not in chosen]
+        reclaimable = lambda t: tabs.get(t, {}).get('memory_bytes', 0)
+        ranked = sorted(preferred, key=reclaimable, reverse=True)
+        if state['level'] == 'critical':
+            ranked += sorted(others, key=reclaimable, reverse=True)
+
+        entries, discard, covered = [], [], 0
+        for tab_id in ranked:
+            entries.append({'tab_id': tab_id, 'reclaimable_bytes': reclaimable(tab_id),
+                            'preferred': tab_id in chosen})
+            if covered < state['excess_bytes'] and reclaimable(tab_id) > 0:
+                discard.append(tab_id)
+                covered += reclaimable(tab_id)
+        return {'ranked': entries, 'discard': discard, 'covered_bytes': covered}
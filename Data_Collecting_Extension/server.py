@@ -1,120 +1,330 @@
 from flask import Flask, request, jsonify
 import csv
 import os
+import sys
+import json
+import zlib
+import signal
+import atexit
 import psutil
 import time
 import threading
+import traceback
 from collections import defaultdict
 
+from log_writer import BufferedCSVWriter
+from chrome_sampler import ChromeSampler, PROCESS_TYPES
+from tab_memory import TabMemoryTracker
+from memory_pressure import PressureScheduler
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from metrics import Metrics
+
 app = Flask(__name__)
+# /metrics: per-stage latency histograms (parse, psutil sweep, CSV write, ...) and writer gauges
+metrics = Metrics('collector').install(app)
 csv_file = "user_data.csv"
 
-# Initialize CSV file with headers if it doesn't exist
-if not os.path.exists(csv_file):
-    with open(csv_file, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(["timestamp", "type", "data"])
+# Buffered writer knobs: flush after N rows or T seconds, fsync every F seconds
+LOG_FLUSH_ROWS       = int(os.getenv('LOG_FLUSH_ROWS', '256'))
+LOG_FLUSH_INTERVAL_S = float(os.getenv('LOG_FLUSH_INTERVAL_S', '1.0'))
+LOG_FSYNC_INTERVAL_S = float(os.getenv('LOG_FSYNC_INTERVAL_S', '5.0'))
+# Largest /log_batch body accepted after decompression
+LOG_BATCH_MAX_BYTES  = int(os.getenv('LOG_BATCH_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Chrome sampler: seconds between samples and memory metric ('uss', 'pss' or 'rss')
+RESOURCE_SAMPLE_INTERVAL_S = float(os.getenv('RESOURCE_SAMPLE_INTERVAL_S', '30'))
+CHROME_MEMORY_POLICY       = os.getenv('CHROME_MEMORY_POLICY', 'uss')
+# Tab → renderer mappings older than this are ignored (extension re-sends every 30 s)
+TAB_MAPPING_MAX_AGE_S      = float(os.getenv('TAB_MAPPING_MAX_AGE_S', '300'))
+
+# Memory-pressure scheduler: Chrome budget (0 = only system RAM counts), RAM to
+# keep available and the slack below which pressure counts as 'moderate' (% of
+# total), how far ahead Chrome's trend is projected, the window the trend is fit
+# over, and the range the extension's next prediction is scheduled in
+PRESSURE_CHROME_BUDGET_MB   = float(os.getenv('PRESSURE_CHROME_BUDGET_MB', '0'))
+PRESSURE_MIN_AVAILABLE_PCT  = float(os.getenv('PRESSURE_MIN_AVAILABLE_PCT', '15'))
+PRESSURE_SLACK_PCT          = float(os.getenv('PRESSURE_SLACK_PCT', '10'))
+PRESSURE_HORIZON_S          = float(os.getenv('PRESSURE_HORIZON_S', '120'))
+PRESSURE_TREND_WINDOW_S     = float(os.getenv('PRESSURE_TREND_WINDOW_S', '300'))
+PRESSURE_MIN_INTERVAL_S     = float(os.getenv('PRESSURE_MIN_INTERVAL_S', '30'))
+PRESSURE_MAX_INTERVAL_S     = float(os.getenv('PRESSURE_MAX_INTERVAL_S', '600'))
+# Sampler period while pressure is above 'low'
+PRESSURE_SAMPLE_INTERVAL_S  = float(os.getenv('PRESSURE_SAMPLE_INTERVAL_S', '5'))
+
+# Storage format: 'csv' (user_data.csv, Python-repr data column) or 'arrow'
+# (typed per-event-type Arrow IPC segments under LOG_ARROW_DIR, needs pyarrow)
+LOG_FORMAT    = os.getenv('LOG_FORMAT', 'csv')
+LOG_ARROW_DIR = os.getenv('LOG_ARROW_DIR', 'telemetry')
+
+# Single writer thread for every producer
+if LOG_FORMAT == 'arrow':
+    from telemetry_store import ArrowSegmentWriter
+    writer = ArrowSegmentWriter(
+        LOG_ARROW_DIR,
+        flush_rows=LOG_FLUSH_ROWS, flush_interval=LOG_FLUSH_INTERVAL_S,
+        fsync_interval=LOG_FSYNC_INTERVAL_S,
+        on_flush=lambda seconds, rows: metrics.observe('write', seconds)
+    )
+else:
+    # creates the CSV with headers if needed
+    writer = BufferedCSVWriter(
+        csv_file, header=["timestamp", "type", "data"],
+        flush_rows=LOG_FLUSH_ROWS, flush_interval=LOG_FLUSH_INTERVAL_S,
+        fsync_interval=LOG_FSYNC_INTERVAL_S,
+        on_flush=lambda seconds, rows: metrics.observe('write', seconds)
+    )
+metrics.gauge('rows_written_total', 'Rows handed to the log sink.',
+              lambda: writer.rows_written, kind='counter')
+metrics.gauge('flushes_total', 'Batches flushed to the log sink.',
+              lambda: writer.flushes, kind='counter')
+metrics.gauge('writer_queue_rows', 'Rows queued for the writer thread.', writer.pending)
+
+# Follows the Chrome process tree and keeps its Process handles across ticks;
+# only the resource thread samples, the tracker is shared with the request handlers
+sampler = ChromeSampler(policy=CHROME_MEMORY_POLICY)
+tab_memory = TabMemoryTracker(max_age=TAB_MAPPING_MAX_AGE_S)
+pressure = PressureScheduler(
+    budget_bytes=PRESSURE_CHROME_BUDGET_MB * 2**20,
+    min_available_fraction=PRESSURE_MIN_AVAILABLE_PCT / 100.0,
+    slack_fraction=PRESSURE_SLACK_PCT / 100.0,
+    horizon=PRESSURE_HORIZON_S, trend_window=PRESSURE_TREND_WINDOW_S,
+    min_interval=PRESSURE_MIN_INTERVAL_S, max_interval=PRESSURE_MAX_INTERVAL_S
+)
+# resource ticks that raised and were skipped (the thread keeps sampling)
+sampling_errors = 0
+metrics.gauge('sampling_errors_total', 'Resource sampling ticks that failed.',
+              lambda: sampling_errors, kind='counter')
 
 @app.route('/log', methods=['POST'])
 def log_data():
-    data = request.get_json()
+    with metrics.stage('parse'):
+        data = request.get_json()
     # Create a readable timestamp for the log
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
     
-    # Write the logged data as a row in the CSV file
-    with open(csv_file, mode='a', newline='') as file:
-        writer = csv.writer(file)
-        # Store entire 'data' object in the "data" field
-        writer.writerow([timestamp, data.get("type", "unknown"), data])
+    # Queue the logged data as a row for the CSV writer
+    # Store entire 'data' object in the "data" field
+    writer.write([timestamp, data.get("type", "unknown"), data])
     
     return jsonify({"status": "success"}), 200
 
 
+def event_timestamp(event, fallback):
+    """CSV timestamp for a buffered event: when it happened, not when it arrived."""
+    ts = event.get("timestamp")
+    if isinstance(ts, (int, float)):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts / 1000.0))
+    return fallback
+
+@app.route('/log_batch', methods=['POST'])
+def log_batch():
+    """
+    Log many buffered events in one request.
+
+    Body: a JSON array of events (or {"events": [...]}), optionally sent with
+    Content-Encoding: gzip. Each row keeps its event's own timestamp.
+    """
+    body = request.get_data()
+    if request.headers.get("Content-Encoding", "").lower() == "gzip":
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = inflater.decompress(body, LOG_BATCH_MAX_BYTES)
+        except zlib.error:
+            return jsonify({"status": "error", "error": "Invalid gzip body"}), 400
+        if inflater.unconsumed_tail:
+            return jsonify({"status": "error", "error": "Batch too large"}), 413
+    try:
+        with metrics.stage('parse'):
+            payload = json.loads(body)
+    except ValueError:
+        return jsonify({"status": "error", "error": "Invalid JSON"}), 400
+
+    events = payload.get("events", []) if isinstance(payload, dict) else payload
+    if not isinstance(events, list):
+        return jsonify({"status": "error", "error": "Expected a list of events"}), 400
+
+    received = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+    rows = [
+        [event_timestamp(e, received), e.get("type", "unknown"), e]
+        for e in events if isinstance(e, dict)
+    ]
+    writer.write_many(rows)
+
+    return jsonify({"status": "success", "logged": len(rows)}), 200
+
+
+@app.route('/tab_processes', methods=['POST'])
+def tab_processes():
+    """
+    Which tabs live in which renderer, as reported by chrome.processes.
+
+    Body: [{"pid": osProcessId, "clientId": id, "type": ..., "tabIds": [...]}]
+    (or {"processes": [...]}). Replaces the previous mapping.
+    """
+    payload = request.get_json(silent=True)
+    processes = payload.get("processes", []) if isinstance(payload, dict) else payload
+    if not isinstance(processes, list):
+        return jsonify({"status": "error", "error": "Expected a list of processes"}), 400
+    try:
+        mapped = tab_memory.update_mappings(p for p in processes if isinstance(p, dict))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"status": "error", "error": "Invalid process entry"}), 400
+    return jsonify({"status": "success", "tabs": mapped}), 200
+
+@app.route('/tab_memory', methods=['GET'])
+def get_tab_memory():
+    """
+    Latest per-tab memory attribution. reclaimable_bytes is what discarding the
+    tab is expected to free: the whole renderer when the tab has it to itself,
+    an even share of it otherwise.
+    """
+    tabs, sampled_at = tab_memory.latest()
+    return jsonify({
+        "policy": CHROME_MEMORY_POLICY,
+        "sampled_at": sampled_at,
+        "tabs": {
+            str(tab_id): {
+                "memory_bytes": t["memory_bytes"],
+                "pid": t["pid"],
+                "shared_with": t["shared_with"],
+                "reclaimable_bytes": t["memory_bytes"],
+                "exclusive": t["shared_with"] == 1,
+            }
+            for tab_id, t in tabs.items()
+        },
+    }), 200
+
+
+@app.route('/pressure', methods=['GET'])
+def get_pressure():
+    """Live memory pressure and when the extension should check again (next_check_s)."""
+    return jsonify(pressure.state()), 200
+
+@app.route('/discard_plan', methods=['POST'])
+def discard_plan():
+    """
+    Tabs to discard to get back under the memory target, biggest first.
+
+    Body: {"candidates": [open tab ids], "preferred": [tabs the model expects to
+    be closed]}. 'discard' lists the first tabs of 'ranked' that together are
+    expected to free excess_bytes, leaving out tabs with no known reclaimable
+    memory. The extension discards those, and replaces tabs it refuses to
+    discard with the next attributed tabs of 'ranked'.
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        candidates = [int(t) for t in payload.get("candidates", [])]
+        preferred = [int(t) for t in payload.get("preferred", [])]
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "error": "Tab ids must be integers"}), 400
+    state = pressure.state()
+    tabs, _ = tab_memory.latest()
+    return jsonify(dict(state, **PressureScheduler.plan(state, tabs, candidates, preferred))), 200
+
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Readiness for launcher.py: 200 while the writer thread accepts rows."""
+    ready = writer.alive
+    return jsonify({"status": "ready" if ready else "unavailable",
+                    "rows_written": writer.rows_written,
+                    "queued_rows": writer.pending()}), 200 if ready else 503
+
+
+def sample_resources(last_net):
+    """
+    One tick of the resource thread: samples Chrome and the system, queues the
+    resourceUsage and tabMemory rows and returns (net counters, pressure level).
+    """
+    # 1) Memory and CPU usage for the Chrome process tree, split by process type
+    with metrics.stage('sample'):
+        chrome = sampler.sample()
+    pressure.observe(chrome["memory_bytes"])
+    state = pressure.state()
+
+    # 2) System-wide usage (optional)
+    system_memory = psutil.virtual_memory().used     # total system memory used (in bytes)
+    system_cpu = psutil.cpu_percent(interval=None)   # % CPU usage since last call
+    
+    # 3) Network usage (optional) - we can track the difference in total I/O since last cycle
+    current_net = psutil.net_io_counters()
+    sent_delta = current_net.bytes_sent - last_net.bytes_sent
+    recv_delta = current_net.bytes_recv - last_net.bytes_recv
+
+    # If you only want Chrome-specific network usage, you'd need to sum from each Chrome process.
+    # psutil does not reliably provide per-process network data on all OSes, so this is OS-dependent.
+    
+    # Prepare the dictionary to log
+    usage_data = {
+        "type": "resourceUsage",
+        "chrome_memory_bytes": chrome["memory_bytes"],
+        "chrome_cpu_percent_sum": chrome["cpu_percent"],  # sum of CPU % across all Chrome processes
+        "chrome_process_count": chrome["process_count"],
+        "chrome_memory_policy": CHROME_MEMORY_POLICY,
+        "system_memory_used_bytes": system_memory,
+        "system_memory_available_bytes": state["available_bytes"],
+        "memory_pressure": state["level"],
+        "system_cpu_percent": system_cpu,
+        "net_bytes_sent_delta": sent_delta,
+        "net_bytes_recv_delta": recv_delta,
+        "sample_ms": round(chrome["sample_seconds"] * 1000, 2)
+    }
+    for kind in PROCESS_TYPES:
+        bucket = chrome["by_type"].get(kind, {})
+        usage_data[f"chrome_{kind}_memory_bytes"] = bucket.get("memory_bytes", 0)
+        usage_data[f"chrome_{kind}_count"] = bucket.get("count", 0)
+
+    # Queue a row for the CSV writer
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+    writer.write([timestamp, usage_data["type"], usage_data])
+
+    # 4) Per-tab share of renderer memory, for tabs the extension has mapped
+    with metrics.stage('attribute'):
+        tabs = tab_memory.attribute(chrome["per_process"], sampler)
+    sampled_ms = int(time.time() * 1000)
+    writer.write_many([
+        [timestamp, "tabMemory", {
+            "type": "tabMemory",
+            "timestamp": sampled_ms,
+            "tabId": tab_id,
+            "pid": t["pid"],
+            "memory_bytes": t["memory_bytes"],
+            "process_memory_bytes": t["process_memory_bytes"],
+            "shared_with": t["shared_with"],
+            "policy": CHROME_MEMORY_POLICY,
+        }]
+        for tab_id, t in tabs.items()
+    ])
+    return current_net, state["level"]
+
 def log_resource_usage():
     """
     Periodically logs Chrome's total RAM usage, CPU usage, 
     and optional system metrics to the CSV.
     """
+    global sampling_errors
     # For optional network usage tracking
     # We'll track total before/after values to compute deltas
     last_net = psutil.net_io_counters()
 
     while True:
-        # 1) Memory and CPU usage for all "chrome" processes
-        total_memory = 0
-        total_cpu = 0.0
-        process_count = 0
-        for proc in psutil.process_iter(['name', 'memory_info', 'cpu_percent']):
-            # try:
-            #     if proc.info['name'] and "chrome" in proc.info['name'].lower():
-            #         # Memory usage in bytes (RSS)
-            #         total_memory += proc.info['memory_info'].rss
-            #         # CPU usage is the % since last call to cpu_percent (per process)
-            #         # You can call proc.cpu_percent(interval=some_time), but that's blocking
-            #         # Using the immediate .info['cpu_percent'] from psutil
-            #         total_cpu += proc.info['cpu_percent']
-            #         process_count += 1
-            # except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-            #     continue
-
-            try:
-                if proc.info['name'] and 'chrome' in proc.info['name'].lower():
-                    try:
-                        full_mem = proc.memory_full_info()
-                        total_memory += full_mem.uss  # More accurate unique memory
-                        total_cpu += proc.info.get('cpu_percent', 0.0)
-                        process_count += 1
-                    except psutil.AccessDenied:
-                        # Fall back to regular memory_info if access denied
-
-                        print("\n\n Access Denied to full memory info for process: ", proc.info['name'], "\n\n")
-                        mem = proc.info.get('memory_info')
-                        if mem:
-                            total_memory += mem.rss
-
-
-
-                    # mem = proc.info.get('memory_info')
-                    # if mem and hasattr(mem, 'rss'):
-                    #     total_memory += mem.rss
-                    #     total_cpu    += proc.info.get('cpu_percent', 0.0)
-                    #     process_count += 1
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
-        # 2) System-wide usage (optional)
-        system_memory = psutil.virtual_memory().used     # total system memory used (in bytes)
-        system_cpu = psutil.cpu_percent(interval=None)   # % CPU usage since last call
-        chrome_net_io = None
-        
-        # 3) Network usage (optional) - we can track the difference in total I/O since last cycle
-        current_net = psutil.net_io_counters()
-        sent_delta = current_net.bytes_sent - last_net.bytes_sent
-        recv_delta = current_net.bytes_recv - last_net.bytes_recv
-        last_net = current_net
-
-        # If you only want Chrome-specific network usage, you'd need to sum from each Chrome process.
-        # psutil does not reliably provide per-process network data on all OSes, so this is OS-dependent.
-        
-        # Prepare the dictionary to log
-        usage_data = {
-            "type": "resourceUsage",
-            "chrome_memory_bytes": total_memory,
-            "chrome_cpu_percent_sum": total_cpu,  # sum of CPU % across all Chrome processes
-            "chrome_process_count": process_count,
-            "system_memory_used_bytes": system_memory,
-            "system_cpu_percent": system_cpu,
-            "net_bytes_sent_delta": sent_delta,
-            "net_bytes_recv_delta": recv_delta
-        }
-
-        # Append a row to CSV
-        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        with open(csv_file, mode='a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([timestamp, usage_data["type"], usage_data])
-
-        # Sleep for a while before logging again
-        time.sleep(30)  # adjust as needed
+        level = "low"
+        try:
+            last_net, level = sample_resources(last_net)
+        except Exception as e:
+            # a tick that fails (a process vanishing mid-read, a permission
+            # error) is skipped; letting it end the thread would leave
+            # /pressure and /discard_plan serving stale state for good
+            sampling_errors += 1
+            print(f"Error in resource monitoring: {e!r}")
+            traceback.print_exc()
+
+        # Sleep for a while before logging again; sample faster under pressure
+        # so the trend (and the extension's discard plan) keeps up
+        if level == "low":
+            time.sleep(RESOURCE_SAMPLE_INTERVAL_S)
+        else:
+            time.sleep(min(RESOURCE_SAMPLE_INTERVAL_S, PRESSURE_SAMPLE_INTERVAL_S))
 
 # def log_resource_usage():
 #     """
@@ -239,7 +449,19 @@ def log_resource_usage():
 #         time.sleep(30)
 
 
+def shutdown(signum=None, frame=None):
+    """Drain queued rows to disk before exiting (SIGTERM from launcher.py)."""
+    writer.close()
+    if signum is not None:
+        sys.exit(0)
+
+
 if __name__ == '__main__':
+    atexit.register(shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    if hasattr(signal, 'SIGBREAK'):  # Windows: launcher sends CTRL_BREAK_EVENT
+        signal.signal(signal.SIGBREAK, shutdown)
+
     # Start the background thread for resource usage logging
     resource_thread = threading.Thread(target=log_resource_usage, daemon=True)
     resource_thread.start()
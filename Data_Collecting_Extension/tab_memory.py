@@ -0,0 +1,89 @@
+import time
+import threading
+from collections import defaultdict
+
+
+class TabMemoryTracker:
+    """
+    Attributes renderer memory to the tabs each renderer hosts.
+
+    The extension reports which tabs live in which renderer (from
+    chrome.processes), either by OS pid or by Chrome's own process id, which
+    is resolved through the renderer's --renderer-client-id= command line.
+    On every sampler tick a process's memory is split evenly across the tabs
+    it hosts; that share is also what discarding the tab is expected to free
+    (the whole process when it hosts a single tab).
+    """
+
+    def __init__(self, max_age=300.0):
+        self.max_age = float(max_age)
+        self._lock = threading.Lock()
+        self._by_pid = {}        # OS pid → [tab ids]
+        self._by_client_id = {}  # chrome.processes id → [tab ids]
+        self._updated = 0.0
+        self._latest = {}
+        self._latest_at = 0.0
+
+    def update_mappings(self, processes):
+        """
+        Replace the current mapping with the extension's latest snapshot.
+
+        processes: [{"osProcessId"|"pid": int, "id"|"clientId": int, "tabIds": [...]}]
+        or flat [{"tabId": int, "pid"|"clientId": int}] entries.
+        """
+        by_pid, by_client = defaultdict(list), defaultdict(list)
+        for entry in processes:
+            tab_ids = entry.get('tabIds')
+            if tab_ids is None:
+                tab_ids = [entry['tabId']] if 'tabId' in entry else []
+            pid = entry.get('osProcessId', entry.get('pid'))
+            client_id = entry.get('id', entry.get('clientId'))
+            if pid:
+                by_pid[int(pid)].extend(int(t) for t in tab_ids)
+            elif client_id is not None:
+                by_client[int(client_id)].extend(int(t) for t in tab_ids)
+        with self._lock:
+            self._by_pid, self._by_client_id = dict(by_pid), dict(by_client)
+            self._updated = time.monotonic()
+        return sum(len(v) for v in by_pid.values()) + sum(len(v) for v in by_client.values())
+
+    def attribute(self, per_process, sampler=None):
+        """
+        Split this tick's per-process memory ({pid: (type, bytes)}) across tabs.
+
+        Returns {tabId: {'pid', 'memory_bytes', 'process_memory_bytes', 'shared_with'}};
+        empty when no (fresh) mapping has been reported.
+        """
+        with self._lock:
+            if time.monotonic() - self._updated > self.max_age:
+                return {}
+            tabs_by_pid = {pid: list(tabs) for pid, tabs in self._by_pid.items()}
+            client_ids = dict(self._by_client_id)
+
+        if sampler is not None:
+            for client_id, tabs in client_ids.items():
+                pid = sampler.pid_for_client_id(client_id)
+                if pid is not None:
+                    tabs_by_pid.setdefault(pid, []).extend(tabs)
+
+        tabs = {}
+        for pid, tab_ids in tabs_by_pid.items():
+            if pid not in per_process or not tab_ids:
+                continue
+            process_bytes = per_process[pid][1]
+            unique = sorted(set(tab_ids))
+            for tab_id in unique:
+                tabs[tab_id] = {
+                    'pid':                  pid,
+                    'memory_bytes':         process_bytes // len(unique),
+                    'process_memory_bytes': process_bytes,
+                    'shared_with':          len(unique),
+                }
+        with self._lock:
+            self._latest, self._latest_at = tabs, time.time()
+        return tabs
+
+    def latest(self):
+        """Most recent attribution plus when it was computed (epoch seconds)."""
+        with self._lock:
+            return dict(self._latest), self._latest_at
@@ -0,0 +1,244 @@
+"""
+Typed, columnar telemetry storage (Arrow IPC segments) for the collector.
+
+Each event type gets its own schema and its own directory of rolling
+segment files:
+
+    telemetry/<type>/<YYYYmmdd-HHMMSS>-<seq>.arrows
+
+Segments use the Arrow streaming format, so a segment cut short by a crash is
+still readable up to its last complete batch. Known fields become typed
+columns; anything else lands in a JSON `extra` column.
+
+    python telemetry_store.py convert user_data.csv telemetry/   # migrate old logs
+    python telemetry_store.py summary telemetry/
+"""
+import os
+import sys
+import ast
+import csv
+import json
+import time
+import argparse
+from collections import defaultdict
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from log_writer import BufferedWriter
+
+# ─── Schemas ───────────────────────────────────────────────────────────────────
+# every table also gets: logged_at (CSV row time), timestamp (event ms), extra (JSON)
+I64, F64, STR, BOOL = pa.int64(), pa.float64(), pa.string(), pa.bool_()
+EVENT_FIELDS = {
+    'tabSwitched':           {'fromTab': I64, 'toTab': I64},
+    'tabDuration':           {'tabId': I64, 'duration': I64},
+    'tabCreated':            {'tabId': I64, 'url': STR, 'windowId': I64},
+    'tabUpdated':            {'tabId': I64, 'url': STR, 'windowId': I64},
+    'tabTitleChanged':       {'tabId': I64, 'title': STR, 'windowId': I64},
+    'tabRemoved':            {'tabId': I64, 'windowId': I64, 'isWindowClosing': BOOL},
+    'tabHighlighted':        {'windowId': I64, 'tabIds': pa.list_(I64)},
+    'tabDetached':           {'tabId': I64, 'oldWindowId': I64},
+    'tabAttached':           {'tabId': I64, 'newWindowId': I64},
+    'tabReplaced':           {'addedTabId': I64, 'removedTabId': I64},
+    'tabReloaded':           {'tabId': I64},
+    'tabDiscarded':          {'tabId': I64, 'source': STR, 'url': STR, 'title': STR,
+                              'error': STR},
+    'tabAboutToBeDiscarded': {'tabId': I64, 'source': STR},
+    'windowFocused':         {'windowId': I64},
+    'windowCreated':         {'windowId': I64, 'focused': BOOL, 'state': STR},
+    'windowRemoved':         {'windowId': I64},
+    'userIdleStateChanged':  {'newState': STR},
+    'periodicBrowserStats':  {'windowCount': I64, 'tabCount': I64},
+    'resourceUsage':         {'chrome_memory_bytes': I64, 'chrome_cpu_percent_sum': F64,
+                              'chrome_process_count': I64, 'system_memory_used_bytes': I64,
+                              'system_cpu_percent': F64, 'net_bytes_sent_delta': I64,
+                              'net_bytes_recv_delta': I64, 'chrome_memory_policy': STR,
+                              'system_memory_available_bytes': I64, 'memory_pressure': STR,
+                              'sample_ms': F64,
+                              **{f'chrome_{kind}_{field}': I64
+                                 for kind in ('browser', 'renderer', 'gpu', 'utility', 'other')
+                                 for field in ('memory_bytes', 'count')}},
+    'tabMemory':             {'tabId': I64, 'pid': I64, 'memory_bytes': I64,
+                              'process_memory_bytes': I64, 'shared_with': I64,
+                              'policy': STR},
+}
+OTHER = '_other'  # event types without a schema: only the common columns
+
+_CASTS = {I64: int, F64: float, STR: str, BOOL: bool}
+
+def schema_for(event_type):
+    fields = [pa.field('logged_at', pa.timestamp('s')), pa.field('timestamp', I64)]
+    fields += [pa.field(k, t) for k, t in EVENT_FIELDS.get(event_type, {}).items()]
+    fields.append(pa.field('extra', STR))
+    if event_type not in EVENT_FIELDS:
+        fields.insert(1, pa.field('type', STR))
+    return pa.schema(fields)
+
+def _cast(value, arrow_type):
+    if value is None:
+        return None
+    if pa.types.is_list(arrow_type):
+        return [int(v) for v in value]
+    return _CASTS[arrow_type](value)
+
+def rows_to_batch(event_type, rows):
+    """[timestamp str, type, data dict] rows of one type → RecordBatch."""
+    fields = EVENT_FIELDS.get(event_type, {})
+    cols = defaultdict(list)
+    for logged_at, row_type, data in rows:
+        data = dict(data)
+        data.pop('type', None)
+        cols['logged_at'].append(datetime.strptime(logged_at, '%Y-%m-%d %H:%M:%S'))
+        if event_type not in EVENT_FIELDS:
+            cols['type'].append(row_type)
+        for name, arrow_type in [('timestamp', I64), *fields.items()]:
+            value = data.pop(name, None)
+            try:
+                cols[name].append(_cast(value, arrow_type))
+            except (TypeError, ValueError):
+                cols[name].append(None)
+                data[name] = value
+        cols['extra'].append(json.dumps(data, default=str) if data else None)
+    schema = schema_for(event_type)
+    return pa.record_batch([pa.array(cols[f.name], f.type) for f in schema], schema=schema)
+
+
+# ─── Writer ────────────────────────────────────────────────────────────────────
+class ArrowSegmentWriter(BufferedWriter):
+    """
+    BufferedWriter sink that appends typed record batches to per-type segments.
+
+    A type's current segment is rolled over once it holds segment_rows rows or
+    has been open for segment_seconds.
+    """
+
+    def __init__(self, root, segment_rows=100_000, segment_seconds=3600.0, **kwargs):
+        super().__init__(root, **kwargs)
+        self.root = root
+        self.segment_rows = int(segment_rows)
+        self.segment_seconds = float(segment_seconds)
+        self._segments = {}  # type → [file, ipc writer, rows, opened_at]
+        self._seq = 0
+        os.makedirs(root, exist_ok=True)
+        self.start()
+
+    def _open_segment(self, key):
+        directory = os.path.join(self.root, key)
+        os.makedirs(directory, exist_ok=True)
+        self._seq += 1
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self._seq:04d}.arrows"
+        f = open(os.path.join(directory, name), 'wb')
+        segment = [f, ipc.new_stream(f, schema_for(key)), 0, time.monotonic()]
+        self._segments[key] = segment
+        return segment
+
+    def _close_segment(self, key):
+        f, writer, _, _ = self._segments.pop(key)
+        writer.close()
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+
+    def _write_rows(self, rows):
+        by_type = defaultdict(list)
+        for row in rows:
+            by_type[row[1] if row[1] in EVENT_FIELDS else OTHER].append(row)
+        for key, group in by_type.items():
+            segment = self._segments.get(key)
+            if segment is not None and (
+                    segment[2] >= self.segment_rows
+                    or time.monotonic() - segment[3] >= self.segment_seconds):
+                self._close_segment(key)
+                segment = None
+            if segment is None:
+                segment = self._open_segment(key)
+            segment[1].write_batch(rows_to_batch(key, group))
+            segment[0].flush()
+            segment[2] += len(group)
+
+    def _sync(self):
+        for f, _, _, _ in self._segments.values():
+            os.fsync(f.fileno())
+
+    def _close_sink(self):
+        for key in list(self._segments):
+            self._close_segment(key)
+
+
+# ─── Reading & conversion ─────────────────────────────────────────────────────
+def read_segments(root, event_type):
+    """Concatenate every segment of one event type into a pyarrow Table."""
+    directory = os.path.join(root, event_type)
+    if not os.path.isdir(directory):
+        return pa.table({f.name: pa.array([], f.type) for f in schema_for(event_type)})
+    batches = []
+    for name in sorted(os.listdir(directory)):
+        # memory-mapped: batches reference the file pages instead of copies
+        with pa.memory_map(os.path.join(directory, name)) as f:
+            try:
+                for batch in ipc.open_stream(f):
+                    batches.append(batch)
+            except pa.ArrowInvalid:
+                pass  # truncated tail of a segment that was never closed
+    return pa.Table.from_batches(batches, schema=schema_for(event_type))
+
+def load_telemetry(root, event_types=None):
+    """{event type: Table} for the requested (default: all stored) event types."""
+    if event_types is None:
+        event_types = sorted(d for d in os.listdir(root)
+                             if os.path.isdir(os.path.join(root, d)))
+    return {t: read_segments(root, t) for t in event_types}
+
+def iter_csv_rows(csv_path, encoding='cp1252'):
+    """Yield [timestamp, type, data dict] from a legacy user_data.csv, skipping bad lines."""
+    with open(csv_path, newline='', encoding=encoding, errors='replace') as f:
+        for row in csv.reader(f):
+            if len(row) != 3 or row[0] == 'timestamp':
+                continue
+            try:
+                data = ast.literal_eval(row[2])
+                datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S')
+            except (ValueError, SyntaxError):
+                continue
+            if isinstance(data, dict):
+                yield [row[0], row[1], data]
+
+def convert_csv(csv_path, root, chunk_rows=50_000, **kwargs):
+    """Stream a legacy CSV into Arrow segments; returns the number of rows converted."""
+    kwargs.setdefault('flush_rows', chunk_rows)
+    writer = ArrowSegmentWriter(root, fsync_interval=-1, **kwargs)
+    chunk, total = [], 0
+    for row in iter_csv_rows(csv_path):
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            writer.write_many(chunk)
+            total += len(chunk)
+            chunk = []
+    writer.write_many(chunk)
+    total += len(chunk)
+    writer.close(timeout=None)
+    return total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Columnar telemetry store')
+    sub = parser.add_subparsers(dest='command', required=True)
+    conv = sub.add_parser('convert', help='convert a legacy user_data.csv')
+    conv.add_argument('csv_path')
+    conv.add_argument('root')
+    summ = sub.add_parser('summary', help='row counts per event type')
+    summ.add_argument('root')
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        started = time.perf_counter()
+        total = convert_csv(args.csv_path, args.root)
+        print(f"Converted {total} rows in {time.perf_counter() - started:.2f}s → {args.root}")
+    else:
+        for event_type, table in load_telemetry(args.root).items():
+            print(f"{event_type:25} {table.num_rows:8} rows  {table.nbytes / 1024:8.1f} KB")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
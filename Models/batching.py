@@ -0,0 +1,131 @@
+import os
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-item requests into one padded batch.
+
+    Callers block in submit() while a dedicated inference thread waits up to
+    max_wait_ms (or until max_batch items are queued), runs run_batch() once on
+    the stacked inputs and hands every caller its own row of the result.
+    """
+
+    def __init__(self, run_batch, max_batch=64, max_wait_ms=5.0, history=1024):
+        self.run_batch = run_batch
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        # rolling per-batch stats: (batch size, mean queue wait s, inference s)
+        self._batches = deque(maxlen=history)
+        self._total_batches = 0
+        self._total_items = 0
+
+    # ─── Public API ────────────────────────────────────────────────────────────
+    def submit(self, *inputs):
+        """Queue one request's inputs (one row per array) and wait for its output row."""
+        self._ensure_thread()
+        fut = Future()
+        self._queue.put((time.perf_counter(), inputs, fut))
+        return fut.result()
+
+    def close(self):
+        """Stop the inference thread once the requests already queued are served."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(None)
+            self._thread = None
+
+    def stats(self):
+        with self._lock:
+            batches = list(self._batches)
+            total_batches, total_items = self._total_batches, self._total_items
+        if not batches:
+            return {'batches': 0, 'items': 0, 'max_batch': self.max_batch,
+                    'max_wait_ms': self.max_wait * 1000.0}
+        sizes = np.array([b[0] for b in batches], dtype='float64')
+        waits = np.array([b[1] for b in batches], dtype='float64') * 1000.0
+        infer = np.array([b[2] for b in batches], dtype='float64') * 1000.0
+        return {
+            'batches':            total_batches,
+            'items':              total_items,
+            'max_batch':          self.max_batch,
+            'max_wait_ms':        self.max_wait * 1000.0,
+            'last_batch_size':    int(sizes[-1]),
+            'mean_batch_size':    round(float(sizes.mean()), 3),
+            'mean_occupancy':     round(float(sizes.mean()) / self.max_batch, 4),
+            'queue_wait_ms_p50':  round(float(np.percentile(waits, 50)), 3),
+            'queue_wait_ms_p95':  round(float(np.percentile(waits, 95)), 3),
+            'inference_ms_p50':   round(float(np.percentile(infer, 50)), 3),
+            'inference_ms_p95':   round(float(np.percentile(infer, 95)), 3),
+        }
+
+    # ─── Inference thread ──────────────────────────────────────────────────────
+    def _ensure_thread(self):
+        # started lazily (and restarted after fork) so pre-fork servers work too
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._loop, name='inference', daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self, q):
+        first = q.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = q.get(timeout=remaining) if remaining > 0 else q.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:  # close() requested: serve this batch, stop after
+                q.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        q = self._queue
+        while True:
+            batch = self._collect(q)
+            if batch is None:
+                return
+            started = time.perf_counter()
+            try:
+                stacked = [np.stack(arrs) for arrs in zip(*(item[1] for item in batch))]
+                outputs = self.run_batch(*stacked)
+            except Exception as exc:
+                for _, _, fut in batch:
+                    fut.set_exception(exc)
+                continue
+            finished = time.perf_counter()
+
+            for row, (_, _, fut) in zip(outputs, batch):
+                fut.set_result(row)
+
+            with self._lock:
+                self._batches.append((
+                    len(batch),
+                    sum(started - item[0] for item in batch) / len(batch),
+                    finished - started,
+                ))
+                self._total_batches += 1
+                self._total_items += len(batch)
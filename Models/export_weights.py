@@ -0,0 +1,112 @@
+"""
+Export the Keras LSTM models to compact .npz files for the NumPy backend.
+
+Reads the HDF5 files with h5py only, so no TensorFlow is needed to export:
+
+    python export_weights.py                      # all three models → Saved Models/*.npz
+    python export_weights.py saved_tlstm.h5 --verify
+    python export_weights.py --precision float16 int8   # → *.fp16.npz / *.int8.npz
+
+--verify loads the original model through Keras and checks the NumPy forward
+pass against it on random inputs. Reduced-precision exports are
+post-training quantized (see numpy_lstm.quantize); their accuracy on held-out
+windows is reported by Benchmarks/bench_quantized.py.
+"""
+import os
+import sys
+import json
+import argparse
+
+import h5py
+import numpy as np
+
+from numpy_lstm import PRECISIONS, SAVED_MODELS_DIR, NumpyModel, quantize
+
+DEFAULT_MODELS = ['saved_vanilla_lstm_new.h5', 'saved_tlstm.h5', 'saved_attn_lstm.h5']
+
+
+def _layer_weights(f, name):
+    group = f['model_weights'][name]
+    return [np.asarray(group[w], dtype='float32') for w in group.attrs['weight_names']]
+
+def export(h5_path):
+    """Return the .npz payload (dict of arrays) for one saved model."""
+    with h5py.File(h5_path, 'r') as f:
+        raw = f.attrs['model_config']
+        config = json.loads(raw.decode('utf-8') if isinstance(raw, bytes) else raw)
+        layers = config['config']['layers']
+        by_type = {}
+        for layer in layers:
+            by_type.setdefault(layer['class_name'], []).append(layer['config'])
+
+        inputs = by_type['InputLayer']
+        shape = inputs[0].get('batch_shape') or inputs[0].get('batch_input_shape')
+        lstm = by_type['LSTM'][0]
+        dense = by_type['Dense']
+        attention = lstm.get('return_sequences', False)
+
+        embeddings, = _layer_weights(f, by_type['Embedding'][0]['name'])
+        kernel, recurrent_kernel, bias = _layer_weights(f, lstm['name'])
+        dense_kernel, dense_bias = _layer_weights(f, dense[-1]['name'])
+        payload = {
+            'seq_len':          np.int32(shape[1]),
+            'use_deltas':       np.bool_(len(inputs) > 1),
+            'attention':        np.bool_(attention),
+            'embeddings':       embeddings,
+            'kernel':           kernel,
+            'recurrent_kernel': recurrent_kernel,
+            'bias':             bias,
+            'dense_kernel':     dense_kernel,
+            'dense_bias':       dense_bias,
+        }
+        if attention:
+            payload['attn_kernel'], payload['attn_bias'] = _layer_weights(f, dense[0]['name'])
+    return payload
+
+def verify(h5_path, npz_path, samples=256, atol=1e-5):
+    """Compare the NumPy forward pass with Keras on random inputs; returns max |Δp|."""
+    import keras
+    keras.config.enable_unsafe_deserialization()
+    from tensorflow.keras.models import load_model
+    from keras_layers import SumOverTime
+
+    model = load_model(h5_path, custom_objects={'SumOverTime': SumOverTime})
+    np_model = NumpyModel.load(npz_path)
+    rng = np.random.default_rng(0)
+    vocab = np_model.vocab_size
+    ev = rng.integers(0, vocab, size=(samples, np_model.seq_len)).astype('int32')
+    dt = rng.random((samples, np_model.seq_len)).astype('float32')
+    inputs = [ev, dt.reshape(samples, np_model.seq_len, 1)] if np_model.use_deltas else ev
+
+    diff = float(np.abs(model.predict(inputs, verbose=0) - np_model.predict(inputs)).max())
+    status = 'OK' if diff <= atol else 'MISMATCH'
+    print(f"[VERIFY] {os.path.basename(h5_path)}: max |Δp| = {diff:.2e} ({status})")
+    return diff
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('models', nargs='*', default=DEFAULT_MODELS,
+                        help='HDF5 files (looked up in "Saved Models" if not found)')
+    parser.add_argument('--out-dir', default=SAVED_MODELS_DIR)
+    parser.add_argument('--precision', nargs='+', default=['float32'], choices=list(PRECISIONS),
+                        help='one .npz per precision (float16 / int8 are post-training quantized)')
+    parser.add_argument('--verify', action='store_true', help='check against Keras (needs TensorFlow)')
+    args = parser.parse_args(argv)
+
+    worst = 0.0
+    for name in args.models:
+        h5_path = name if os.path.exists(name) else os.path.join(SAVED_MODELS_DIR, name)
+        base = os.path.splitext(os.path.basename(h5_path))[0]
+        payload = export(h5_path)
+        for precision in args.precision:
+            npz_path = os.path.join(args.out_dir, base + PRECISIONS[precision] + '.npz')
+            np.savez(npz_path, **quantize(payload, precision))
+            print(f"[INFO] {h5_path} → {npz_path} ({os.path.getsize(npz_path) / 1024:.1f} KB)")
+            if args.verify:
+                diff = verify(h5_path, npz_path, atol=1e-5 if precision == 'float32' else 5e-2)
+                if precision == 'float32':
+                    worst = max(worst, diff)
+    return 0 if worst <= 1e-5 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,316 @@
+"""
+Feature extraction shared by the training notebooks and the prediction server.
+
+Raw log → (event ids, scaled inter-event deltas) → fixed-length windows, using
+the same label_encoder.pkl / scaler.pkl the server predicts with:
+
+    pipeline = FeaturePipeline.load('.')
+    X_events, X_deltas, y = load_windows('user_data.csv', pipeline, lookback=15)
+
+For logs that do not fit in memory, stream batches straight into model.fit:
+
+    source = lambda: pipeline.transform(iter_csv_events('user_data.csv'))
+    model.fit(training_batches(source, 15, batch_size=32, epochs=None),
+              steps_per_epoch=count_batches(source, 15, 32), epochs=20)
+"""
+import os
+import pickle
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# rows the collector writes itself; the extension never sends them (tabMemory:
+# per-tab memory samples, one row per mapped tab per tick)
+SERVER_SIDE_TYPES = ('resourceUsage', 'tabMemory')
+# rows the extensions log about their own discards and the reloads that follow
+DISCARD_TYPES = ('tabAboutToBeDiscarded', 'tabDiscarded', 'tabReloaded')
+# bookkeeping rows are not user events: never fitted, trained on or counted as
+# unknown (the notebooks' filter plus the rows added since)
+EXCLUDED_TYPES = ('memoryUsage', 'tabDuration', 'periodicBrowserStats') \
+    + SERVER_SIDE_TYPES + DISCARD_TYPES
+
+
+# ─── Readers ───────────────────────────────────────────────────────────────────
+# each yields (timestamps in epoch seconds float64, event types object array) chunks
+def iter_csv_events(path, chunk_rows=100_000, encoding='cp1252'):
+    """Stream (timestamp, type) chunks from a collector user_data.csv."""
+    import pandas as pd
+    reader = pd.read_csv(
+        path, header=None, names=['timestamp', 'type', 'data'], dtype=str,
+        on_bad_lines='skip', encoding=encoding, chunksize=chunk_rows
+    )
+    for df in reader:
+        df = df.dropna()
+        ts = pd.to_datetime(df['timestamp'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+        ok = ts.notna().to_numpy()
+        if not ok.any():
+            continue
+        seconds = ts[ok].to_numpy().astype('datetime64[s]').astype('int64').astype('float64')
+        # the notebooks sort by timestamp; rows arrive nearly in order, so a
+        # stable per-chunk sort keeps ties in log order
+        order = np.argsort(seconds, kind='stable')
+        yield seconds[order], df['type'].to_numpy(dtype=object)[ok][order]
+
+def iter_arrow_events(root, chunk_rows=100_000):
+    """
+    (timestamp, type) chunks from the collector's Arrow telemetry directory.
+
+    Only the logged_at column is read (memory-mapped), one record batch at a
+    time per event type. The types' batches are merged into chronological
+    chunks of about chunk_rows, so memory stays at one batch per type plus the
+    chunk being built, whatever the size of the directory.
+    """
+    streams, buffers = {}, {}
+    for event_type in sorted(os.listdir(root)):
+        directory = os.path.join(root, event_type)
+        if event_type in EXCLUDED_TYPES or event_type.startswith('_') \
+                or not os.path.isdir(directory):
+            continue
+        streams[event_type] = _logged_at(directory)
+        buffers[event_type] = np.empty(0)
+
+    seconds, types, pending = [], [], 0
+    while buffers:
+        for event_type in list(streams):
+            while not len(buffers[event_type]):
+                col = next(streams[event_type], None)
+                if col is None:
+                    del streams[event_type]
+                    break
+                buffers[event_type] = col
+        # every row not read yet is later than the newest buffered row of its
+        # type, so rows up to the earliest of those can go out in order
+        cutoff = min((buffers[t][-1] for t in streams), default=np.inf)
+        merged_s, merged_t = [], []
+        for event_type, buf in list(buffers.items()):
+            n = int(np.searchsorted(buf, cutoff, side='right'))
+            if n:
+                merged_s.append(buf[:n])
+                merged_t.append(np.full(n, event_type, dtype=object))
+                buffers[event_type] = buf = buf[n:]
+            if event_type not in streams and not len(buf):
+                del buffers[event_type]
+        if merged_s:
+            merged_s = np.concatenate(merged_s)
+            order = np.argsort(merged_s, kind='stable')
+            seconds.append(merged_s[order])
+            types.append(np.concatenate(merged_t)[order])
+            pending += len(order)
+        if pending >= chunk_rows or (pending and not buffers):
+            yield np.concatenate(seconds), np.concatenate(types)
+            seconds, types, pending = [], [], 0
+
+def _logged_at(directory):
+    """logged_at of one event type in epoch seconds, a sorted array per record batch."""
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    for name in sorted(os.listdir(directory)):
+        with pa.memory_map(os.path.join(directory, name)) as f:
+            try:
+                for batch in ipc.open_stream(f):
+                    col = batch.column('logged_at').to_numpy(zero_copy_only=False)
+                    yield np.sort(col.astype('datetime64[s]').astype('int64').astype('float64'))
+            except pa.ArrowInvalid:
+                pass  # truncated tail of a segment that was never closed
+
+
+# ─── Encoding ──────────────────────────────────────────────────────────────────
+class FeaturePipeline:
+    """
+    Label encoding + delta scaling with the artifacts the server ships with.
+
+    The fitted encoder/scaler are compiled once into a type → id dict and a
+    single affine op (x * scale_ + min_), so per-request encoding skips
+    sklearn's input validation entirely.
+    """
+
+    def __init__(self, label_encoder, scaler):
+        self.label_encoder = label_encoder
+        self.scaler = scaler
+        self._codes = {str(c): i for i, c in enumerate(label_encoder.classes_)}
+        self._scale = float(scaler.scale_[0])
+        self._offset = float(scaler.min_[0])
+        self._clip = tuple(scaler.feature_range) if getattr(scaler, 'clip', False) else None
+
+    @classmethod
+    def load(cls, directory='.'):
+        with open(os.path.join(directory, 'label_encoder.pkl'), 'rb') as f:
+            label_encoder = pickle.load(f)
+        with open(os.path.join(directory, 'scaler.pkl'), 'rb') as f:
+            scaler = pickle.load(f)
+        return cls(label_encoder, scaler)
+
+    @classmethod
+    def fit(cls, chunks):
+        """Fit a fresh encoder/scaler in one streaming pass (what the notebooks did in memory)."""
+        from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+        classes, scaler, last = set(), MinMaxScaler(), None
+        for seconds, types in chunks:
+            keep = ~np.isin(types, EXCLUDED_TYPES)
+            seconds, types = seconds[keep], types[keep]
+            if not len(types):
+                continue
+            classes.update(types.tolist())
+            deltas, last = _deltas(seconds, last)
+            scaler.partial_fit(deltas.reshape(-1, 1))
+        label_encoder = LabelEncoder().fit(sorted(classes))
+        return cls(label_encoder, scaler)
+
+    @property
+    def classes(self):
+        return self.label_encoder.classes_
+
+    def encode_types(self, types):
+        """Event ids for a sequence of event types; -1 where the type is unknown."""
+        get = self._codes.get
+        return np.fromiter((get(t, -1) if isinstance(t, str) else -1 for t in types),
+                           dtype='int32', count=len(types))
+
+    def scale_deltas(self, seconds, out=None):
+        """MinMaxScaler.transform for the single delta feature, as one fused affine op."""
+        out = np.multiply(seconds, self._scale, out=out)
+        out += self._offset
+        if self._clip is not None:
+            np.clip(out, *self._clip, out=out)
+        return out
+
+    def transform(self, chunks):
+        """
+        (timestamps, types) chunks → (event ids int32, scaled deltas float32) chunks.
+
+        Excluded and unknown event types are dropped before deltas are taken,
+        so a delta always spans two events the model knows. Deltas carry over
+        chunk boundaries; the first event's delta is 0 as in the notebooks.
+        """
+        last = None
+        for seconds, types in chunks:
+            # a chunk has few distinct types: look each up once, then gather
+            uniques, inverse = np.unique(types.astype(str), return_inverse=True)
+            codes = self.encode_types(uniques.tolist())[inverse]
+            keep = codes >= 0
+            seconds, codes = seconds[keep], codes[keep]
+            if not len(codes):
+                continue
+            deltas, last = _deltas(seconds, last)
+            yield codes, self.scale_deltas(deltas).astype('float32')
+
+    def encode_batch(self, histories, width, align='right', out=None):
+        """
+        Encode, scale and left-pad many tab histories at once.
+
+        histories: list of (event_sequence, time_sequence) pairs.
+        Returns (ev_in, dt_in, lengths) where ev_in/dt_in are (N, width) arrays
+        (width is the model's seq_len for windowed prediction) and lengths[i] is the
+        number of known events tab i contributed (0 → nothing to predict).
+        align='left' packs events from column 0 instead of ending them in the last column.
+        out: optional preallocated (ev_in, dt_in) pair to fill instead of allocating.
+        """
+        n = len(histories)
+        if out is None:
+            ev_in = np.zeros((n, width), dtype='int32')
+            dt_in = np.zeros((n, width), dtype='float32')
+        else:
+            ev_in, dt_in = out
+            ev_in.fill(0)
+            dt_in.fill(0.0)
+
+        # flatten every history so the lookup and the affine scale run once per batch
+        sizes = np.empty(n, dtype='int64')
+        flat_events, flat_times = [], []
+        for i, (events, times) in enumerate(histories):
+            sizes[i] = len(events)
+            flat_events.extend(events)
+            flat_times.extend(times[:len(events)])
+            if len(times) < len(events):
+                flat_times.extend([0.0] * (len(events) - len(times)))
+        if not flat_events:
+            return ev_in, dt_in, np.zeros(n, dtype='int64')
+
+        encoded = self.encode_types(flat_events)
+        keep = encoded >= 0
+        rows = np.repeat(np.arange(n), sizes)[keep]
+        lengths = np.bincount(rows, minlength=n)
+        if not len(rows):
+            return ev_in, dt_in, lengths
+        encoded = encoded[keep]
+        scaled = self.scale_deltas(np.asarray(flat_times, dtype='float64')[keep])
+
+        # place each history: right-aligned ends in column width-1, left-aligned starts at 0
+        starts = np.cumsum(lengths) - lengths
+        cols = np.arange(len(rows)) - starts[rows]
+        if align == 'right':
+            cols += width - lengths[rows]
+        fits = (cols >= 0) & (cols < width)
+        ev_in[rows[fits], cols[fits]] = encoded[fits]
+        dt_in[rows[fits], cols[fits]] = scaled[fits]
+        return ev_in, dt_in, lengths
+
+def _deltas(seconds, last):
+    """Seconds since the previous event (0 for the very first); clipped at 0 for out-of-order rows."""
+    prev = np.empty_like(seconds)
+    prev[0] = seconds[0] if last is None else last
+    prev[1:] = seconds[:-1]
+    return np.maximum(seconds - prev, 0.0), seconds[-1]
+
+
+# ─── Windows ───────────────────────────────────────────────────────────────────
+def windows(events, deltas, lookback):
+    """
+    Next-event training windows as strided views (no per-window copies).
+
+    Returns X_events (n, lookback), X_deltas (n, lookback, 1) and y (n,) with
+    n = len(events) - lookback, matching the notebooks' range() loop.
+    """
+    if len(events) <= lookback:
+        return (np.empty((0, lookback), events.dtype),
+                np.empty((0, lookback, 1), deltas.dtype), events[:0])
+    X_events = sliding_window_view(events[:-1], lookback)
+    X_deltas = sliding_window_view(deltas[:-1], lookback)[..., np.newaxis]
+    return X_events, X_deltas, events[lookback:]
+
+def iter_windows(encoded_chunks, lookback):
+    """Windows per encoded chunk; the last lookback events carry over so none are lost."""
+    tail_ev = np.empty(0, 'int32')
+    tail_dt = np.empty(0, 'float32')
+    for codes, scaled in encoded_chunks:
+        events = np.concatenate([tail_ev, codes])
+        deltas = np.concatenate([tail_dt, scaled])
+        X_events, X_deltas, y = windows(events, deltas, lookback)
+        if len(y):
+            yield X_events, X_deltas, y
+        tail_ev, tail_dt = events[-lookback:], deltas[-lookback:]
+
+def load_windows(path, pipeline, lookback, chunk_rows=100_000):
+    """Whole-log windows in memory (what the notebooks built), from a CSV or Arrow dir."""
+    chunks = iter_arrow_events(path, chunk_rows) if os.path.isdir(path) \
+        else iter_csv_events(path, chunk_rows)
+    encoded = list(pipeline.transform(chunks))
+    if not encoded:
+        return windows(np.empty(0, 'int32'), np.empty(0, 'float32'), lookback)
+    return windows(np.concatenate([c for c, _ in encoded]),
+                   np.concatenate([d for _, d in encoded]), lookback)
+
+
+# ─── model.fit input ──────────────────────────────────────────────────────────
+def training_batches(make_chunks, lookback, batch_size=32, use_deltas=True, epochs=1):
+    """
+    Yield (inputs, y) batches for model.fit.
+
+    make_chunks: zero-argument callable returning a fresh iterator of encoded
+    chunks (e.g. lambda: pipeline.transform(iter_csv_events(path))); it is
+    called once per epoch, so nothing beyond one chunk is held in memory.
+    epochs=None repeats forever (pair with steps_per_epoch=count_batches(...)).
+    """
+    epoch = 0
+    while epochs is None or epoch < epochs:
+        for X_events, X_deltas, y in iter_windows(make_chunks(), lookback):
+            for start in range(0, len(y), batch_size):
+                end = start + batch_size
+                inputs = (X_events[start:end], X_deltas[start:end]) if use_deltas \
+                    else X_events[start:end]
+                yield inputs, y[start:end]
+        epoch += 1
+
+def count_batches(make_chunks, lookback, batch_size=32):
+    """Batches training_batches() yields per epoch (one cheap pass over the log)."""
+    return sum(-(-len(y) // batch_size) for _, _, y in iter_windows(make_chunks(), lookback))
@@ -0,0 +1,65 @@
+"""
+Gunicorn settings for wsgi:app. Every knob can be overridden through the
+environment (or on the gunicorn command line).
+
+    INFERENCE_BACKEND=numpy GUNICORN_THREADS=8 gunicorn -c gunicorn.conf.py wsgi:app
+    SERVER_HISTORY=0 GUNICORN_WORKERS=4 gunicorn -c gunicorn.conf.py wsgi:app   # stateless clients only
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:1100')
+
+# Pre-fork workers × threads per worker. Threads of one worker share its
+# micro-batcher, so a burst of /predict calls from one alarm is coalesced into
+# a few forward passes instead of queueing behind each other.
+# Each worker keeps its own /events tab store and incremental LSTM states, so
+# /events and a later /predict_batch {tab_ids} must reach the same process.
+# The extension syncs histories server-side by default (SERVER_HISTORY in
+# background.js): one worker then, scaled through threads. Set
+# SERVER_HISTORY=0 when every client sends full histories to use more.
+SERVER_HISTORY = os.getenv('SERVER_HISTORY', '1') == '1'
+workers = int(os.getenv('GUNICORN_WORKERS', '1' if SERVER_HISTORY else '2'))
+if SERVER_HISTORY and workers > 1:
+    print(f"[WARN] SERVER_HISTORY=1: per-tab state lives in one process, "
+          f"running 1 worker instead of {workers}")
+    workers = 1
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+worker_class = 'gthread'
+
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE_S', '5'))
+# workers silent for this long are killed and replaced
+timeout = int(os.getenv('GUNICORN_TIMEOUT_S', '30'))
+# on HUP/TERM, in-flight requests get this long to finish
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT_S', '30'))
+# recycle workers after N requests (0 = never), jittered so they don't restart together
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+# Load models in the master and share them copy-on-write. TensorFlow is not
+# fork-safe, so with the keras backend each worker loads its own copy instead.
+preload_app = os.getenv(
+    'GUNICORN_PRELOAD', '1' if os.getenv('INFERENCE_BACKEND', 'keras') == 'numpy' else '0'
+) == '1'
+
+# One math thread per worker: workers × BLAS/TF pools larger than the core
+# count make latency spiky under load.
+for var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+            'TF_NUM_INTRAOP_THREADS', 'TF_NUM_INTEROP_THREADS'):
+    os.environ.setdefault(var, os.getenv('GUNICORN_MATH_THREADS', '1'))
+
+# /predict's per-request event dump is debug output; keep it out of production logs
+os.environ.setdefault('LOG_LEVEL', 'info')
+# /metrics and /profile report the worker that happens to answer the scrape
+# (one process-local registry per worker); scrape with GUNICORN_WORKERS=1 for totals.
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+
+def when_ready(server):
+    server.log.info("Prediction server ready: %d workers x %d threads, preload=%s",
+                    workers, threads, preload_app)
+
+def post_fork(server, worker):
+    # batcher threads and the registry sweeper notice the new pid and restart lazily
+    server.log.info("Worker %s forked", worker.pid)
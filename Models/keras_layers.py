@@ -0,0 +1,8 @@
+from tensorflow.keras import backend as K
+from tensorflow.keras.utils import register_keras_serializable
+from tensorflow.keras.layers import Layer
+
+@register_keras_serializable()
+class SumOverTime(Layer):
+    def call(self, inputs):
+        return K.sum(inputs, axis=1)
@@ -0,0 +1,327 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# ─── LSTM math (Keras gate order: input, forget, cell, output) ────────────────
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+def lstm_step(x, h, c, kernel, recurrent_kernel, bias):
+    """One LSTM time step for a batch: x (B, F), h/c (B, U) → new (h, c)."""
+    z = x @ kernel + h @ recurrent_kernel + bias
+    i, f, g, o = np.split(z, 4, axis=-1)
+    c = sigmoid(f) * c + sigmoid(i) * np.tanh(g)
+    h = sigmoid(o) * np.tanh(c)
+    return h, c
+
+def softmax(x, axis=-1):
+    e = np.exp(x - x.max(axis=axis, keepdims=True))
+    return e / e.sum(axis=axis, keepdims=True)
+
+
+# ─── Reduced precision ─────────────────────────────────────────────────────────
+# weight matrices export_weights.py may store as float16 or int8; biases stay float32
+MATRICES = ('embeddings', 'kernel', 'recurrent_kernel', 'dense_kernel', 'attn_kernel')
+PRECISIONS = {'float32': '', 'float16': '.fp16', 'int8': '.int8'}  # → file suffix
+# .h5 and .npz files: written by export_weights.py and retrain.py, read by the
+# server (MODEL_DIR) and the benchmarks
+SAVED_MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Saved Models')
+
+def quantize(weights, precision):
+    """
+    Weights dict → reduced-precision copy. int8 is symmetric per output channel
+    (per column of a kernel, per row of the embedding table) with a float32
+    '<name>_scale' alongside.
+    """
+    if precision == 'float32':
+        return dict(weights)
+    out = dict(weights)
+    out['precision'] = np.str_(precision)
+    for name in MATRICES:
+        if name not in weights:
+            continue
+        w = np.asarray(weights[name], dtype='float32')
+        if precision == 'float16':
+            out[name] = w.astype('float16')
+            continue
+        axis = 1 if name == 'embeddings' else 0
+        scale = np.abs(w).max(axis=axis, keepdims=True) / 127.0
+        scale[scale == 0] = 1.0
+        out[name] = np.clip(np.round(w / scale), -127, 127).astype('int8')
+        out[name + '_scale'] = scale.astype('float32')
+    return out
+
+def dequantize(weights, name):
+    """float32 view of one stored matrix, whatever precision it was saved in."""
+    w = np.asarray(weights[name])
+    if name + '_scale' in weights:
+        return w.astype('float32') * weights[name + '_scale']
+    return w.astype('float32')
+
+
+# ─── Full-window forward pass ─────────────────────────────────────────────────
+class NumpyModel:
+    """
+    NumPy-only forward pass for the exported vanilla / T-LSTM / attention models.
+
+    Loads the .npz written by export_weights.py and exposes a Keras-like
+    predict(), so the server never has to import TensorFlow. The embedding is
+    folded into the LSTM input projection at load time (one (vocab, 4U) table
+    lookup per step instead of an embedding gather plus a matmul).
+
+    Reduced-precision artifacts keep the recurrent and output kernels in their
+    stored dtype (int8 + per-column scale, or float16); they are widened to
+    float32 inside each matmul, so only the small folded input table is
+    resident in float32.
+    """
+
+    def __init__(self, weights):
+        w = {k: np.asarray(v) for k, v in weights.items()}
+        self.seq_len = int(w['seq_len'])
+        self.use_deltas = bool(w['use_deltas'])
+        self.attention = bool(w['attention'])
+        self.precision = str(w.get('precision', 'float32'))
+        self.bias = w['bias'].astype('float32')
+        self.dense_bias = w['dense_bias'].astype('float32')
+        if self.attention:
+            self.attn_kernel = dequantize(w, 'attn_kernel')
+            self.attn_bias = w['attn_bias'].astype('float32')
+        self.recurrent_kernel, self.recurrent_scale = self._stored(w, 'recurrent_kernel')
+        self.dense_kernel, self.dense_scale = self._stored(w, 'dense_kernel')
+
+        embeddings, kernel = dequantize(w, 'embeddings'), dequantize(w, 'kernel')
+        embed_dim = embeddings.shape[1]
+        self.event_proj = embeddings @ kernel[:embed_dim] + self.bias
+        self.delta_proj = kernel[embed_dim] if self.use_deltas else None
+        self.vocab_size = embeddings.shape[0]
+        # float32 copies for IncrementalLSTM; dropped when nothing asks for them
+        self._float_weights = {'embeddings': embeddings, 'kernel': kernel}
+
+    @staticmethod
+    def _stored(w, name):
+        scale = w.get(name + '_scale')
+        if w[name].dtype == np.int8:
+            return w[name], scale.astype('float32')
+        return w[name].astype('float16' if w[name].dtype == np.float16 else 'float32'), None
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(dict(data))
+
+    @property
+    def nbytes(self):
+        arrays = [v for v in vars(self).values() if isinstance(v, np.ndarray)]
+        arrays += list((self._float_weights or {}).values())
+        return sum(a.nbytes for a in arrays)
+
+    def float_weights(self):
+        """float32 (embeddings, kernel, recurrent_kernel, bias, dense_kernel, dense_bias)."""
+        def widen(kernel, scale):
+            kernel = kernel.astype('float32')
+            return kernel * scale if scale is not None else kernel
+        return (self._float_weights['embeddings'], self._float_weights['kernel'],
+                widen(self.recurrent_kernel, self.recurrent_scale), self.bias,
+                widen(self.dense_kernel, self.dense_scale), self.dense_bias)
+
+    def release_float_weights(self):
+        """Free the float32 embedding/input kernel kept for IncrementalLSTM."""
+        self._float_weights = None
+
+    @staticmethod
+    def _matmul(x, kernel, scale):
+        out = x @ kernel if kernel.dtype == np.float32 else x @ kernel.astype('float32')
+        return out * scale if scale is not None else out
+
+    def predict(self, inputs, verbose=0):
+        """inputs: events (N, T) or [events (N, T), deltas (N, T[, 1])] → (N, vocab)."""
+        if self.use_deltas:
+            events, deltas = inputs
+            deltas = np.asarray(deltas, dtype='float32').reshape(len(events), -1)
+        else:
+            events = inputs[0] if isinstance(inputs, (list, tuple)) else inputs
+        events = np.asarray(events, dtype='int64')
+        n, steps = events.shape
+
+        # input projections for every step at once: (N, T, 4U)
+        xz = self.event_proj[events]
+        if self.use_deltas:
+            xz = xz + deltas[..., None] * self.delta_proj
+
+        units = self.recurrent_kernel.shape[0]
+        h = np.zeros((n, units), dtype='float32')
+        c = np.zeros((n, units), dtype='float32')
+        hs = np.empty((n, steps, units), dtype='float32') if self.attention else None
+        for t in range(steps):
+            z = xz[:, t] + self._matmul(h, self.recurrent_kernel, self.recurrent_scale)
+            i, f, g, o = np.split(z, 4, axis=-1)
+            c = sigmoid(f) * c + sigmoid(i) * np.tanh(g)
+            h = sigmoid(o) * np.tanh(c)
+            if hs is not None:
+                hs[:, t] = h
+
+        if self.attention:
+            scores = np.tanh(hs @ self.attn_kernel + self.attn_bias)   # (N, T, 1)
+            h = (hs * softmax(scores, axis=1)).sum(axis=1)            # (N, U)
+        logits = self._matmul(h, self.dense_kernel, self.dense_scale) + self.dense_bias
+        return softmax(logits).astype('float32')
+
+
+# ─── Per-tab state cache ───────────────────────────────────────────────────────
+class TabStateCache:
+    """
+    LRU cache of per-tab LSTM (h, c) states.
+
+    Entries older than ttl seconds are dropped on access; once max_entries is
+    exceeded the least recently used tab is evicted.
+    """
+
+    def __init__(self, max_entries=4096, ttl=1800.0):
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl)
+        self._states = OrderedDict()  # tab_id → (h, c, last_used)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, tab_id):
+        with self._lock:
+            entry = self._states.get(tab_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[2] > self.ttl:
+                del self._states[tab_id]
+                self.evictions += 1
+                return None
+            self._states.move_to_end(tab_id)
+            return entry[0], entry[1]
+
+    def put(self, tab_id, h, c):
+        with self._lock:
+            self._states[tab_id] = (h, c, time.monotonic())
+            self._states.move_to_end(tab_id)
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, tab_id):
+        with self._lock:
+            return self._states.pop(tab_id, None) is not None
+
+    def expire(self):
+        """Drop every entry past its TTL; returns how many were removed."""
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            stale = [k for k, v in self._states.items() if v[2] < cutoff]
+            for k in stale:
+                del self._states[k]
+            self.evictions += len(stale)
+        return len(stale)
+
+
+# ─── Incremental (stateful) inference ─────────────────────────────────────────
+class IncrementalLSTM:
+    """
+    Runs an Embedding→(concat Δt)→LSTM→Dense model one new event at a time.
+
+    Each tab keeps its own (h, c) in a TabStateCache, so a prediction only costs
+    as many LSTM steps as events arrived since the last call. A tab seen for the
+    first time starts from the state reached after seq_len padding steps (what
+    the windowed model sees for an empty tab), so early predictions track
+    /predict closely; longer histories are carried in the state rather than
+    truncated to a seq_len window.
+    """
+
+    def __init__(self, embeddings, kernel, recurrent_kernel, bias,
+                 dense_kernel, dense_bias, use_deltas, seq_len, cache):
+        self.embeddings = np.asarray(embeddings, dtype='float32')
+        self.kernel = np.asarray(kernel, dtype='float32')
+        self.recurrent_kernel = np.asarray(recurrent_kernel, dtype='float32')
+        self.bias = np.asarray(bias, dtype='float32')
+        self.dense_kernel = np.asarray(dense_kernel, dtype='float32')
+        self.dense_bias = np.asarray(dense_bias, dtype='float32')
+        self.use_deltas = use_deltas
+        self.cache = cache
+
+        units = self.recurrent_kernel.shape[0]
+        h = np.zeros((1, units), dtype='float32')
+        c = np.zeros((1, units), dtype='float32')
+        pad_x = self._features(np.zeros((1,), dtype='int32'), np.zeros((1,), dtype='float32'))
+        for _ in range(seq_len):
+            h, c = lstm_step(pad_x, h, c, self.kernel, self.recurrent_kernel, self.bias)
+        self._initial = (h[0], c[0])
+
+    @classmethod
+    def from_model(cls, model, seq_len, cache):
+        """Build from a loaded Keras model or a NumpyModel (vanilla / T-LSTM only)."""
+        if isinstance(model, NumpyModel):
+            if model.attention:
+                raise ValueError('incremental mode needs a single LSTM without attention')
+            return cls(*model.float_weights(),
+                       use_deltas=model.use_deltas, seq_len=seq_len, cache=cache)
+        return cls.from_keras(model, seq_len, cache)
+
+    @classmethod
+    def from_keras(cls, model, seq_len, cache):
+        """Pull the weights out of a loaded vanilla or T-LSTM Keras model."""
+        by_type = {}
+        for layer in model.layers:
+            by_type.setdefault(type(layer).__name__, []).append(layer)
+        if 'LSTM' not in by_type or by_type['LSTM'][0].return_sequences:
+            raise ValueError('incremental mode needs a single LSTM without attention')
+        embeddings, = by_type['Embedding'][0].get_weights()
+        kernel, recurrent_kernel, bias = by_type['LSTM'][0].get_weights()
+        dense_kernel, dense_bias = by_type['Dense'][-1].get_weights()
+        return cls(embeddings, kernel, recurrent_kernel, bias, dense_kernel, dense_bias,
+                   use_deltas=len(model.inputs) > 1, seq_len=seq_len, cache=cache)
+
+    def _features(self, events, deltas):
+        x = self.embeddings[events]
+        if self.use_deltas:
+            x = np.concatenate([x, deltas[:, None].astype('float32')], axis=-1)
+        return x
+
+    def advance(self, tab_ids, events, deltas, lengths, resume=None):
+        """
+        Feed each tab its new events; returns (next-event probabilities, lost).
+
+        events/deltas: (B, T) arrays, row i holding lengths[i] new events
+        left-aligned. Tabs with no new events just re-read their cached state.
+        resume[i] marks a tab whose earlier events were already fed: if its
+        state is gone (TTL, LRU eviction, model swap) starting it over from
+        padding would predict from a truncated history, so its row index is
+        listed in lost instead, and nothing is stored for it.
+        """
+        n = len(tab_ids)
+        units = self.recurrent_kernel.shape[0]
+        h = np.empty((n, units), dtype='float32')
+        c = np.empty((n, units), dtype='float32')
+        lost = []
+        for i, tab_id in enumerate(tab_ids):
+            state = self.cache.get(tab_id)
+            if state is None:
+                if resume is not None and resume[i]:
+                    lost.append(i)
+                state = self._initial
+            h[i], c[i] = state
+
+        for t in range(events.shape[1] if n else 0):
+            active = lengths > t
+            if not active.any():
+                break
+            x = self._features(events[active, t], deltas[active, t])
+            h[active], c[active] = lstm_step(
+                x, h[active], c[active], self.kernel, self.recurrent_kernel, self.bias
+            )
+
+        skip = set(lost)
+        for i, tab_id in enumerate(tab_ids):
+            if i not in skip:
+                self.cache.put(tab_id, h[i].copy(), c[i].copy())
+        return softmax(h @ self.dense_kernel + self.dense_bias), lost
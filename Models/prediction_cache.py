@@ -0,0 +1,81 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    LRU/TTL cache of next-event probability vectors.
+
+    Keys hash the model name and generation (a hot-swapped model is a new
+    generation, so probabilities a request still running on the old copy
+    stores after the swap are never served for the new one) with the exact
+    encoded, scaled and padded window the model would see, so an idle tab that
+    resends the same history hits the cache without a forward pass. Only probabilities are cached; temperature
+    sampling still runs on every request. max_entries=0 disables the cache.
+    """
+
+    def __init__(self, max_entries=8192, ttl=600.0):
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl)
+        self._entries = OrderedDict()  # key → (probs, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(model_name, generation, *rows):
+        h = hashlib.blake2b(f'{model_name}:{generation}'.encode(), digest_size=16)
+        for row in rows:
+            h.update(row.tobytes())
+        return h.digest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, probs):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (probs, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries':     len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s':       self.ttl,
+                'hits':        self.hits,
+                'misses':      self.misses,
+                'evictions':   self.evictions,
+                'hit_rate':    round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,243 @@
+import os
+import gc
+import time
+import itertools
+import threading
+from collections import OrderedDict
+
+try:
+    import psutil
+except ImportError:  # footprint then falls back to weight bytes only
+    psutil = None
+
+
+def _rss():
+    return psutil.Process().memory_info().rss if psutil else 0
+
+
+class LoadedModel:
+    """A warm model plus everything the endpoints need to serve it."""
+
+    def __init__(self, name, model, seq_len, use_deltas, weights_bytes,
+                 batcher=None, incremental=None, tab_states=None):
+        self.name = name
+        self.model = model
+        self.seq_len = seq_len
+        self.use_deltas = use_deltas
+        self.weights_bytes = weights_bytes
+        self.batcher = batcher
+        self.incremental = incremental
+        self.tab_states = tab_states
+        self.load_seconds = 0.0
+        self.rss_delta_bytes = 0
+        self.loaded_at = time.time()
+        self.source_mtime = None  # st_mtime_ns of the file it was loaded from
+        self.generation = 0       # set by the registry; differs for every load of a model
+        self.last_used = time.monotonic()
+        self.requests = 0
+
+    @property
+    def footprint(self):
+        return max(self.weights_bytes, self.rss_delta_bytes)
+
+    def close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+
+    def describe(self):
+        return {
+            'name':            self.name,
+            'seq_len':         self.seq_len,
+            'load_seconds':    round(self.load_seconds, 3),
+            'loaded_at':       time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.loaded_at)),
+            'idle_seconds':    round(time.monotonic() - self.last_used, 1),
+            'requests':        self.requests,
+            'weights_bytes':   self.weights_bytes,
+            'rss_delta_bytes': self.rss_delta_bytes,
+            'generation':      self.generation,
+            'source_mtime':    None if self.source_mtime is None else time.strftime(
+                '%Y-%m-%d %H:%M:%S', time.localtime(self.source_mtime / 1e9)),
+        }
+
+
+class ModelRegistry:
+    """
+    Loads models on first use and keeps them warm.
+
+    loader(name) must return a LoadedModel. Models idle for longer than
+    idle_ttl seconds are unloaded by a background sweeper, and loading a model
+    that would push the summed footprint over memory_budget bytes first unloads
+    the least recently used ones (0 disables either policy).
+
+    With source(name) → artifact path and reload_interval > 0, the sweeper
+    also polls each loaded model's file and hot-swaps it when it changes (as
+    retrain.py publishes them): the new copy is loaded beside the serving
+    one, which keeps answering meanwhile, then replaces it in one step and
+    on_swap(name) runs. The old copy is closed after a grace period, once
+    requests that picked it up before the swap are done with it.
+    """
+
+    def __init__(self, loader, names, idle_ttl=0.0, memory_budget=0,
+                 source=None, reload_interval=0.0, on_swap=None):
+        self.loader = loader
+        self.names = list(names)
+        self.idle_ttl = float(idle_ttl)
+        self.memory_budget = int(memory_budget)
+        self.source = source
+        self.reload_interval = float(reload_interval) if source is not None else 0.0
+        self.on_swap = on_swap
+        self._models = OrderedDict()  # name → LoadedModel, LRU order
+        self._lock = threading.RLock()
+        self._load_locks = {name: threading.Lock() for name in self.names}
+        self._retired = []            # (LoadedModel, monotonic time it was swapped out)
+        self._generations = itertools.count(1)
+        self._sweeper = None
+        self._pid = None
+        self.evictions = 0
+        self.swaps = 0
+
+    def get(self, name):
+        if name not in self._load_locks:
+            raise KeyError(name)
+        self._ensure_sweeper()
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                self._models.move_to_end(name)
+        if entry is None:
+            # one loader per model; other models stay servable meanwhile
+            with self._load_locks[name]:
+                entry = self._models.get(name) or self._load(name)
+        entry.last_used = time.monotonic()
+        entry.requests += 1
+        return entry
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models.values())
+
+    def unload(self, name):
+        with self._lock:
+            entry = self._models.pop(name, None)
+        if entry is None:
+            return False
+        entry.close()
+        self.evictions += 1
+        print(f"[INFO] Unloaded model '{name}'")
+        gc.collect()
+        return True
+
+    def describe(self):
+        loaded = self.loaded()
+        return {
+            'available':     self.names,
+            'loaded':        [m.describe() for m in loaded],
+            'footprint':     sum(m.footprint for m in loaded),
+            'memory_budget': self.memory_budget,
+            'idle_ttl':      self.idle_ttl,
+            'evictions':     self.evictions,
+            'reload_interval': self.reload_interval,
+            'swaps':         self.swaps,
+        }
+
+    def reload(self, name):
+        """Load name's artifact again and swap it in for the serving copy; False if not loaded."""
+        with self._load_locks[name]:
+            with self._lock:
+                old = self._models.get(name)
+            if old is None:
+                return False
+            try:
+                entry = self._build(name)
+            except Exception as e:
+                # e.g. a file from an incompatible training run: keep serving,
+                # and don't retry until the file changes again
+                old.source_mtime = self._mtime(name)
+                print(f"[WARN] Reloading model '{name}' failed, keeping the serving copy: {e}")
+                return False
+            with self._lock:
+                if self._models.get(name) is not old:  # unloaded meanwhile
+                    self._retired.append((entry, time.monotonic()))
+                    return False
+                self._models[name] = entry
+                self._retired.append((old, time.monotonic()))
+                self.swaps += 1
+        print(f"[INFO] Hot-swapped model '{name}' in {entry.load_seconds:.2f}s")
+        if self.on_swap is not None:
+            self.on_swap(name)
+        return True
+
+    # ─── Internals ─────────────────────────────────────────────────────────────
+    def _mtime(self, name):
+        try:
+            return os.stat(self.source(name)).st_mtime_ns
+        except (OSError, TypeError):
+            return None
+
+    def _build(self, name):
+        # mtime first: a file replaced during the load is picked up next poll
+        mtime = self._mtime(name) if self.source is not None else None
+        rss_before = _rss()
+        started = time.perf_counter()
+        entry = self.loader(name)
+        entry.load_seconds = time.perf_counter() - started
+        entry.rss_delta_bytes = max(0, _rss() - rss_before)
+        entry.source_mtime = mtime
+        entry.generation = next(self._generations)
+        return entry
+
+    def _load(self, name):
+        entry = self._build(name)
+        print(f"[INFO] Loaded model '{name}' in {entry.load_seconds:.2f}s "
+              f"({entry.footprint / 2**20:.1f} MB)")
+
+        with self._lock:
+            self._models[name] = entry
+            if self.memory_budget:
+                while (sum(m.footprint for m in self._models.values()) > self.memory_budget
+                       and len(self._models) > 1):
+                    victim = next(iter(self._models))
+                    self._lock.release()
+                    try:
+                        self.unload(victim)
+                    finally:
+                        self._lock.acquire()
+        return entry
+
+    def _ensure_sweeper(self):
+        if not (self.idle_ttl or self.reload_interval) or (self._sweeper is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._sweeper is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._sweeper = threading.Thread(
+                    target=self._sweep_loop, name='model-sweeper', daemon=True
+                )
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        periods = [p for p in (self.idle_ttl / 4, self.reload_interval) if p]
+        period = max(1.0, min(periods + [60.0]))
+        while True:
+            time.sleep(period)
+            now = time.monotonic()
+            if self.idle_ttl:
+                for entry in self.loaded():
+                    if entry.last_used < now - self.idle_ttl:
+                        self.unload(entry.name)
+            if self.reload_interval:
+                for entry in self.loaded():
+                    mtime = self._mtime(entry.name)
+                    if mtime is not None and mtime != entry.source_mtime:
+                        self.reload(entry.name)
+                self._close_retired(grace=max(30.0, 2 * period))
+
+    def _close_retired(self, grace):
+        with self._lock:
+            cutoff = time.monotonic() - grace
+            done = [e for e, at in self._retired if at < cutoff]
+            self._retired = [(e, at) for e, at in self._retired if at >= cutoff]
+        for entry in done:
+            entry.close()
+        if done:
+            gc.collect()
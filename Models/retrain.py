@@ -0,0 +1,322 @@
+"""
+Online fine-tuning of a serving model from the collector's growing log.
+
+Runs next to the prediction server as its own (niced, single-threaded)
+process. Every --interval seconds it reads the lines appended to the log
+since the last round and encodes them with the serving label_encoder/scaler.
+Once --min-new-events known events have arrived it fine-tunes the current
+model:
+
+  * training windows come from a rolling buffer of the last --buffer-events
+    events (history replayed with the new data, so old habits aren't
+    forgotten at once); the newest --holdout of the new windows is held out;
+  * the model serving right now is scored on the holdout, fine-tuned for
+    --epochs at a low learning rate, and scored again;
+  * only a candidate whose holdout loss beats the serving model's by
+    --min-improvement is published. The .h5 and every .npz precision the
+    server may use are written next to it and moved into place with
+    os.replace (the previous files are kept as *.prev.*), so the server, which
+    polls the files' mtimes (MODEL_RELOAD_INTERVAL_S), never reads half a file.
+
+Fine-tuning can't add classes. Event types the label encoder doesn't know are
+dropped, as the server drops them, and when they exceed --max-unknown of a
+round's events the round is skipped: the vocabulary has grown and the model
+needs a full `python train.py --refit-artifacts` instead. Bookkeeping rows
+(features.EXCLUDED_TYPES: the collector's resourceUsage/tabMemory samples, the
+discard/reload rows the extensions log themselves, ...) are not user events;
+they are dropped as in training and don't count toward that ratio.
+
+    python retrain.py --model tlstm --log ../Data_Collecting_Extension/user_data.csv
+    python retrain.py --model vanilla --log user_data.csv --once   # single round (cron)
+
+Only CSV logs are tailed (LOG_FORMAT=csv, the collector's default).
+"""
+import io
+import os
+import csv
+import sys
+import json
+import time
+import shutil
+import calendar
+import argparse
+from collections import Counter
+
+import numpy as np
+
+from features import EXCLUDED_TYPES, FeaturePipeline, windows
+from numpy_lstm import PRECISIONS, SAVED_MODELS_DIR, quantize
+
+# same names/files as server.py
+MODEL_FILES = {
+    'vanilla': 'saved_vanilla_lstm_new',
+    'tlstm':   'saved_tlstm',
+    'attn':    'saved_attn_lstm',
+}
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ─── Log tailing ───────────────────────────────────────────────────────────────
+class LogTail:
+    """
+    (timestamps, types) chunks from the bytes appended to a CSV log since the
+    last read. Only whole lines are consumed; a log that shrank (rotated or
+    truncated) is read again from the start.
+    """
+
+    def __init__(self, path, offset=0, block_bytes=8 * 2**20, encoding='cp1252'):
+        self.path = path
+        self.offset = int(offset)
+        self.block_bytes = int(block_bytes)
+        self.encoding = encoding
+
+    def read(self, limit=None):
+        """Yield chunks up to the current end of the file (or byte offset limit)."""
+        end = os.path.getsize(self.path)
+        if end < self.offset:
+            print(f"[INFO] {self.path} shrank, reading it from the start")
+            self.offset = 0
+        if limit is not None:
+            end = min(end, limit)
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            while self.offset < end:
+                data = f.read(min(self.block_bytes, end - self.offset))
+                cut = data.rfind(b'\n') + 1
+                if not cut:
+                    if len(data) < self.block_bytes:
+                        return  # a line still being written
+                    cut = len(data)  # one line longer than a block: skip it
+                f.seek(self.offset + cut)
+                self.offset += cut
+                chunk = self._parse(data[:cut])
+                if chunk is not None:
+                    yield chunk
+
+    def _parse(self, data):
+        seconds, types = [], []
+        for row in csv.reader(io.StringIO(data.decode(self.encoding, errors='replace'))):
+            if len(row) < 2:
+                continue
+            try:
+                # naive wall time read as UTC, like features.iter_csv_events
+                ts = calendar.timegm(time.strptime(row[0], '%Y-%m-%d %H:%M:%S'))
+            except ValueError:
+                continue  # header or a damaged row
+            seconds.append(float(ts))
+            types.append(row[1])
+        if not seconds:
+            return None
+        seconds = np.array(seconds)
+        order = np.argsort(seconds, kind='stable')
+        return seconds[order], np.array(types, dtype=object)[order]
+
+
+class EventBuffer:
+    """Encoded events of the last max_events, with deltas carried across reads."""
+
+    def __init__(self, pipeline, max_events):
+        self.pipeline = pipeline
+        self.max_events = int(max_events)
+        self.codes = np.empty(0, 'int32')
+        self.deltas = np.empty(0, 'float32')
+        self.last_ts = None
+        self.new_events = 0         # known events since the last fine-tuning round
+        self.unknown = Counter()    # unknown event types since then
+
+    def add(self, chunk, new=True):
+        seconds, types = chunk
+        codes = self.pipeline.encode_types(types.tolist())
+        known = codes >= 0
+        if new:
+            excluded = np.isin(types, EXCLUDED_TYPES)
+            self.unknown.update(types[~known & ~excluded].tolist())
+            self.new_events += int(known.sum())
+        seconds, codes = seconds[known], codes[known]
+        if not len(codes):
+            return
+        prev = np.empty_like(seconds)
+        prev[0] = seconds[0] if self.last_ts is None else self.last_ts
+        prev[1:] = seconds[:-1]
+        scaled = self.pipeline.scale_deltas(np.maximum(seconds - prev, 0.0)).astype('float32')
+        self.last_ts = seconds[-1]
+        self.codes = np.concatenate([self.codes, codes])[-self.max_events:]
+        self.deltas = np.concatenate([self.deltas, scaled])[-self.max_events:]
+
+    def unknown_fraction(self):
+        unknown = sum(self.unknown.values())
+        return unknown / (unknown + self.new_events) if unknown else 0.0
+
+    def mark_trained(self):
+        self.new_events = 0
+        self.unknown.clear()
+
+
+# ─── Fine-tuning ───────────────────────────────────────────────────────────────
+def load_serving_model(h5_path, learning_rate):
+    import keras
+    keras.config.enable_unsafe_deserialization()
+    from tensorflow.keras.models import load_model
+    from tensorflow.keras.optimizers import Adam
+    from keras_layers import SumOverTime
+    model = load_model(h5_path, custom_objects={'SumOverTime': SumOverTime}, compile=False)
+    model.compile(optimizer=Adam(learning_rate), loss='sparse_categorical_crossentropy',
+                  metrics=['accuracy'])
+    return model
+
+def fine_tune(h5_path, buffer, args):
+    """One round: returns (report, candidate model or None if it isn't better)."""
+    model = load_serving_model(h5_path, args.learning_rate)
+    seq_len = int(model.inputs[0].shape[1])
+    use_deltas = len(model.inputs) > 1
+    X_events, X_deltas, y = windows(buffer.codes, buffer.deltas, seq_len)
+    n_new = min(buffer.new_events, len(y))
+    n_holdout = int(n_new * args.holdout)
+    report = {'windows': int(len(y)), 'new_windows': n_new, 'holdout': n_holdout}
+    if n_holdout < args.min_holdout or len(y) - n_holdout < args.min_holdout:
+        return dict(report, published=False, reason='not enough windows'), None
+
+    inputs = lambda rows: [X_events[rows], X_deltas[rows]] if use_deltas else X_events[rows]
+    train, holdout = slice(0, len(y) - n_holdout), slice(len(y) - n_holdout, None)
+    before = model.evaluate(inputs(holdout), y[holdout], batch_size=256, verbose=0)
+    started = time.perf_counter()
+    model.fit(inputs(train), y[train], batch_size=args.batch_size, epochs=args.epochs,
+              shuffle=True, verbose=0)
+    after = model.evaluate(inputs(holdout), y[holdout], batch_size=256, verbose=0)
+    report.update(train_seconds=round(time.perf_counter() - started, 2),
+                  holdout_loss_before=round(float(before[0]), 5),
+                  holdout_loss_after=round(float(after[0]), 5),
+                  holdout_accuracy_before=round(float(before[1]), 5),
+                  holdout_accuracy_after=round(float(after[1]), 5))
+    if after[0] > before[0] - args.min_improvement:
+        return dict(report, published=False, reason='no holdout improvement'), None
+    return dict(report, published=True), model
+
+def publish(model, kind, model_dir, precisions, keep_previous=True):
+    """Write the new .h5 and .npz files beside the live ones, then os.replace each into place."""
+    from export_weights import export
+    base = os.path.join(model_dir, MODEL_FILES[kind])
+    staged_h5 = os.path.join(model_dir, f'.{MODEL_FILES[kind]}.retrain.h5')
+    model.save(staged_h5)
+    payload = export(staged_h5)
+    staged = []
+    for precision in precisions:
+        target = base + PRECISIONS[precision] + '.npz'
+        tmp = os.path.join(model_dir, f'.{MODEL_FILES[kind]}{PRECISIONS[precision]}.retrain.npz')
+        np.savez(tmp, **quantize(payload, precision))
+        staged.append((tmp, target))
+    staged.append((staged_h5, base + '.h5'))
+    for tmp, target in staged:
+        if keep_previous and os.path.exists(target):
+            root, ext = os.path.splitext(target)
+            shutil.copy2(target, root + '.prev' + ext)
+        os.replace(tmp, target)
+    return [target for _, target in staged]
+
+
+# ─── Main loop ─────────────────────────────────────────────────────────────────
+def load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_state(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', required=True, choices=list(MODEL_FILES))
+    parser.add_argument('--log', default='user_data.csv', help="the collector's CSV log")
+    parser.add_argument('--model-dir', default=os.getenv('MODEL_DIR', SAVED_MODELS_DIR),
+                        help="where the server loads models from (its MODEL_DIR)")
+    parser.add_argument('--artifacts-dir', default=BASE_DIR,
+                        help='where label_encoder.pkl/scaler.pkl are read from')
+    parser.add_argument('--interval', type=float, default=300.0, help='seconds between log reads')
+    parser.add_argument('--once', action='store_true', help='read the log, run one round, exit')
+    parser.add_argument('--min-new-events', type=int, default=500)
+    parser.add_argument('--buffer-events', type=int, default=20000,
+                        help='recent events windows are drawn from')
+    parser.add_argument('--holdout', type=float, default=0.2,
+                        help='fraction of the new windows held out for validation')
+    parser.add_argument('--min-holdout', type=int, default=50)
+    parser.add_argument('--epochs', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--learning-rate', type=float, default=1e-4)
+    parser.add_argument('--min-improvement', type=float, default=0.0,
+                        help='holdout loss the candidate must gain to be published')
+    parser.add_argument('--max-unknown', type=float, default=0.05,
+                        help='skip rounds where more events than this are of unknown types')
+    parser.add_argument('--precision', nargs='+', choices=list(PRECISIONS),
+                        help='.npz exports to refresh (default: the ones already present)')
+    parser.add_argument('--keep-previous', action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument('--threads', type=int, default=1, help="TensorFlow threads")
+    parser.add_argument('--nice', type=int, default=10, help='lower priority than the server')
+    args = parser.parse_args(argv)
+
+    if args.nice and hasattr(os, 'nice'):
+        os.nice(args.nice)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    kind = args.model
+    h5_path = os.path.join(args.model_dir, MODEL_FILES[kind] + '.h5')
+    precisions = args.precision or [
+        p for p, suffix in PRECISIONS.items()
+        if os.path.exists(os.path.join(args.model_dir, MODEL_FILES[kind] + suffix + '.npz'))
+    ]
+    state_path = os.path.join(args.model_dir, f'retrain_state_{kind}.json')
+    state = load_state(state_path)
+    if state.get('log') != os.path.abspath(args.log):
+        state = {'log': os.path.abspath(args.log), 'rounds': []}
+
+    pipeline = FeaturePipeline.load(args.artifacts_dir)
+    buffer = EventBuffer(pipeline, args.buffer_events)
+    tail = LogTail(args.log)
+    # everything logged before this run (or before the last one stopped) only
+    # seeds the replay buffer; events after it count as new
+    resume = state.get('offset', os.path.getsize(args.log))
+    for chunk in tail.read(limit=resume):
+        buffer.add(chunk, new=False)
+    print(f"[INFO] {kind}: {len(buffer.codes)} buffered events, tailing {args.log} "
+          f"from byte {tail.offset}")
+
+    while True:
+        for chunk in tail.read():
+            buffer.add(chunk)
+        state['offset'] = tail.offset
+
+        if buffer.new_events >= args.min_new_events or (args.once and buffer.new_events):
+            report = {'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                      'new_events': buffer.new_events}
+            unknown = buffer.unknown_fraction()
+            if unknown > args.max_unknown:
+                report.update(published=False, reason='unknown event types',
+                              unknown_fraction=round(unknown, 4),
+                              unknown_types=dict(buffer.unknown.most_common(10)))
+                print(f"[WARN] {unknown:.1%} of new events have types the label encoder "
+                      f"doesn't know ({', '.join(buffer.unknown)}); fine-tuning can't add "
+                      f"classes, run `python train.py --model {kind} --refit-artifacts`")
+            else:
+                result, candidate = fine_tune(h5_path, buffer, args)
+                report.update(result)
+                if candidate is not None:
+                    report['files'] = publish(candidate, kind, args.model_dir, precisions,
+                                              args.keep_previous)
+                print(f"[INFO] Round: {json.dumps(result)}")
+            if report.get('reason') != 'not enough windows':
+                buffer.mark_trained()  # else the new events keep counting toward the next round
+            state['rounds'] = (state.get('rounds', []) + [report])[-50:]
+        save_state(state_path, state)
+
+        if args.once:
+            return 0
+        time.sleep(args.interval)
+
+if __name__ == '__main__':
+    sys.exit(main())
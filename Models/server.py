@@ -1,47 +1,71 @@
 
 import os
+import sys
+import time
 from flask import Flask, request, jsonify
 import numpy as np
-import pickle
 import datetime
-import h5py, json
-import keras
-keras.config.enable_unsafe_deserialization()
-from tensorflow.keras.models import model_from_json, Model
-from tensorflow.keras import backend as K
-from tensorflow.keras.models import load_model
-from tensorflow.keras.utils import register_keras_serializable
-from tensorflow.keras.layers import Layer
-
-@register_keras_serializable()
-class SumOverTime(Layer):
-    def call(self, inputs):
-        return K.sum(inputs, axis=1)
+from batching import MicroBatcher
+from features import FeaturePipeline
+from numpy_lstm import PRECISIONS, SAVED_MODELS_DIR, IncrementalLSTM, NumpyModel, TabStateCache
+from prediction_cache import PredictionCache
+from tab_events import TabEventStore
+from registry import LoadedModel, ModelRegistry
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'shared'))
+from metrics import Metrics, log_enabled
 
 # ─── Configuration ─────────────────────────────────────────────────────────────
 MODEL_TYPE = os.getenv('MODEL_TYPE', 'vanilla')  
-# valid values: 'vanilla', 'tlstm', 'attn'
+# valid values: 'vanilla', 'tlstm', 'attn' — the default when a request has no
+# 'model' field; every model is loaded on first use and kept warm
+# 'keras' loads the .h5 through TensorFlow; 'numpy' runs the weights exported
+# by export_weights.py (.npz) and never imports TensorFlow
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'keras')
+# numpy backend only: 'float32', 'float16' or 'int8' artifacts (export_weights.py --precision)
+MODEL_PRECISION = os.getenv('MODEL_PRECISION', 'float32')
+MODEL_FILES = {
+    'vanilla': 'saved_vanilla_lstm_new',
+    'tlstm':   'saved_tlstm',
+    'attn':    'saved_attn_lstm',
+}
+# directory holding the .h5/.npz files above (export_weights.py and retrain.py write there)
+MODEL_DIR = os.getenv('MODEL_DIR', SAVED_MODELS_DIR)
+# micro-batching of concurrent /predict calls (PREDICT_MAX_BATCH=1 disables)
+PREDICT_MAX_BATCH   = int(os.getenv('PREDICT_MAX_BATCH', '64'))
+PREDICT_MAX_WAIT_MS = float(os.getenv('PREDICT_MAX_WAIT_MS', '5'))
+# per-tab LSTM state cache for /predict_incremental (vanilla & tlstm only)
+TAB_STATE_MAX   = int(os.getenv('TAB_STATE_MAX', '4096'))
+TAB_STATE_TTL_S = float(os.getenv('TAB_STATE_TTL_S', '1800'))
+# model registry: unload models idle this long / keep the sum under this budget (0 = off)
+MODEL_IDLE_TTL_S       = float(os.getenv('MODEL_IDLE_TTL_S', '0'))
+MODEL_MEMORY_BUDGET_MB = float(os.getenv('MODEL_MEMORY_BUDGET_MB', '0'))
+# seconds between checks of the loaded models' files; updated weights (retrain.py) are hot-swapped (0 = off)
+MODEL_RELOAD_INTERVAL_S = float(os.getenv('MODEL_RELOAD_INTERVAL_S', '30'))
+# run warm-up forward passes while loading, before a model serves its first request
+MODEL_PREWARM = os.getenv('MODEL_PREWARM', '1') == '1'
+# probabilities of recently seen windows (idle tabs resend the same history); 0 disables
+PREDICTION_CACHE_MAX   = int(os.getenv('PREDICTION_CACHE_MAX', '8192'))
+PREDICTION_CACHE_TTL_S = float(os.getenv('PREDICTION_CACHE_TTL_S', '600'))
+# server-side per-tab event ring buffers fed by /events (predict by tab id only)
+TAB_EVENTS_MAX   = int(os.getenv('TAB_EVENTS_MAX', '64'))
+TAB_EVENTS_TABS  = int(os.getenv('TAB_EVENTS_TABS', '4096'))
+TAB_EVENTS_TTL_S = float(os.getenv('TAB_EVENTS_TTL_S', '3600'))
+
+if INFERENCE_BACKEND == 'keras':
+    import keras
+    keras.config.enable_unsafe_deserialization()
+    from tensorflow.keras.models import load_model
+    from keras_layers import SumOverTime
+elif INFERENCE_BACKEND != 'numpy':
+    raise ValueError(INFERENCE_BACKEND)
+if MODEL_PRECISION not in PRECISIONS:
+    raise ValueError(MODEL_PRECISION)
 
 app = Flask(__name__)
+# /metrics: per-stage latency histograms, request counts, cache/store gauges
+metrics = Metrics('predictor').install(app)
 
 # ─── Helpers ───────────────────────────────────────────────────────────────────
-def load_fixed_model(h5_path):
-    """Load a legacy HDF5 model, stripping unsupported kwargs like time_major."""
-    with h5py.File(h5_path, 'r') as f:
-        raw = f.attrs.get('model_config')
-        if raw is None:
-            raise ValueError("No model_config found in HDF5.")
-        if isinstance(raw, (bytes, bytearray)):
-            raw = raw.decode('utf-8')
-    config = json.loads(raw)
-    # remove stale LSTM arguments
-    for layer in config['config']['layers']:
-        if layer.get('class_name') == 'LSTM':
-            layer['config'].pop('time_major', None)
-    model = model_from_json(json.dumps(config))
-    model.load_weights(h5_path)
-    return model
-
 def sample_with_temperature(preds, temperature=1.0):
     preds = np.asarray(preds).astype('float64')
     preds = np.log(preds + 1e-8) / temperature
@@ -50,82 +74,370 @@ def sample_with_temperature(preds, temperature=1.0):
     return np.random.choice(len(preds), p=preds)
 
 # ─── Load artifacts ────────────────────────────────────────────────────────────
-# load encoder & scaler as before…
-with open('label_encoder.pkl','rb') as f: label_encoder=pickle.load(f)
-with open('scaler.pkl','rb') as f: scaler=pickle.load(f)
-
-if MODEL_TYPE=='vanilla':
-    model = load_model('saved_vanilla_lstm_new.h5')
-elif MODEL_TYPE=='tlstm':
-    model = load_model('saved_tlstm.h5')
-elif MODEL_TYPE=='attn':
-    model = load_model('saved_attn_lstm.h5', custom_objects={'SumOverTime': SumOverTime})
-else:
+# label encoder & scaler, shared with training through features.py
+features = FeaturePipeline.load('.')
+label_encoder = features.label_encoder
+
+if MODEL_TYPE not in MODEL_FILES:
     raise ValueError(MODEL_TYPE)
 
-# seq_len = model.input_shape[0][1]
-seq_len = int(model.inputs[0].shape[1])
-print(f"[INFO] Using sequence length = {seq_len}")
+def model_path(name):
+    """The file load_entry() reads for this model with the configured backend."""
+    if INFERENCE_BACKEND == 'numpy':
+        return os.path.join(MODEL_DIR, MODEL_FILES[name] + PRECISIONS[MODEL_PRECISION] + '.npz')
+    return os.path.join(MODEL_DIR, MODEL_FILES[name] + '.h5')
+
+def load_entry(name):
+    """Load one model with the configured backend and wire up its batcher/state cache."""
+    if INFERENCE_BACKEND == 'numpy':
+        model = NumpyModel.load(model_path(name))
+        seq_len, use_deltas, weights_bytes = model.seq_len, model.use_deltas, model.nbytes
+    else:
+        model = load_model(model_path(name),
+                           custom_objects={'SumOverTime': SumOverTime})
+        # seq_len = model.input_shape[0][1]
+        seq_len = int(model.inputs[0].shape[1])
+        use_deltas = len(model.inputs) > 1
+        weights_bytes = sum(w.nbytes for w in model.get_weights())
+    print(f"[INFO] {name}: {INFERENCE_BACKEND} backend, sequence length = {seq_len}")
+
+    entry = LoadedModel(name, model, seq_len, use_deltas, weights_bytes)
+    entry.batcher = MicroBatcher(
+        lambda ev_in, dt_in: run_model(entry, ev_in, dt_in),
+        PREDICT_MAX_BATCH, PREDICT_MAX_WAIT_MS
+    )
+    if name in ('vanilla', 'tlstm'):
+        entry.tab_states = TabStateCache(TAB_STATE_MAX, TAB_STATE_TTL_S)
+        entry.incremental = IncrementalLSTM.from_model(model, seq_len, entry.tab_states)
+    if INFERENCE_BACKEND == 'numpy':
+        # IncrementalLSTM keeps its own float32 copy; predict() needs none
+        model.release_float_weights()
+        entry.weights_bytes = model.nbytes
+    if MODEL_PREWARM:
+        warm_up(entry)
+    return entry
+
+def warm_up(entry):
+    """
+    Forward passes at batch 1 and 2 on dummy windows. Keras traces predict()
+    for each new input shape until it generalises the batch dimension, which
+    would otherwise land on the first real requests (and on every hot swap).
+    """
+    ev_in = np.zeros((2, entry.seq_len), dtype='int32')
+    dt_in = np.zeros((2, entry.seq_len), dtype='float32')
+    started = time.perf_counter()
+    run_model(entry, ev_in[:1], dt_in[:1])
+    run_model(entry, ev_in, dt_in)
+    print(f"[INFO] {entry.name}: warm-up passes took {time.perf_counter() - started:.2f}s")
+
+prediction_cache = PredictionCache(PREDICTION_CACHE_MAX, PREDICTION_CACHE_TTL_S)
+# cache keys carry the model generation, so a swapped-in model never sees the old
+# one's probabilities; on_swap only frees them (it starts with no incremental tab states)
+registry = ModelRegistry(load_entry, MODEL_FILES, MODEL_IDLE_TTL_S,
+                         int(MODEL_MEMORY_BUDGET_MB * 2**20), source=model_path,
+                         reload_interval=MODEL_RELOAD_INTERVAL_S,
+                         on_swap=lambda name: prediction_cache.clear())
+tab_events = TabEventStore(TAB_EVENTS_MAX, TAB_EVENTS_TABS, TAB_EVENTS_TTL_S)
+
+metrics.gauge('prediction_cache_entries', 'Probability vectors in the prediction cache.',
+              lambda: len(prediction_cache))
+metrics.gauge('prediction_cache_hits_total', 'Prediction cache hits.',
+              lambda: prediction_cache.hits, kind='counter')
+metrics.gauge('prediction_cache_misses_total', 'Prediction cache misses.',
+              lambda: prediction_cache.misses, kind='counter')
+metrics.gauge('stored_tabs', 'Tabs with a server-side event history.', lambda: len(tab_events))
+metrics.gauge('loaded_models', 'Models currently held by the registry.',
+              lambda: len(registry.loaded()))
+metrics.gauge('model_swaps_total', 'Models hot-swapped after their file changed.',
+              lambda: registry.swaps, kind='counter')
+
+def model_inputs(entry, ev_in, dt_in):
+    """Arrange encoded arrays for the given model (event-only or event+delta)."""
+    if not entry.use_deltas:
+        return ev_in
+    return [ev_in, dt_in.reshape(len(dt_in), entry.seq_len, 1)]
+
+def run_model(entry, ev_in, dt_in):
+    with metrics.stage('forward'):
+        return entry.model.predict(model_inputs(entry, ev_in, dt_in), verbose=0)
+
+def predict_rows(entry, ev_in, dt_in, use_batcher=False):
+    """
+    Probabilities for every encoded row. Windows seen recently come from the
+    prediction cache; only the rest reach the model (through the micro-batcher
+    when use_batcher, otherwise as one batch).
+    """
+    if not prediction_cache.enabled:
+        if use_batcher:
+            return np.stack([entry.batcher.submit(e, d) for e, d in zip(ev_in, dt_in)])
+        return run_model(entry, ev_in, dt_in)
+
+    keys = [PredictionCache.key(entry.name, entry.generation, ev_in[i], dt_in[i])
+            for i in range(len(ev_in))]
+    probs = [prediction_cache.get(k) for k in keys]
+    # tabs with identical windows in one request share a single forward pass
+    missing = {}
+    for i, p in enumerate(probs):
+        if p is None:
+            missing.setdefault(keys[i], i)
+    if missing:
+        rows = list(missing.values())
+        if use_batcher:
+            computed = [entry.batcher.submit(ev_in[i], dt_in[i]) for i in rows]
+        else:
+            computed = run_model(entry, ev_in[rows], dt_in[rows])
+        fresh = {keys[i]: np.array(p) for i, p in zip(rows, computed)}
+        for key, p in fresh.items():
+            prediction_cache.put(key, p)
+        probs = [fresh[keys[i]] if p is None else p for i, p in enumerate(probs)]
+    return np.stack(probs)
+
+def resolve_model(data):
+    """The registry entry a request asked for via its 'model' field (None if unknown)."""
+    name = data.get('model') or MODEL_TYPE
+    return registry.get(name) if name in MODEL_FILES else None
+
+def stored_tabs(tab_ids):
+    """/predict_batch-style tab entries from the /events store, plus the ids it doesn't know."""
+    tabs, unknown = [], []
+    for tab_id in tab_ids:
+        history = tab_events.history(tab_id)
+        if history is None:
+            unknown.append(tab_id)
+            history = [], [], []
+        tabs.append({'tab_id': tab_id, 'event_sequence': history[0],
+                     'time_sequence': history[1], 'timestamp_sequence': history[2]})
+    return tabs, unknown
+
+def build_results(tab_ids, probs, ok, temp):
+    """Per-tab prediction entries; tabs where ok[i] is False get an error instead."""
+    results = []
+    for i, tab_id in enumerate(tab_ids):
+        if not ok[i]:
+            results.append({'tab_id': tab_id, 'error': 'No valid events'})
+            continue
+        idx = sample_with_temperature(probs[i], temp)
+        results.append({
+            'tab_id':          tab_id,
+            'predicted_event': label_encoder.classes_[idx],
+            'probabilities':   probs[i].astype('float64').round(6).tolist()
+        })
+    return results
 
 # ─── Prediction endpoint ──────────────────────────────────────────────────────
 @app.route('/predict', methods=['POST'])
 def predict():
-    data = request.get_json()
-    raw_events = data.get('event_sequence', [])
-    raw_times  = data.get('time_sequence', [])
-    raw_timestamps = data.get('timestamp_sequence', [])
-    temp       = float(data.get('temperature', 1.0))
-
+    with metrics.stage('parse'):
+        data = request.get_json()
+        if 'event_sequence' not in data and 'tab_id' in data:
+            # history already synced through /events
+            data = dict(data, **stored_tabs([data['tab_id']])[0][0])
+        raw_events = data.get('event_sequence', [])
+        raw_times  = data.get('time_sequence', [])
+        raw_timestamps = data.get('timestamp_sequence', [])
+        temp       = float(data.get('temperature', 1.0))
 
-     # ——— LOG THE LAST 15 EVENTS WITH APPROXIMATE TIMESTAMPS —————
-    # Take only the last 15 entries
+    # ——— LOG THE LAST 15 EVENTS WITH THEIR TIMESTAMPS —————
     hist_events = raw_events[-15:]
     hist_timestamps = raw_timestamps[-15:]
+    # debug output: one print per event, on every request (LOG_LEVEL=info turns it off)
+    if log_enabled('debug'):
+        print("=== Feeding model with last {} events: ===".format(len(hist_events)))
+        for ev, ts_ms in zip(hist_events, hist_timestamps):
+            ts = datetime.datetime.fromtimestamp(ts_ms / 1000.0)
+            print(f"{ts.strftime('%Y-%m-%d %H:%M:%S')}  –  {ev}")
+        print("=========================================")
+
+
+    entry = resolve_model(data)
+    if entry is None:
+        return jsonify({'error': f"Unknown model {data.get('model')}"}), 400
 
-    # Reconstruct approximate timestamps going backward from now
-    # now = datetime.datetime.now()
-    # timestamps = []
-    # t = now
-    # # We assume hist_times[i] = seconds between event i-1 and i
-    # for dt in reversed(hist_times):
-    #     timestamps.insert(0, t)
-    #     t -= datetime.timedelta(seconds=dt)
-
-    print("=== Feeding model with last {} events: ===".format(len(hist_events)))
-    for ev, ts_ms in zip(hist_events, hist_timestamps):
-        ts = datetime.datetime.fromtimestamp(ts_ms / 1000.0)
-        print(f"{ts.strftime('%Y-%m-%d %H:%M:%S')}  –  {ev}")
-    print("=========================================")
-
-
-    # Keep only events our encoder knows
-    valid_events = [e for e in raw_events if e in label_encoder.classes_]
-    valid_times  = [
-        t for i,t in enumerate(raw_times) 
-        if i < len(raw_events) and raw_events[i] in label_encoder.classes_
-    ]
-    if not valid_events:
+    # Encode & scale, keeping only events our encoder knows (filter, encode and pad in one pass)
+    with metrics.stage('encode'):
+        ev_in, dt_in, lengths = features.encode_batch([(raw_events, raw_times)], entry.seq_len)
+    if not lengths[0]:
         return jsonify({'error':'No valid events'}), 400
 
-    # Encode & scale
-    encoded     = label_encoder.transform(valid_events)
-    times_scaled= scaler.transform(np.array(valid_times).reshape(-1,1)).flatten()
+    # Model prediction (cached, else coalesced with concurrent requests by the batcher)
+    with metrics.stage('predict'):
+        probs = predict_rows(entry, ev_in, dt_in, use_batcher=PREDICT_MAX_BATCH > 1)[0]
+    with metrics.stage('sample'):
+        idx   = sample_with_temperature(probs, temp)
+        pred  = label_encoder.inverse_transform([idx])[0]
 
-    # Pad/truncate helper
-    def pad_trunc(arr, length, pad=0):
-        if len(arr) >= length:
-            return np.array(arr[-length:])
-        return np.array([pad]*(length-len(arr)) + list(arr))
+    return jsonify({'predicted_event': pred})
 
-    ev_in = pad_trunc(encoded, seq_len,     pad=0).reshape(1, seq_len)
-    dt_in = pad_trunc(times_scaled, seq_len, pad=0.0).reshape(1, seq_len)
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    """
+    Predict the next event for many tabs with a single forward pass.
 
-    # Model prediction
-    probs = model.predict([ev_in, dt_in], verbose=0)[0]
-    idx   = sample_with_temperature(probs, temp)
-    pred  = label_encoder.inverse_transform([idx])[0]
+    Body: {"tabs": [{"tab_id", "event_sequence", "time_sequence"}, ...],
+           "temperature", "model"}
+    or {"tab_ids": [...]} for tabs whose history was synced through /events;
+    ids the event store doesn't know are listed under 'resync'.
+    Tabs without any known event get an 'error' entry instead of a prediction.
+    """
+    with metrics.stage('parse'):
+        data = request.get_json()
+        unknown = None
+        if 'tab_ids' in data:
+            tabs, unknown = stored_tabs(data['tab_ids'])
+        else:
+            tabs = data.get('tabs', [])
+        temp = float(data.get('temperature', 1.0))
+    if not tabs:
+        return jsonify({'error': 'No tabs'}), 400
+    entry = resolve_model(data)
+    if entry is None:
+        return jsonify({'error': f"Unknown model {data.get('model')}"}), 400
 
-    return jsonify({'predicted_event': pred})
+    with metrics.stage('encode'):
+        ev_in, dt_in, lengths = features.encode_batch([
+            (t.get('event_sequence', []), t.get('time_sequence', [])) for t in tabs
+        ], entry.seq_len)
+    valid = np.flatnonzero(lengths)
+    probs = np.zeros((len(tabs), len(label_encoder.classes_)), dtype='float32')
+    if len(valid):
+        with metrics.stage('predict'):
+            probs[valid] = predict_rows(entry, ev_in[valid], dt_in[valid])
+
+    with metrics.stage('sample'):
+        results = build_results([t.get('tab_id') for t in tabs], probs, lengths > 0, temp)
+    response = {'classes': label_encoder.classes_.tolist(), 'predictions': results,
+                'model': entry.name}
+    if unknown is not None:
+        response['resync'] = unknown
+    return jsonify(response)
+
+@app.route('/events', methods=['POST'])
+def events():
+    """
+    Append-only history sync: each tab sends only events the server hasn't seen.
+
+    Body: {"tabs": [{"tab_id", "seq", "events": [{"type", "ts"}, ...], "reset"}, ...],
+           "closed_tab_ids": [...]}
+    seq numbers the tab's first event in this request (0, 1, 2, ... per tab).
+    Returns each tab's next expected seq; tabs listed in 'resync' must resend
+    their whole retained history with reset=true.
+    """
+    data = request.get_json()
+    for tab_id in data.get('closed_tab_ids', []):
+        tab_events.discard(tab_id)
+    tab_events.expire()
+
+    next_seq, resync = {}, []
+    for t in data.get('tabs', []):
+        try:
+            n = tab_events.append(t['tab_id'], int(t.get('seq', 0)),
+                                  t.get('events', []), bool(t.get('reset')))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return jsonify({'error': 'Invalid tab entry'}), 400
+        if n is None:
+            resync.append(t['tab_id'])
+        else:
+            next_seq[t['tab_id']] = n
+    return jsonify({'next_seq': next_seq, 'resync': resync, 'stored_tabs': len(tab_events)})
+
+@app.route('/predict_incremental', methods=['POST'])
+def predict_incremental():
+    """
+    Stateful prediction: each tab sends only the events since its last call.
+
+    Body: {"tabs": [{"tab_id", "event_sequence", "time_sequence", "resume"}, ...],
+           "closed_tab_ids": [...], "temperature", "model"}
+    time_sequence[0] is the gap to the tab's previous event, not 0. Closed tabs
+    drop their cached state; idle ones expire after TAB_STATE_TTL_S. Tabs sent
+    with "resume": true whose state is gone (expired, evicted, or the model was
+    swapped) get no prediction and are listed under 'resync': the client must
+    resend their whole history without "resume".
+    """
+    data = request.get_json()
+    entry = resolve_model(data)
+    if entry is None:
+        return jsonify({'error': f"Unknown model {data.get('model')}"}), 400
+    if entry.incremental is None:
+        return jsonify({'error': f'Incremental mode not supported for {entry.name}'}), 400
+    tab_states = entry.tab_states
+
+    tabs = data.get('tabs', [])
+    temp = float(data.get('temperature', 1.0))
+    for tab_id in data.get('closed_tab_ids', []):
+        tab_states.discard(tab_id)
+    tab_states.expire()
+
+    histories = [(t.get('event_sequence', []), t.get('time_sequence', [])) for t in tabs]
+    with metrics.stage('encode'):
+        ev_in, dt_in, lengths = features.encode_batch(
+            histories, width=max([len(ev) for ev, _ in histories] + [1]), align='left'
+        )
+    tab_ids = [t.get('tab_id') for t in tabs]
+    known = np.array([bool(lengths[i]) or tab_states.get(tid) is not None
+                      for i, tid in enumerate(tab_ids)], dtype=bool)
+    resume = [bool(t.get('resume')) for t in tabs]
+    rows = np.flatnonzero(known | np.array(resume, dtype=bool))
+    probs = np.zeros((len(tabs), len(label_encoder.classes_)), dtype='float32')
+    lost = []
+    if len(rows):
+        with metrics.stage('predict'):
+            probs[rows], lost = entry.incremental.advance(
+                [tab_ids[i] for i in rows], ev_in[rows], dt_in[rows], lengths[rows],
+                resume=[resume[i] for i in rows]
+            )
+        lost = rows[lost].tolist()
+        known[lost] = False
+
+    with metrics.stage('sample'):
+        results = build_results(tab_ids, probs, known, temp)
+    for i in lost:
+        results[i]['error'] = 'Tab state lost, resend the full history'
+    response = {'classes': label_encoder.classes_.tolist(), 'predictions': results,
+                'model': entry.name, 'cached_tabs': len(tab_states)}
+    if lost:
+        response['resync'] = [tab_ids[i] for i in lost]
+    return jsonify(response)
+
+@app.route('/batch_stats', methods=['GET'])
+def batch_stats():
+    """Per-batch occupancy and queue latency of each loaded model's micro-batcher."""
+    return jsonify({m.name: m.batcher.stats() for m in registry.loaded()})
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    """Prediction cache hits/misses/evictions: how many forward passes were skipped."""
+    return jsonify(prediction_cache.stats())
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Readiness: 200 once the default model is loaded (and warm), 503 before."""
+    loaded = [m.name for m in registry.loaded()]
+    ready = MODEL_TYPE in loaded
+    return jsonify({'status': 'ready' if ready else 'starting', 'default_model': MODEL_TYPE,
+                    'loaded': loaded, 'backend': INFERENCE_BACKEND}), 200 if ready else 503
+
+@app.route('/prewarm', methods=['POST'])
+def prewarm():
+    """
+    Load (and warm up) models ahead of traffic. Body: {"models": [...]},
+    default the MODEL_TYPE model; already loaded ones return at once.
+    """
+    names = (request.get_json(silent=True) or {}).get('models') or [MODEL_TYPE]
+    unknown = [n for n in names if n not in MODEL_FILES]
+    if unknown:
+        return jsonify({'error': f'Unknown models {unknown}'}), 400
+    started = time.perf_counter()
+    seconds = {}
+    for name in names:
+        entry = registry.get(name)
+        seconds[name] = round(entry.load_seconds, 3)
+    return jsonify({'load_seconds': seconds,
+                    'seconds': round(time.perf_counter() - started, 3)})
+
+@app.route('/models', methods=['GET'])
+def models():
+    """Loaded models with load time and footprint, plus the registry's policies."""
+    return jsonify(registry.describe())
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=1100)
@@ -0,0 +1,88 @@
+import time
+import threading
+from collections import OrderedDict, deque
+
+
+class _TabBuffer:
+    __slots__ = ('events', 'next_seq', 'last_ts', 'touched')
+
+    def __init__(self, max_events, next_seq=0):
+        self.events = deque(maxlen=max_events)  # (type, Δt seconds, timestamp ms)
+        self.next_seq = next_seq
+        self.last_ts = None
+        self.touched = time.monotonic()
+
+
+class TabEventStore:
+    """
+    Bounded per-tab ring buffers of recent events, fed by append-only deltas.
+
+    The extension numbers each tab's events 0, 1, 2, ... and sends only the
+    ones past the tab's next_seq. Resent events (seq < next_seq) are skipped,
+    so retries are harmless. A gap (seq > next_seq, or an unknown tab not
+    starting at 0, e.g. after a server restart) is refused and the tab is
+    reported for a full resend with reset=True. Δt is computed here from the
+    event timestamps, exactly as the extension computed time_sequence.
+    """
+
+    def __init__(self, max_events=64, max_tabs=4096, ttl=3600.0):
+        self.max_events = int(max_events)
+        self.max_tabs = int(max_tabs)
+        self.ttl = float(ttl)
+        self._tabs = OrderedDict()  # tab_id → _TabBuffer, LRU order
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._tabs)
+
+    def append(self, tab_id, seq, events, reset=False):
+        """Add events[i] as event number seq + i; returns the tab's next_seq, or None to resync."""
+        with self._lock:
+            buf = self._tabs.get(tab_id)
+            if reset or buf is None:
+                if not reset and seq != 0:
+                    return None
+                buf = self._tabs[tab_id] = _TabBuffer(self.max_events, seq)
+            if seq > buf.next_seq:
+                return None
+            for event in events[buf.next_seq - seq:]:
+                ts = event.get('ts', event.get('timestamp'))
+                ts = float(ts) if isinstance(ts, (int, float)) else None
+                delta = 0.0 if ts is None or buf.last_ts is None else (ts - buf.last_ts) / 1000.0
+                buf.events.append((event.get('type'), delta, ts))
+                if ts is not None:
+                    buf.last_ts = ts
+            buf.next_seq = max(buf.next_seq, seq + len(events))
+            buf.touched = time.monotonic()
+            self._tabs.move_to_end(tab_id)
+            while len(self._tabs) > self.max_tabs:
+                self._tabs.popitem(last=False)
+                self.evictions += 1
+            return buf.next_seq
+
+    def history(self, tab_id):
+        """(event types, Δt seconds, timestamps ms) for a tab; None if unknown or expired."""
+        with self._lock:
+            buf = self._tabs.get(tab_id)
+            if buf is None or time.monotonic() - buf.touched > self.ttl:
+                return None
+            # predicting on an idle tab keeps it alive as much as new events do
+            buf.touched = time.monotonic()
+            self._tabs.move_to_end(tab_id)
+            events = list(buf.events)
+        return [e[0] for e in events], [e[1] for e in events], [e[2] for e in events]
+
+    def discard(self, tab_id):
+        with self._lock:
+            return self._tabs.pop(tab_id, None) is not None
+
+    def expire(self):
+        """Drop tabs neither updated nor read for ttl seconds; returns how many were removed."""
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            stale = [k for k, v in self._tabs.items() if v.touched < cutoff]
+            for k in stale:
+                del self._tabs[k]
+            self.evictions += len(stale)
+        return len(stale)
@@ -0,0 +1,291 @@
+"""
+Train a next-event model with a parallel hyperparameter search.
+
+Replaces the notebooks' nested grid loop (every config trained one after
+another, then the best one retrained). Windows are built once in the parent
+with features.py and placed in shared memory, which every worker maps
+without copying. The grid is searched over a process pool with successive
+halving: all configs train for --min-epochs, the best 1/--eta go on to
+--eta times as many epochs, and so on up to --max-epochs. Within a rung,
+early stopping ends trials whose validation loss has stopped improving. The
+best config is then retrained on all windows for its best epoch count. The
+.h5 model, the .npz exports for the numpy backend and the fitted
+label_encoder.pkl / scaler.pkl are written together with a search report.
+
+    python train.py --model tlstm --csv user_data.csv --workers 4 --out-dir trained
+    python train.py --model attn --embed-dim 8 16 --lstm-units 16 32 --max-epochs 40
+
+Validation is the last --val-split of the windows, as Keras' validation_split
+took it in the notebooks.
+"""
+import os
+import sys
+import json
+import math
+import time
+import pickle
+import argparse
+import itertools
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from features import FeaturePipeline, iter_arrow_events, iter_csv_events, load_windows
+from numpy_lstm import PRECISIONS, quantize
+
+# same names/files as server.py; seq_len / inputs as the notebooks trained them
+MODEL_FILES = {
+    'vanilla': 'saved_vanilla_lstm_new',
+    'tlstm':   'saved_tlstm',
+    'attn':    'saved_attn_lstm',
+}
+LOOKBACK = {'vanilla': 10, 'tlstm': 15, 'attn': 15}
+USE_DELTAS = {'vanilla': False, 'tlstm': True, 'attn': True}
+
+# the notebooks' param_grid; epochs become the successive-halving budget
+GRID = {
+    'embed_dim':     [8, 16],
+    'lstm_units':    [16, 32],
+    'learning_rate': [1e-3, 5e-4],
+    'batch_size':    [32, 64],
+}
+
+
+# ─── Models (architectures and layer names as in the notebooks) ────────────────
+def build_model(kind, seq_len, vocab_size, embed_dim, lstm_units, learning_rate):
+    from tensorflow.keras.models import Model
+    from tensorflow.keras.layers import Concatenate, Dense, Embedding, Input, LSTM, Multiply, Softmax
+    from tensorflow.keras.optimizers import Adam
+    from keras_layers import SumOverTime
+
+    events_in = Input(shape=(seq_len,), name='events')
+    x = Embedding(vocab_size, embed_dim, name='embed')(events_in)
+    inputs = [events_in]
+    if USE_DELTAS[kind]:
+        deltas_in = Input(shape=(seq_len, 1), name='deltas')
+        x = Concatenate(name='concat')([x, deltas_in])
+        inputs.append(deltas_in)
+    if kind == 'attn':
+        x = LSTM(lstm_units, return_sequences=True, name='lstm')(x)
+        scores = Dense(1, activation='tanh', name='attn_score')(x)
+        weights = Softmax(axis=1, name='attn_weights')(scores)
+        x = SumOverTime(name='context_sum')(Multiply(name='attn_mul')([x, weights]))
+    else:
+        x = LSTM(lstm_units, name='lstm')(x)
+    out = Dense(vocab_size, activation='softmax', name='output')(x)
+
+    model = Model(inputs if len(inputs) > 1 else events_in, out)
+    model.compile(optimizer=Adam(learning_rate), loss='sparse_categorical_crossentropy',
+                  metrics=['accuracy'])
+    return model
+
+
+# ─── Shared-memory windows ─────────────────────────────────────────────────────
+def share(arrays):
+    """Copy arrays into new shared-memory blocks; returns (blocks, specs for attach())."""
+    blocks, specs = [], {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+_blocks = []
+_data = {}
+
+def attach(specs, threads):
+    """Worker initializer: map the parent's windows and size TensorFlow's thread pools."""
+    for name, (block_name, shape, dtype) in specs.items():
+        # spawned workers share the parent's resource tracker, which unlinks the block
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        _data[name] = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+# ─── Worker tasks ──────────────────────────────────────────────────────────────
+def _inputs(kind, rows):
+    ev = _data['X_events'][rows]
+    return [ev, _data['X_deltas'][rows]] if USE_DELTAS[kind] else ev
+
+def run_trial(kind, vocab_size, trial):
+    """
+    Train one config from trial['epochs'] to trial['budget'] epochs, resuming
+    from its checkpoint (weights and optimizer state) after the first rung.
+    """
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.models import load_model
+
+    started = time.perf_counter()
+    n_train = trial['n_train']
+    train, val = slice(0, n_train), slice(n_train, None)
+    if trial['epochs']:
+        model = load_model(trial['checkpoint'])
+    else:
+        p = trial['params']
+        model = build_model(kind, trial['seq_len'], vocab_size,
+                            p['embed_dim'], p['lstm_units'], p['learning_rate'])
+    stop = EarlyStopping(monitor='val_loss', patience=trial['patience'], restore_best_weights=True)
+    history = model.fit(_inputs(kind, train), _data['y'][train],
+                        validation_data=(_inputs(kind, val), _data['y'][val]),
+                        batch_size=trial['params']['batch_size'],
+                        initial_epoch=trial['epochs'], epochs=trial['budget'],
+                        callbacks=[stop], verbose=0)
+    model.save(trial['checkpoint'])
+
+    losses = history.history['val_loss']
+    best = int(np.argmin(losses))
+    result = dict(trial, seconds=trial['seconds'] + time.perf_counter() - started,
+                  epochs=trial['epochs'] + len(losses),
+                  stopped=stop.stopped_epoch > 0)
+    if losses[best] < trial['val_loss']:
+        result.update(val_loss=float(losses[best]),
+                      val_accuracy=float(history.history['val_accuracy'][best]),
+                      best_epoch=trial['epochs'] + best + 1)
+    return result
+
+def train_final(kind, vocab_size, seq_len, params, epochs, h5_path):
+    """Retrain the chosen config on every window and save it as HDF5."""
+    model = build_model(kind, seq_len, vocab_size, params['embed_dim'], params['lstm_units'],
+                        params['learning_rate'])
+    history = model.fit(_inputs(kind, slice(None)), _data['y'], batch_size=params['batch_size'],
+                        epochs=epochs, verbose=0)
+    model.save(h5_path)
+    return {'loss': float(history.history['loss'][-1]),
+            'accuracy': float(history.history['accuracy'][-1])}
+
+
+# ─── Search ────────────────────────────────────────────────────────────────────
+def rungs(min_epochs, max_epochs, eta):
+    """Epoch budgets of the successive-halving rungs: min, min*eta, ... capped at max."""
+    budgets = [min_epochs]
+    while budgets[-1] < max_epochs:
+        budgets.append(min(budgets[-1] * eta, max_epochs))
+    return budgets
+
+def search(pool, kind, vocab_size, seq_len, grid, args, n_train, checkpoint_dir):
+    names = list(grid)
+    trials = [{
+        'trial': i, 'params': dict(zip(names, values)), 'seq_len': seq_len,
+        'n_train': n_train, 'patience': args.patience,
+        'checkpoint': os.path.join(checkpoint_dir, f'trial_{i}.keras'),
+        'epochs': 0, 'budget': 0, 'seconds': 0.0, 'stopped': False,
+        'val_loss': math.inf, 'val_accuracy': None, 'best_epoch': 0,
+    } for i, values in enumerate(itertools.product(*grid.values()))]
+
+    alive = trials
+    budgets = rungs(args.min_epochs, args.max_epochs, args.eta)
+    for rung, budget in enumerate(budgets):
+        todo = [dict(t, budget=budget) for t in alive if not t['stopped'] and t['epochs'] < budget]
+        for result in pool.map(run_trial, [kind] * len(todo), [vocab_size] * len(todo), todo):
+            trials[result['trial']] = result
+        alive = sorted((trials[t['trial']] for t in alive), key=lambda t: t['val_loss'])
+        print(f"[INFO] Rung {rung}: {len(todo)} trials trained to {budget} epochs, "
+              f"best val_loss={alive[0]['val_loss']:.4f} ({alive[0]['params']})")
+        if rung < len(budgets) - 1:
+            alive = alive[:max(1, math.ceil(len(alive) / args.eta))]
+    return sorted(trials, key=lambda t: t['val_loss'])
+
+
+# ─── Artifacts ─────────────────────────────────────────────────────────────────
+def write_artifacts(out_dir, kind, pipeline, h5_path, precisions):
+    from export_weights import export
+    with open(os.path.join(out_dir, 'label_encoder.pkl'), 'wb') as f:
+        pickle.dump(pipeline.label_encoder, f)
+    with open(os.path.join(out_dir, 'scaler.pkl'), 'wb') as f:
+        pickle.dump(pipeline.scaler, f)
+    payload = export(h5_path)
+    paths = []
+    for precision in precisions:
+        path = os.path.join(out_dir, MODEL_FILES[kind] + PRECISIONS[precision] + '.npz')
+        np.savez(path, **quantize(payload, precision))
+        paths.append(path)
+    return paths
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parallel hyperparameter search and training')
+    parser.add_argument('--model', required=True, choices=list(MODEL_FILES))
+    parser.add_argument('--csv', default='user_data.csv', help='collector log (or Arrow dir)')
+    parser.add_argument('--out-dir', default='trained')
+    parser.add_argument('--lookback', type=int, help='window length (default: the notebook value)')
+    parser.add_argument('--val-split', type=float, default=0.2)
+    for name, values in GRID.items():
+        parser.add_argument('--' + name.replace('_', '-'), nargs='+', default=values,
+                            type=float if name == 'learning_rate' else int)
+    parser.add_argument('--min-epochs', type=int, default=5)
+    parser.add_argument('--max-epochs', type=int, default=20)
+    parser.add_argument('--eta', type=int, default=2, help='keep the best 1/eta trials per rung')
+    parser.add_argument('--patience', type=int, default=3, help='early-stopping patience (epochs)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--precision', nargs='+', default=['float32'], choices=list(PRECISIONS),
+                        help='.npz exports to write next to the .h5')
+    parser.add_argument('--refit-artifacts', action=argparse.BooleanOptionalAction, default=True,
+                        help='fit a fresh encoder/scaler on the log (else reuse the ones in this dir)')
+    args = parser.parse_args(argv)
+    if args.min_epochs > args.max_epochs or args.eta < 2:
+        parser.error('need --min-epochs <= --max-epochs and --eta >= 2')
+
+    started = time.perf_counter()
+    kind = args.model
+    seq_len = args.lookback or LOOKBACK[kind]
+    make_chunks = (lambda: iter_arrow_events(args.csv)) if os.path.isdir(args.csv) \
+        else (lambda: iter_csv_events(args.csv))
+    pipeline = FeaturePipeline.fit(make_chunks()) if args.refit_artifacts \
+        else FeaturePipeline.load(os.path.dirname(os.path.abspath(__file__)))
+    X_events, X_deltas, y = load_windows(args.csv, pipeline, seq_len)
+    n_train = int(len(y) * (1 - args.val_split))
+    if n_train == 0 or n_train == len(y):
+        print(f"[ERROR] {len(y)} windows are not enough to train and validate on")
+        return 1
+    vocab_size = len(pipeline.classes)
+    grid = {name: getattr(args, name) for name in GRID}
+    n_configs = math.prod(len(v) for v in grid.values())
+    print(f"[INFO] {len(y)} windows ({n_train} train), {vocab_size} classes, "
+          f"{n_configs} configs on {args.workers} workers")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    h5_path = os.path.join(args.out_dir, MODEL_FILES[kind] + '.h5')
+    blocks, specs = share({'X_events': X_events.astype('int32'),
+                           'X_deltas': X_deltas.astype('float32'), 'y': y.astype('int32')})
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    try:
+        # spawn: TensorFlow is only ever imported inside the workers
+        with tempfile.TemporaryDirectory() as checkpoints, ProcessPoolExecutor(
+                max_workers=args.workers, mp_context=get_context('spawn'),
+                initializer=attach, initargs=(specs, threads)) as pool:
+            trials = search(pool, kind, vocab_size, seq_len, grid, args, n_train, checkpoints)
+            best = trials[0]
+            print(f"[INFO] Best: {best['params']} val_loss={best['val_loss']:.4f} "
+                  f"val_acc={best['val_accuracy']:.4f} at epoch {best['best_epoch']}")
+            final = pool.submit(train_final, kind, vocab_size, seq_len, best['params'],
+                                best['best_epoch'], h5_path).result()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    npz_paths = write_artifacts(args.out_dir, kind, pipeline, h5_path, args.precision)
+    report = {
+        'model': kind, 'seq_len': seq_len, 'windows': int(len(y)), 'train_windows': n_train,
+        'classes': [str(c) for c in pipeline.classes], 'grid': grid,
+        'rungs': rungs(args.min_epochs, args.max_epochs, args.eta),
+        'best': {k: best[k] for k in ('params', 'val_loss', 'val_accuracy', 'best_epoch')},
+        'final': final,
+        'trials': [{k: t[k] for k in ('trial', 'params', 'epochs', 'best_epoch', 'val_loss',
+                                      'val_accuracy', 'stopped', 'seconds')} for t in trials],
+        'seconds': round(time.perf_counter() - started, 1),
+    }
+    with open(os.path.join(args.out_dir, 'search.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"[INFO] {h5_path}, {', '.join(npz_paths)} and the encoder/scaler written to "
+          f"{args.out_dir} in {report['seconds']:.0f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
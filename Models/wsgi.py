@@ -0,0 +1,37 @@
+"""
+Production entry point for the prediction server (pre-fork, multi-threaded).
+
+    cd Models
+    INFERENCE_BACKEND=numpy gunicorn -c gunicorn.conf.py wsgi:app
+
+Models listed in PRELOAD_MODELS are loaded (and warmed up, see MODEL_PREWARM)
+when this module is imported. With preload_app (the default for the numpy
+backend) that happens once in the gunicorn master, so every worker shares the
+weights copy-on-write and no request pays for a cold load. `kill -HUP <master>` replaces the workers
+gracefully: in-flight requests finish on the old ones.
+
+Gunicorn does not run on Windows; there `waitress-serve --port=1100 --threads=8 wsgi:app`
+serves the same app single-process.
+"""
+import gc
+import os
+
+from server import MODEL_FILES, MODEL_TYPE, app, registry
+
+# models to load before serving: comma-separated names, 'all', or '' for lazy loading
+PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', MODEL_TYPE)
+
+
+def preload(names=PRELOAD_MODELS):
+    names = list(MODEL_FILES) if names == 'all' else [n for n in names.split(',') if n]
+    for name in names:
+        registry.get(name)
+    # move everything loaded so far out of the GC's reach: collections in the
+    # workers would otherwise touch (and so un-share) the preloaded pages
+    gc.collect()
+    gc.freeze()
+    return names
+
+preload()
+
+__all__ = ['app']
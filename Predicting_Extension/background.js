@@ -14,7 +14,24 @@ const DISCARD_PREDICTIONS = new Set([
 
 const MAX_HISTORY = 20;
 const PREDICT_ALARM = 'mlPredictAlarm';
-// Map<tabId, Array<{ type, payload, ts }>>
+// 'auto' interval: minutes until the next check when the collector's
+// /pressure can't be reached (otherwise it says when to check again)
+const PRESSURE_FALLBACK_MINUTES = 1;
+// Stateful mode: send only events since the last cycle to /predict_incremental
+// (server keeps each tab's LSTM state; vanilla & tlstm models only)
+const INCREMENTAL_PREDICT = false;
+// Map<tabId, ts of the last event already sent in incremental mode>
+const lastSentTs = new Map();
+// Server-side history: push only new events to /events each cycle and
+// predict by tab id (/predict_batch {tab_ids}) instead of resending histories.
+// The histories live in one server process: gunicorn.conf.py runs a single
+// worker unless it is started with SERVER_HISTORY=0
+const SERVER_HISTORY = true;
+// Map<tabId, seq of the next event the server expects for that tab>
+const serverNextSeq = new Map();
+// tabs closed since the last cycle, so the server can drop their state
+const closedTabIds = new Set();
+// Map<tabId, Array<{ type, payload, ts, seq }>>
 const tabHistories = new Map();
 
 // On startup/reload: rehydrate from storage
@@ -22,7 +39,9 @@ const tabHistories = new Map();
   const data = await chrome.storage.local.get('tabHistories');
   if (data.tabHistories) {
     for (const [tabId, history] of Object.entries(data.tabHistories)) {
-      // keys in storage are strings
+      // keys in storage are strings; histories saved before seq numbers existed
+      // get them from their position (the server asks for a full resend anyway)
+      history.forEach((e, i) => { if (e.seq === undefined) e.seq = i; });
       tabHistories.set(Number(tabId), history);
     }
   }
@@ -49,7 +68,9 @@ function now() {
 function recordTabAction(tabId, type, payload = {}) {
   // In‐memory update
   let history = tabHistories.get(tabId) || [];
-  history.push({ type, payload, ts: Date.now() });
+  // per-tab event number, so /events can be sent just the unseen tail
+  const seq = history.length ? history[history.length - 1].seq + 1 : 0;
+  history.push({ type, payload, ts: Date.now(), seq });
   if (history.length > MAX_HISTORY) history.shift();
   tabHistories.set(tabId, history);
 
@@ -125,6 +146,8 @@ chrome.tabs.onRemoved.addListener((tabId, removeInfo) => {
     isWindowClosing: removeInfo.isWindowClosing
   });
   tabHistories.delete(tabId);
+  if (lastSentTs.delete(tabId)) closedTabIds.add(tabId);
+  if (serverNextSeq.delete(tabId)) closedTabIds.add(tabId);
 
 });
 
@@ -272,6 +295,121 @@ async function discardWithLog(tabId, source) {
 
 
 
+/**
+ * Order discard candidates by the memory discarding them should free, as
+ * attributed by the collector's /tab_memory (renderer memory split across the
+ * tabs sharing it). Falls back to the given order when the collector is down
+ * or has no mapping for a tab yet.
+ */
+async function rankByReclaimable(tabIds) {
+  if (tabIds.length < 2) return tabIds;
+  try {
+    const r = await fetch('http://localhost:12005/tab_memory');
+    const { tabs = {} } = await r.json();
+    const reclaimable = id => tabs[id]?.reclaimable_bytes ?? 0;
+    return [...tabIds].sort((a, b) => reclaimable(b) - reclaimable(a));
+  } catch (e) {
+    console.warn("Could not rank tabs by memory", e);
+    return tabIds;
+  }
+}
+
+
+
+/**
+ * Bring the prediction server's per-tab event store up to date: each tab
+ * sends only the events numbered at or past the server's next_seq. Tabs the
+ * server doesn't know yet (first cycle, server restart) or whose unsent
+ * events already fell out of MAX_HISTORY resend what is left with reset.
+ */
+async function syncHistories(tabs) {
+  const updates = [];
+  for (const tab of tabs) {
+    const hist = tabHistories.get(tab.id) || [];
+    const next = serverNextSeq.get(tab.id);
+    const reset = next === undefined || (hist.length > 0 && hist[0].seq > next);
+    const fresh = reset ? hist : hist.filter(e => e.seq >= next);
+    if (!reset && fresh.length === 0) continue;
+    updates.push({
+      tab_id: tab.id,
+      seq:    fresh.length ? fresh[0].seq : 0,
+      events: fresh.map(e => ({ type: e.type, ts: e.ts })),
+      reset
+    });
+  }
+  const closed = [...closedTabIds];
+  closedTabIds.clear();
+  if (updates.length === 0 && closed.length === 0) return;
+
+  const r = await fetch('http://localhost:1100/events', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ tabs: updates, closed_tab_ids: closed })
+  });
+  const { next_seq = {}, resync = [] } = await r.json();
+  for (const [tabId, n] of Object.entries(next_seq)) serverNextSeq.set(Number(tabId), n);
+  resync.forEach(tabId => serverNextSeq.delete(tabId));
+}
+
+
+
+/**
+ * Discard just enough tabs to get back under the collector's memory target:
+ * /discard_plan ranks the model's picks (and, when memory is already short,
+ * every other tab) by the memory each frees and lists in 'discard' the ones
+ * that cover excess_bytes. We discard those, skipping tabs shouldDiscard()
+ * protects and making up for them with the next ranked tabs. A tab whose
+ * reclaimable memory is unknown or 0 (no tabMemory attribution, e.g. without
+ * chrome.processes) is never discarded for pressure.
+ */
+async function discardForPressure(tabIds, preferred) {
+  const r = await fetch('http://localhost:12005/discard_plan', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ candidates: tabIds, preferred })
+  });
+  const { ranked = [], discard = [], excess_bytes = 0, level } = await r.json();
+  const reclaimable = new Map(ranked.map(e => [e.tab_id, e.reclaimable_bytes || 0]));
+  const planned = new Set(discard);
+  const spares = ranked.map(e => e.tab_id).filter(id => !planned.has(id));
+  let freed = 0;
+  for (const tabId of [...discard, ...spares]) {
+    if (freed >= excess_bytes) break;
+    const bytes = reclaimable.get(tabId) || 0;
+    if (bytes <= 0) continue;
+    const { ok } = await shouldDiscard(tabId);
+    if (!ok) continue;
+    discardWithLog(tabId, `ml-pressure-${level}`);
+    freed += bytes;
+  }
+}
+
+/**
+ * 'auto' interval: ask the collector how tight memory is, schedule the next
+ * check from its answer (minutes apart when RAM is plentiful, every 30 s,
+ * the shortest chrome.alarms allows, under pressure) and only run the model
+ * when memory is not plentiful.
+ */
+async function checkPressure() {
+  let pressure = null;
+  try {
+    const r = await fetch('http://localhost:12005/pressure');
+    pressure = await r.json();
+  } catch (e) {
+    console.warn("Could not read memory pressure", e);
+  }
+  const minutes = pressure ? pressure.next_check_s / 60 : PRESSURE_FALLBACK_MINUTES;
+  chrome.alarms.create(PREDICT_ALARM, { delayInMinutes: Math.max(0.5, minutes) });
+
+  if (pressure && pressure.level === 'low') {
+    console.log(`[Alarm:${new Date().toLocaleTimeString()}] memory pressure low, skipping predictions`);
+    return;
+  }
+  runPredictions(pressure);
+}
+
+
+
 // --------------------------
 // MESSAGE HANDLER FOR POPUP
 // --------------------------
@@ -283,7 +421,10 @@ chrome.runtime.onMessage.addListener((msg, sender, sendResponse) => {
 
     // clear any existing alarm
     chrome.alarms.clear(PREDICT_ALARM, () => {
-      if (msg.minutes !== 'off') {
+      if (msg.minutes === 'auto') {
+        // first pressure check right away; each check schedules the next one
+        chrome.alarms.create(PREDICT_ALARM, { delayInMinutes: 0.5 });
+      } else if (msg.minutes !== 'off') {
         chrome.alarms.create(PREDICT_ALARM, {
           periodInMinutes: Number(msg.minutes),
           delayInMinutes: Number(msg.minutes)
@@ -313,40 +454,94 @@ chrome.runtime.onMessage.addListener((msg, sender, sendResponse) => {
 
 chrome.alarms.onAlarm.addListener(alarm => {
   if (alarm.name !== PREDICT_ALARM) return;
+  chrome.storage.local.get('predictInterval', ({ predictInterval }) => {
+    if (predictInterval === 'auto') checkPressure();
+    else if (predictInterval !== 'off') runPredictions(null);
+  });
+});
+
+// pressure: the collector's /pressure state in 'auto' mode, null otherwise
+function runPredictions(pressure) {
   console.log(`[Alarm:${new Date().toLocaleTimeString()}] running predictions for all tabs`);
-  // Re-run your ML-based predict+discard for every tab
+  // Re-run your ML-based predict+discard for every tab, in one batched request
   chrome.tabs.query({}, tabs => {
-    tabs.forEach(tab => {
-      // build sequences from tabHistories
-      const hist = tabHistories.get(tab.id) || [];
-      const events = hist.map(e => e.type);
-      const times  = hist.map((e,i) => i===0 ? 0 : (e.ts - hist[i-1].ts)/1000);
-
-      fetch('http://localhost:1100/predict', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({
-           event_sequence:   events,
-           time_sequence:    times,
-           timestamp_sequence: hist.map(h => h.ts),
-           temperature:      1.0
-         })
-      })
-      .then(r => r.json())
-      .then(data => {
+    if (tabs.length === 0) return;
+    const tabsById = new Map(tabs.map(tab => [tab.id, tab]));
+    const serverHistory = SERVER_HISTORY && !INCREMENTAL_PREDICT;
+
+    let request;
+    if (serverHistory) {
+      // histories live on the server; only the ids go with the prediction
+      request = syncHistories(tabs)
+        .then(() => ({ tab_ids: tabs.map(tab => tab.id), temperature: 1.0 }));
+    } else {
+      const payload = tabs.map(tab => {
+        // build sequences from tabHistories
+        const hist = tabHistories.get(tab.id) || [];
+        const times = hist.map((e,i) => i===0 ? 0 : (e.ts - hist[i-1].ts)/1000);
+        if (!INCREMENTAL_PREDICT) {
+          return { tab_id: tab.id, event_sequence: hist.map(e => e.type), time_sequence: times };
+        }
+        // only the events the server has not seen yet; resume asks it to
+        // report (resync) rather than guess if it lost the tab's state
+        const resume = lastSentTs.has(tab.id);
+        const since = lastSentTs.get(tab.id) ?? -Infinity;
+        const start = hist.findIndex(e => e.ts > since);
+        const fresh = start === -1 ? [] : hist.slice(start);
+        if (fresh.length) lastSentTs.set(tab.id, fresh[fresh.length - 1].ts);
+        return {
+          tab_id:         tab.id,
+          event_sequence: fresh.map(e => e.type),
+          time_sequence:  start === -1 ? [] : times.slice(start),
+          resume
+        };
+      });
+
+      const body = { tabs: payload, temperature: 1.0 };
+      if (INCREMENTAL_PREDICT) {
+        body.closed_tab_ids = [...closedTabIds];
+        closedTabIds.clear();
+      }
+      request = Promise.resolve(body);
+    }
+    const endpoint = INCREMENTAL_PREDICT ? 'predict_incremental' : 'predict_batch';
+
+    request
+    .then(body => fetch(`http://localhost:1100/${endpoint}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body)
+    }))
+    .then(r => r.json())
+    .then(async data => {
+      // tabs the server lost track of resend their whole history next cycle
+      (data.resync || []).forEach(tabId => {
+        serverNextSeq.delete(tabId);
+        lastSentTs.delete(tabId);
+      });
+      const candidates = [];
+      (data.predictions || []).forEach(result => {
+        const tab = tabsById.get(result.tab_id);
+        if (!tab || result.error) return;
         console.log(
           `[Alarm:${new Date().toLocaleTimeString()}] ------- ` +
-          `Tab ${tab.id} predicted → ${data.predicted_event}` +
-          ` ------- Tab Title: ${tab.title.slice(0, 30)}`
+          `Tab ${tab.id} predicted → ${result.predicted_event}` +
+          ` ------- Tab Title: ${(tab.title || '').slice(0, 30)}`
         );
-        if (DISCARD_PREDICTIONS.has(data.predicted_event)) {
-          shouldDiscard(tab.id).then(({ ok }) => {
-            if (ok) discardWithLog(tab.id, 'ml-extension');
-            // if (ok) chrome.tabs.discard(tab.id);
-          });
-        }
-      })
-      .catch(console.error);
-    });
+        if (DISCARD_PREDICTIONS.has(result.predicted_event)) candidates.push(tab.id);
+      });
+      // over the memory target: discard just enough to get back under it
+      if (pressure && pressure.excess_bytes > 0) {
+        await discardForPressure(tabs.map(tab => tab.id), candidates);
+        return;
+      }
+      // discard the tabs that free the most memory first
+      for (const tabId of await rankByReclaimable(candidates)) {
+        const { ok } = await shouldDiscard(tabId);
+        if (ok) discardWithLog(tabId, 'ml-extension');
+        // if (ok) chrome.tabs.discard(tabId);
+      }
+    })
+    .catch(console.error);
   });
-});
\ No newline at end of file
+}
@@ -0,0 +1,266 @@
+"""
+Instrumentation shared by the prediction server and the collector.
+
+Per-stage latency histograms, per-endpoint request counts and latencies and
+callback gauges, all served on /metrics in the Prometheus text format, plus
+an opt-in sampling profiler on /profile. Both services put this directory on
+sys.path and call Metrics(...).install(app).
+
+Environment knobs:
+    METRICS_ENABLED=0        stage timers become no-ops (/metrics still answers)
+    PROFILER_ENABLED=1       expose GET /profile?seconds=N&interval_ms=M (N <= 60, 1 <= M <= 1000)
+    LOG_LEVEL=info           skip debug output such as /predict's per-request event dump
+"""
+import os
+import sys
+import time
+import bisect
+import threading
+from collections import Counter, defaultdict
+
+METRICS_ENABLED  = os.getenv('METRICS_ENABLED', '1') == '1'
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', '0') == '1'
+LOG_LEVEL        = os.getenv('LOG_LEVEL', 'debug').lower()
+
+LOG_LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+# /profile bounds: a longer capture or a shorter interval would stall the service
+PROFILE_MAX_SECONDS = 60.0
+PROFILE_INTERVAL_MS = (1.0, 1000.0)
+# seconds; spans a cached lookup (~µs) to a cold Keras forward pass
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def log_enabled(level):
+    """True when messages of this level should be printed under LOG_LEVEL."""
+    return LOG_LEVELS.get(level, 20) >= LOG_LEVELS.get(LOG_LEVEL, 10)
+
+
+# ─── Histograms ────────────────────────────────────────────────────────────────
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot: above every bound
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """(cumulative bucket counts, sum, count), as Prometheus reports them."""
+        with self._lock:
+            counts, total, n = list(self.counts), self.sum, self.count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, n
+
+
+class _Stage:
+    __slots__ = ('hist', 'started')
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _NoStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_STAGE = _NoStage()
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# ─── Registry ──────────────────────────────────────────────────────────────────
+class Metrics:
+    """
+    Metrics of one service, exported under a name prefix (the namespace).
+
+        with metrics.stage('encode'):
+            ...
+        metrics.observe('write', seconds)       # for stages timed elsewhere
+        metrics.gauge('cache_entries', 'Cached probability vectors', lambda: len(cache))
+    """
+
+    def __init__(self, namespace, enabled=METRICS_ENABLED):
+        self.namespace = namespace
+        self.enabled = enabled
+        self._stages = defaultdict(Histogram)     # stage → Histogram
+        self._latency = defaultdict(Histogram)    # endpoint → Histogram
+        self._requests = Counter()                # (endpoint, method, status) → count
+        self._gauges = {}                         # name → (help, type, fn)
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def stage(self, name):
+        """Context manager timing one stage of a request into <ns>_stage_seconds."""
+        if not self.enabled:
+            return _NO_STAGE
+        return _Stage(self._stages[name])
+
+    def observe(self, name, seconds):
+        if self.enabled:
+            self._stages[name].observe(seconds)
+
+    def gauge(self, name, help, fn, kind='gauge'):
+        """Report fn() at scrape time as <ns>_<name> (kind 'counter' for running totals)."""
+        self._gauges[name] = (help, kind, fn)
+
+    def record_request(self, endpoint, method, status, seconds):
+        with self._lock:
+            self._requests[(endpoint, method, status)] += 1
+        if self.enabled:
+            self._latency[endpoint].observe(seconds)
+
+    # ── exposition ──
+    def _histograms(self, name, help, label, hists):
+        lines = [f'# HELP {name} {help}', f'# TYPE {name} histogram']
+        for key, hist in sorted(hists.items()):
+            cumulative, total, n = hist.snapshot()
+            for bound, c in zip(hist.bounds + ('+Inf',), cumulative):
+                le = bound if bound == '+Inf' else _number(bound)
+                lines.append(f'{name}_bucket{_labels(**{label: key, "le": le})} {c}')
+            lines.append(f'{name}_sum{_labels(**{label: key})} {total!r}')
+            lines.append(f'{name}_count{_labels(**{label: key})} {n}')
+        return lines
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        ns = self.namespace
+        lines = self._histograms(f'{ns}_stage_seconds', 'Time spent per processing stage.',
+                                 'stage', dict(self._stages))
+        lines += self._histograms(f'{ns}_http_request_seconds', 'Request latency per endpoint.',
+                                  'endpoint', dict(self._latency))
+        with self._lock:
+            requests = sorted(self._requests.items())
+        lines += [f'# HELP {ns}_http_requests_total Requests served per endpoint and status.',
+                  f'# TYPE {ns}_http_requests_total counter']
+        lines += [f'{ns}_http_requests_total'
+                  f'{_labels(endpoint=e, method=m, status=s)} {n}' for (e, m, s), n in requests]
+        lines += [f'# HELP {ns}_uptime_seconds Seconds since the service started.',
+                  f'# TYPE {ns}_uptime_seconds gauge',
+                  f'{ns}_uptime_seconds {time.time() - self.started:.3f}']
+        for name, (help, kind, fn) in sorted(self._gauges.items()):
+            try:
+                value = fn()
+            except Exception:
+                continue  # a gauge that can't be read right now is left out of this scrape
+            if value is None:
+                continue
+            lines += [f'# HELP {ns}_{name} {help}', f'# TYPE {ns}_{name} {kind}',
+                      f'{ns}_{name} {_number(value)}']
+        return '\n'.join(lines) + '\n'
+
+    # ── Flask wiring ──
+    def install(self, app):
+        """Time every request and add /metrics (and /profile when PROFILER_ENABLED)."""
+        from flask import Response, g, jsonify, request
+
+        @app.before_request
+        def _start_timer():
+            g._metrics_started = time.perf_counter()
+
+        @app.after_request
+        def _record(response):
+            started = getattr(g, '_metrics_started', None)
+            if started is not None:
+                endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+                self.record_request(endpoint, request.method, response.status_code,
+                                    time.perf_counter() - started)
+            return response
+
+        @app.route('/metrics', methods=['GET'])
+        def metrics():
+            return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+        if PROFILER_ENABLED:
+            @app.route('/profile', methods=['GET'])
+            def profile():
+                """Sample every thread's stack for ?seconds= (max 60); collapsed stacks out."""
+                try:
+                    seconds = float(request.args.get('seconds', 10))
+                    interval_ms = float(request.args.get('interval_ms', 5))
+                except ValueError:
+                    return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+                low, high = PROFILE_INTERVAL_MS
+                # the comparisons also reject nan
+                if not (0 < seconds <= PROFILE_MAX_SECONDS and low <= interval_ms <= high):
+                    return jsonify({'error': f'need 0 < seconds <= {PROFILE_MAX_SECONDS:g} and '
+                                             f'{low:g} <= interval_ms <= {high:g}'}), 400
+                profiler = SamplingProfiler(interval_ms / 1000.0)
+                profiler.start()
+                time.sleep(seconds)
+                profiler.stop()
+                return Response(profiler.collapsed(), mimetype='text/plain')
+        return self
+
+
+# ─── Sampling profiler ─────────────────────────────────────────────────────────
+class SamplingProfiler:
+    """
+    Samples the stacks of all other threads every interval seconds.
+
+    Unlike cProfile it adds no per-call overhead, only one stack walk per
+    thread per interval, so it can be pointed at a live server. collapsed()
+    returns 'outer;...;inner count' lines, the input of flamegraph.pl and
+    speedscope.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = float(interval)
+        self.samples = 0
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:'
+                                 f'{frame.f_lineno})')
+                    frame = frame.f_back
+                self._stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {n}\n' for stack, n in self._stacks.most_common())
@@ -0,0 +1,13 @@
+"""Puts the Models/, collector and shared modules on sys.path for the tests."""
+import os
+import sys
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+MODELS_DIR = os.path.join(ROOT, 'Models')
+COLLECTOR_DIR = os.path.join(ROOT, 'Data_Collecting_Extension')
+SHARED_DIR = os.path.join(ROOT, 'shared')
+
+# both directories have a server.py: Models/ wins, the collector's is never imported here
+for path in (SHARED_DIR, COLLECTOR_DIR, MODELS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
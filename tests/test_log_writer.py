@@ -0,0 +1,57 @@
+"""BufferedWriter: batching, draining on close, and a sink write that fails."""
+from log_writer import BufferedWriter
+
+
+class ListWriter(BufferedWriter):
+    """Sink kept in memory; the batches listed in fail_on raise instead of writing."""
+
+    def __init__(self, fail_on=(), **kwargs):
+        super().__init__('memory', **kwargs)
+        self.batches = []
+        self.fail_on = set(fail_on)
+        self.syncs = 0
+        self.closed_sink = False
+        self.start()
+
+    def _write_rows(self, rows):
+        attempt = len(self.batches)
+        self.batches.append(None if attempt in self.fail_on else list(rows))
+        if attempt in self.fail_on:
+            raise OSError('disk full')
+
+    def _sync(self):
+        self.syncs += 1
+
+    def _close_sink(self):
+        self.closed_sink = True
+
+
+def rows(n, start=0):
+    return [[f'2024-01-01 00:00:{i:02d}', 'tabCreated', {'tabId': i}] for i in range(start, start + n)]
+
+
+def test_close_drains_queued_rows_in_batches():
+    flushed = []
+    writer = ListWriter(flush_rows=4, flush_interval=60, fsync_interval=0,
+                        on_flush=lambda seconds, n: flushed.append(n))
+    writer.write_many(rows(10))
+    writer.close()
+
+    written = [r for batch in writer.batches for r in batch]
+    assert written == rows(10)
+    assert all(len(b) <= 4 for b in writer.batches)
+    assert writer.rows_written == 10 and sum(flushed) == 10
+    assert writer.syncs >= 1 and writer.closed_sink and not writer.alive
+
+
+def test_failed_flush_drops_that_batch_and_keeps_writing(capsys):
+    writer = ListWriter(fail_on={0}, flush_rows=5, flush_interval=60, fsync_interval=-1)
+    writer.write_many(rows(5))
+    writer.write_many(rows(5, start=5))
+    writer.close()
+
+    assert writer.batches[0] is None                 # the failing batch is lost...
+    assert writer.batches[1:] == [rows(5, start=5)]  # ...the next one still lands
+    assert writer.rows_written == 5 and writer.flushes == 1
+    assert writer.syncs == 0
+    assert 'Error writing 5 rows to memory: disk full' in capsys.readouterr().out
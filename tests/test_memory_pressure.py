@@ -0,0 +1,52 @@
+"""PressureScheduler: pressure levels from RAM and trend, and the discard plan."""
+from collections import namedtuple
+
+from memory_pressure import PressureScheduler, trend
+
+VM = namedtuple('VM', 'total available')
+GB = 2**30
+
+
+def state(level, excess_bytes):
+    return {'level': level, 'excess_bytes': excess_bytes}
+
+
+def test_trend_is_least_squares_slope():
+    assert trend([]) == 0.0 and trend([(0, 5)]) == 0.0
+    assert trend([(0, 0), (1, 10), (2, 20)]) == 10.0
+
+
+def test_levels_follow_available_memory():
+    scheduler = PressureScheduler(min_available_fraction=0.15, slack_fraction=0.10,
+                                  min_interval=30, max_interval=600)
+    scheduler.observe(GB)
+    low = scheduler.state(VM(total=16 * GB, available=8 * GB))
+    assert low['level'] == 'low' and low['next_check_s'] == 600 and low['excess_bytes'] == 0
+
+    critical = scheduler.state(VM(total=16 * GB, available=2 * GB))
+    assert critical['level'] == 'critical' and critical['next_check_s'] == 30
+    assert critical['excess_bytes'] == int(16 * GB * 0.15) - 2 * GB
+
+
+def test_plan_covers_excess_biggest_preferred_first():
+    tabs = {1: {'memory_bytes': 100}, 2: {'memory_bytes': 300}, 3: {'memory_bytes': 500}}
+    plan = PressureScheduler.plan(state('high', 250), tabs, [1, 2, 3], preferred=[1, 2])
+    # not critical: only the model's picks are considered
+    assert [e['tab_id'] for e in plan['ranked']] == [2, 1]
+    assert plan['discard'] == [2] and plan['covered_bytes'] == 300
+
+
+def test_plan_never_discards_unattributed_tabs_at_critical():
+    # stable Chrome has no chrome.processes: no tab has a tabMemory attribution
+    plan = PressureScheduler.plan(state('critical', 10 * GB), {}, [1, 2, 3, 4], preferred=[2])
+    assert [e['tab_id'] for e in plan['ranked']] == [2, 1, 3, 4]
+    assert all(e['reclaimable_bytes'] == 0 for e in plan['ranked'])
+    assert plan['discard'] == [] and plan['covered_bytes'] == 0
+
+
+def test_plan_at_critical_stops_once_excess_is_covered():
+    tabs = {t: {'memory_bytes': t * 100} for t in (1, 2, 3, 4)}
+    plan = PressureScheduler.plan(state('critical', 600), tabs, [1, 2, 3, 4, 5], preferred=[1])
+    assert [e['tab_id'] for e in plan['ranked']] == [1, 4, 3, 2, 5]
+    assert plan['discard'] == [1, 4, 3] and plan['covered_bytes'] == 800
+    assert 5 not in plan['discard']
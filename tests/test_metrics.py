@@ -0,0 +1,38 @@
+"""shared/metrics.py: exposition format and /profile input checks."""
+import pytest
+from flask import Flask
+
+import metrics
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(metrics, 'PROFILER_ENABLED', True)
+    app = Flask(__name__)
+    registry = metrics.Metrics('test').install(app)
+    with registry.stage('encode'):
+        pass
+    return app.test_client()
+
+
+def test_metrics_exposition(client):
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'test_stage_seconds_count{stage="encode"} 1' in text
+    assert 'test_stage_seconds_bucket{stage="encode",le="+Inf"} 1' in text
+    assert '# TYPE test_uptime_seconds gauge' in text
+
+
+@pytest.mark.parametrize('query', [
+    'interval_ms=0', 'interval_ms=-5', 'interval_ms=5000', 'interval_ms=abc', 'interval_ms=nan',
+    'seconds=0', 'seconds=61', 'seconds=soon',
+])
+def test_profile_rejects_bad_input(client, query):
+    resp = client.get(f'/profile?{query}')
+    assert resp.status_code == 400
+    assert 'error' in resp.get_json()
+
+
+def test_profile_samples_within_bounds(client):
+    resp = client.get('/profile?seconds=0.05&interval_ms=1')
+    assert resp.status_code == 200
+    assert resp.mimetype == 'text/plain'
@@ -0,0 +1,67 @@
+"""
+/predict_incremental must not predict from a truncated history: a tab sent
+with "resume" whose LSTM state is gone is reported under 'resync'.
+
+    python -m pytest -q tests
+"""
+import os
+import importlib
+
+import pytest
+
+from conftest import MODELS_DIR
+
+
+@pytest.fixture(scope='module')
+def server():
+    os.environ.update(INFERENCE_BACKEND='numpy', MODEL_TYPE='vanilla', MODEL_PREWARM='0',
+                      MODEL_RELOAD_INTERVAL_S='0', LOG_LEVEL='info')
+    cwd = os.getcwd()
+    os.chdir(MODELS_DIR)  # label_encoder.pkl / scaler.pkl are read from the working directory
+    try:
+        yield importlib.import_module('server')
+    finally:
+        os.chdir(cwd)
+
+
+def post(client, *tabs):
+    resp = client.post('/predict_incremental', json={'tabs': list(tabs)})
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def tab(tab_id, events, resume=False):
+    return {'tab_id': tab_id, 'event_sequence': events,
+            'time_sequence': [0.0] + [5.0] * (len(events) - 1), 'resume': resume}
+
+
+def test_evicted_state_is_resynced(server):
+    client = server.app.test_client()
+    events = list(server.label_encoder.classes_[:3])
+    states = server.registry.get('vanilla').tab_states
+    states.max_entries = 1
+
+    first = post(client, tab(1, events))
+    assert 'resync' not in first and 'error' not in first['predictions'][0]
+    post(client, tab(2, events))  # LRU evicts tab 1's state
+    assert states.get(1) is None
+
+    lost = post(client, tab(1, events[:1], resume=True), tab(2, events[:1], resume=True))
+    assert lost['resync'] == [1]
+    assert 'error' in lost['predictions'][0]
+    assert 'predicted_event' in lost['predictions'][1]
+    assert states.get(1) is None  # nothing stored from the truncated history
+
+    # the client resends the whole history without resume and carries on
+    again = post(client, tab(1, events))
+    assert 'resync' not in again and 'predicted_event' in again['predictions'][0]
+
+
+def test_resume_without_new_events_reports_lost_state(server):
+    client = server.app.test_client()
+    states = server.registry.get('vanilla').tab_states
+    states.max_entries = 4096
+    post(client, tab(7, list(server.label_encoder.classes_[:2])))
+    states.discard(7)  # as after TAB_STATE_TTL_S or a model swap
+
+    assert post(client, tab(7, [], resume=True))['resync'] == [7]
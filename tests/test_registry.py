@@ -0,0 +1,91 @@
+"""ModelRegistry budget eviction and hot swaps, and the generation-keyed prediction cache."""
+import numpy as np
+import pytest
+
+from prediction_cache import PredictionCache
+from registry import LoadedModel, ModelRegistry
+
+
+class FakeBatcher:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_registry(tmp_path, memory_budget=0):
+    for name in ('a', 'b'):
+        (tmp_path / f'{name}.npz').write_bytes(b'v1')
+
+    def loader(name):
+        return LoadedModel(name, model=object(), seq_len=10, use_deltas=False,
+                           weights_bytes=100, batcher=FakeBatcher())
+
+    swapped = []
+    registry = ModelRegistry(loader, ['a', 'b'], memory_budget=memory_budget,
+                             source=lambda name: str(tmp_path / f'{name}.npz'),
+                             on_swap=swapped.append)
+    return registry, swapped
+
+
+def test_budget_evicts_least_recently_used(tmp_path):
+    registry, _ = make_registry(tmp_path, memory_budget=150)
+    a = registry.get('a')
+    registry.get('b')
+    assert [m.name for m in registry.loaded()] == ['b']
+    assert registry.evictions == 1
+    assert a.batcher.closed
+    with pytest.raises(KeyError):
+        registry.get('c')
+
+
+def test_hot_swap_replaces_entry_and_retires_old_copy(tmp_path):
+    registry, swapped = make_registry(tmp_path)
+    old = registry.get('a')
+    assert registry.reload('a')
+    new = registry.get('a')
+
+    assert new is not old
+    assert new.generation > old.generation
+    assert registry.swaps == 1 and swapped == ['a']
+    assert not old.batcher.closed  # in-flight requests may still hold it
+    registry._close_retired(grace=0)
+    assert old.batcher.closed and not new.batcher.closed
+    assert not registry.reload('b')  # never loaded: nothing to swap
+
+
+def test_failed_reload_keeps_serving_copy(tmp_path):
+    registry, swapped = make_registry(tmp_path)
+    old = registry.get('a')
+
+    def broken(name):
+        raise ValueError('truncated file')
+    registry.loader = broken
+    assert not registry.reload('a')
+    assert registry.get('a') is old and registry.swaps == 0 and swapped == []
+
+
+def test_cache_keys_differ_per_generation():
+    window = np.arange(10, dtype='int32')
+    deltas = np.zeros(10, dtype='float32')
+    assert PredictionCache.key('a', 1, window, deltas) == PredictionCache.key('a', 1, window, deltas)
+    assert PredictionCache.key('a', 1, window, deltas) != PredictionCache.key('a', 2, window, deltas)
+
+    cache = PredictionCache(max_entries=8, ttl=60)
+    cache.clear()  # on_swap
+    # a request that started on generation 1 stores its result after the swap...
+    cache.put(PredictionCache.key('a', 1, window, deltas), np.ones(3))
+    # ...and the swapped-in generation 2 never sees it
+    assert cache.get(PredictionCache.key('a', 2, window, deltas)) is None
+
+
+def test_cache_lru_and_ttl():
+    cache = PredictionCache(max_entries=2, ttl=60)
+    for k in (b'1', b'2', b'3'):
+        cache.put(k, np.zeros(1))
+    assert cache.get(b'1') is None and cache.get(b'3') is not None
+    assert cache.evictions == 1
+
+    expired = PredictionCache(max_entries=2, ttl=-1)
+    expired.put(b'1', np.zeros(1))
+    assert expired.get(b'1') is None
@@ -0,0 +1,70 @@
+"""retrain.py's log tailing and unknown-event-type gate."""
+import os
+import csv
+import warnings
+
+import pytest
+
+from conftest import MODELS_DIR
+from features import FeaturePipeline
+from retrain import EventBuffer, LogTail
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # sklearn pickle-version warnings
+        return FeaturePipeline.load(MODELS_DIR)
+
+
+def write_log(path, types, start=0):
+    with open(path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        for i, kind in enumerate(types, start):
+            writer.writerow([f'2024-01-01 10:{i // 60:02d}:{i % 60:02d}', kind, {'type': kind}])
+
+
+def fill(pipeline, path):
+    buffer = EventBuffer(pipeline, max_events=1000)
+    for chunk in LogTail(str(path)).read():
+        buffer.add(chunk)
+    return buffer
+
+
+def test_bookkeeping_rows_are_not_unknown(pipeline, tmp_path):
+    # once tab memory attribution runs, tabMemory rows outnumber user events
+    user = ['tabCreated', 'tabUpdated', 'tabSwitched'] * 10
+    rows = []
+    for kind in user:
+        rows += [kind, 'tabMemory', 'tabMemory', 'tabMemory', 'resourceUsage']
+    rows += ['tabAboutToBeDiscarded', 'tabDiscarded', 'tabReloaded', 'periodicBrowserStats']
+    write_log(tmp_path / 'user_data.csv', rows)
+
+    buffer = fill(pipeline, tmp_path / 'user_data.csv')
+    assert buffer.new_events == len(user)
+    assert len(buffer.codes) == len(user)
+    assert buffer.unknown_fraction() == 0.0
+
+
+def test_new_event_types_trip_the_gate(pipeline, tmp_path):
+    write_log(tmp_path / 'user_data.csv', ['tabCreated'] * 18 + ['tabGroupCreated'] * 2)
+    buffer = fill(pipeline, tmp_path / 'user_data.csv')
+    assert buffer.new_events == 18
+    assert buffer.unknown == {'tabGroupCreated': 2}
+    assert buffer.unknown_fraction() == pytest.approx(0.1)
+    buffer.mark_trained()
+    assert buffer.new_events == 0 and buffer.unknown_fraction() == 0.0
+
+
+def test_tail_reads_only_whole_appended_lines(pipeline, tmp_path):
+    path = tmp_path / 'user_data.csv'
+    write_log(path, ['tabCreated'] * 5)
+    tail = LogTail(str(path))
+    assert sum(len(s) for s, _ in tail.read()) == 5
+
+    write_log(path, ['tabUpdated'] * 3, start=5)
+    with open(path, 'a') as f:
+        f.write('2024-01-01 10:00:09,tabSwit')  # a row still being written
+    chunks = list(tail.read())
+    assert [t for _, types in chunks for t in types] == ['tabUpdated'] * 3
+    assert tail.offset < os.path.getsize(path)
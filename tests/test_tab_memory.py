@@ -0,0 +1,43 @@
+"""TabMemoryTracker: renderer memory split across the tabs each renderer hosts."""
+from tab_memory import TabMemoryTracker
+
+
+class FakeSampler:
+    def __init__(self, client_ids):
+        self.client_ids = client_ids
+
+    def pid_for_client_id(self, client_id):
+        return self.client_ids.get(client_id)
+
+
+def test_memory_is_split_across_tabs_of_a_renderer():
+    tracker = TabMemoryTracker()
+    assert tracker.update_mappings([
+        {'osProcessId': 100, 'tabIds': [1, 2]},
+        {'osProcessId': 200, 'tabIds': [3]},
+        {'osProcessId': 300, 'tabIds': [4]},   # renderer gone since the mapping
+    ]) == 4
+    tabs = tracker.attribute({100: ('renderer', 900), 200: ('renderer', 400)})
+
+    assert set(tabs) == {1, 2, 3}
+    assert tabs[1] == {'pid': 100, 'memory_bytes': 450, 'process_memory_bytes': 900,
+                       'shared_with': 2}
+    assert tabs[3]['memory_bytes'] == 400 and tabs[3]['shared_with'] == 1
+    assert tracker.latest()[0] == tabs
+
+
+def test_client_ids_resolve_through_the_sampler():
+    tracker = TabMemoryTracker()
+    tracker.update_mappings([{'tabId': 5, 'clientId': 7}, {'tabId': 6, 'clientId': 7},
+                             {'tabId': 8, 'clientId': 9}])
+    tabs = tracker.attribute({100: ('renderer', 300)}, FakeSampler({7: 100}))
+    assert sorted(tabs) == [5, 6]
+    assert tabs[5]['memory_bytes'] == 150
+
+
+def test_stale_or_missing_mapping_attributes_nothing():
+    assert TabMemoryTracker().attribute({100: ('renderer', 900)}) == {}
+
+    tracker = TabMemoryTracker(max_age=-1)
+    tracker.update_mappings([{'osProcessId': 100, 'tabIds': [1]}])
+    assert tracker.attribute({100: ('renderer', 900)}) == {}